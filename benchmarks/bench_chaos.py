@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Reconnect behaviour of an autoreconnecting GraphiteClient while carbon
+fails, through a ChaosProxy in front of a FakeCarbon.
+
+A batch of metrics, each with its own sequence number, is sent at a fixed
+rate; a fault is injected after a second. For every scenario:
+
+* recover: seconds from the end of the fault (its start, for faults that
+  do not end) until the last degraded batch, one that was lost, failed or
+  blocked the caller more than 0.1s, is followed by a healthy one
+* p99 / max block: seconds the caller was blocked in send_list()
+* lost: metrics whose send_list() returned without error, but that never
+  reached carbon
+* failed: metrics whose send_list() raised
+
+    $ python benchmarks/bench_chaos.py
+    $ python benchmarks/bench_chaos.py --save baseline.json
+    $ python benchmarks/bench_chaos.py --baseline baseline.json
+    $ python benchmarks/bench_chaos.py --replay-bytes 1048576
+
+With --baseline, the run fails if a number got worse than the baseline by
+more than --tolerance (relative) and --slack (absolute).
+"""
+import argparse
+import json
+import sys
+import time
+
+from graphitesend.graphitesend import GraphiteClient, GraphiteSendException
+from graphitesend.testing import ChaosProxy, FakeCarbon
+
+SCENARIOS = [
+    # name, inject, heal, seconds between the two
+    ('carbon_restart', lambda proxy: proxy.restart(downtime=1), None, 0),
+    ('half_open', lambda proxy: proxy.half_open(), None, 0),
+    ('slow_reader', lambda proxy: proxy.slow(20000),
+     lambda proxy: proxy.slow(None), 2),
+]
+SLOW_SEND = 0.1
+METRICS = ['recover', 'p99_block', 'max_block', 'lost', 'failed']
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(inject, heal, fault_for, duration=8, fault_at=1, rate=100,
+        batch=20, **client_kwargs):
+    carbon = FakeCarbon().start()
+    proxy = ChaosProxy(carbon.address, receive_buffer_size=16384).start()
+    client = GraphiteClient(autoreconnect=True, timeout_in_seconds=1,
+                            send_buffer_size=16384, prefix='',
+                            system_name='', **dict(client_kwargs,
+                                                   **proxy.client_kwargs()))
+    batches = []
+    seq = 0
+    fault_started = fault_ended = None
+    start = time.time()
+    next_send = start
+    while time.time() - start < duration:
+        now = time.time()
+        if fault_started is None and now - start >= fault_at:
+            inject(proxy)
+            fault_started = now
+            if heal is None:
+                fault_ended = now
+        if fault_ended is None and fault_started is not None and \
+                now - fault_started >= fault_for:
+            heal(proxy)
+            fault_ended = now
+
+        seqs = list(range(seq, seq + batch))
+        seq += batch
+        sent_at = time.time()
+        try:
+            client.send_list([('chaos', n, n) for n in seqs])
+            ok = True
+        except GraphiteSendException:
+            ok = False
+        done_at = time.time()
+        batches.append((sent_at, done_at, ok, seqs))
+
+        next_send = max(next_send + 1.0 / rate, done_at)
+        time.sleep(max(0, next_send - time.time()))
+
+    carbon.wait_for(seq, timeout=5)
+    client.disconnect()
+    proxy.stop()
+    carbon.stop()
+
+    received = set(int(value) for _, value in carbon.series.get('chaos', []))
+    recover = 0
+    degraded = False
+    for sent_at, done_at, ok, seqs in batches:
+        healthy = ok and received.issuperset(seqs) and \
+            done_at - sent_at <= SLOW_SEND
+        if not healthy:
+            degraded = True
+        elif degraded:
+            recover = max(0, done_at - fault_ended)
+            degraded = False
+    if degraded:
+        recover = float('inf')
+    blocked = [done_at - sent_at for sent_at, done_at, _, _ in batches]
+    return {
+        'recover': recover,
+        'p99_block': percentile(blocked, 0.99),
+        'max_block': max(blocked),
+        'lost': sum(len(set(seqs) - received)
+                    for _, _, ok, seqs in batches if ok),
+        'failed': sum(len(seqs) for _, _, ok, seqs in batches if not ok),
+    }
+
+
+def regressions(results, baseline, tolerance, slack):
+    for name, result in sorted(results.items()):
+        for metric in METRICS:
+            if name not in baseline or metric not in baseline[name]:
+                continue
+            allowed = baseline[name][metric] * (1 + tolerance) + slack
+            if result[metric] > allowed:
+                yield "%s %s: %.3f > %.3f" % (name, metric, result[metric],
+                                              allowed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--save', help="write the results to this file")
+    parser.add_argument('--baseline', help="compare with these results")
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--slack', type=float, default=1.0)
+    parser.add_argument('--replay-bytes', type=int,
+                        help="replay window of the client")
+    args = parser.parse_args()
+
+    results = {}
+    print("%-16s %9s %10s %10s %7s %7s" % (
+        "scenario", "recover", "p99 block", "max block", "lost", "failed"))
+    for name, inject, heal, fault_for in SCENARIOS:
+        result = results[name] = run(inject, heal, fault_for,
+                                     replay_bytes=args.replay_bytes)
+        print("%-16s %8.2fs %9.3fs %9.3fs %7d %7d" % (
+            name, result['recover'], result['p99_block'],
+            result['max_block'], result['lost'], result['failed']))
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        failures = list(regressions(results, baseline, args.tolerance,
+                                    args.slack))
+        for failure in failures:
+            print("REGRESSION " + failure)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Per metric cost of send(), which builds a "sent ... long message: ..."
+description of every message, versus emit(), which returns True instead.
+Metrics are sent over TCP loopback to a thread draining the socket.
+
+    $ python benchmarks/bench_emit.py
+"""
+import socket
+import threading
+import timeit
+
+from graphitesend.graphitesend import GraphiteClient
+
+NUMBER = 100000
+
+
+def drain(server):
+    conn, _ = server.accept()
+    while conn.recv(1 << 20):
+        pass
+    conn.close()
+
+
+def per_metric(client, method, number=NUMBER):
+    function = getattr(client, method)
+    timer = timeit.Timer(lambda: function('cpu.user', 42.5, 1500000000))
+    return min(timer.repeat(3, number)) / number * 1e9
+
+
+def main():
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    reader = threading.Thread(target=drain, args=(server,))
+    reader.start()
+
+    client = GraphiteClient(graphite_server='127.0.0.1',
+                            graphite_port=server.getsockname()[1],
+                            prefix='bench', system_name='host')
+    for method in ('send', 'emit'):
+        print("%-20s %8.0f ns/metric" % (method, per_metric(client, method)))
+
+    client.disconnect()
+    reader.join()
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Throughput of exporting a large batch of historical metrics over TCP
+loopback, with send_list() and with bulk_export() on 1 to N formatting
+processes. A thread drains the socket, standing in for carbon.
+
+    $ python benchmarks/bench_export.py
+"""
+import multiprocessing
+import socket
+import threading
+import time
+
+from graphitesend.graphitesend import GraphiteClient
+
+METRICS = 1000000
+
+
+def drain(server):
+    conn, _ = server.accept()
+    while conn.recv(1 << 20):
+        pass
+    conn.close()
+
+
+def run(export, data):
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    reader = threading.Thread(target=drain, args=(server,))
+    reader.start()
+
+    client = GraphiteClient(graphite_server='127.0.0.1',
+                            graphite_port=server.getsockname()[1],
+                            prefix='bench', system_name='host')
+    start = time.time()
+    export(client, data)
+    elapsed = time.time() - start
+
+    client.disconnect()
+    reader.join()
+    server.close()
+    return elapsed
+
+
+def main():
+    data = [('metric.%d' % (i % 1000), i, 1500000000 + i)
+            for i in range(METRICS)]
+    runs = [('send_list', lambda client, data: client.send_list(data))]
+    processes = 1
+    while processes <= multiprocessing.cpu_count():
+        runs.append(('bulk_export x%d' % processes,
+                     lambda client, data, processes=processes:
+                     client.bulk_export(data, processes=processes)))
+        processes *= 2
+
+    print("%-18s %14s" % ("mode", "metrics/s"))
+    for name, export in runs:
+        print("%-18s %14.0f" % (name, METRICS / run(export, data)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Per metric cost of GraphiteStructuredFormatter, with debug logging disabled.
+
+"eager logging" reproduces the formatter before the Tracer was introduced,
+where both log.debug() messages were interpolated for every metric.
+"template" is the same layout compiled with compile_template().
+
+    $ python benchmarks/bench_formatter.py
+"""
+import logging
+import time
+import timeit
+
+from graphitesend.formatter import GraphiteStructuredFormatter, log
+
+NUMBER = 200000
+
+
+class EagerLoggingFormatter(GraphiteStructuredFormatter):
+
+    def __call__(self, metric_name, metric_value, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        timestamp = int(timestamp)
+
+        if type(metric_value).__name__ in ['str', 'unicode']:
+            metric_value = float(metric_value)
+
+        log.debug("metric: '%s'" % metric_name)
+        metric_name = self.clean_metric_name(metric_name)
+        log.debug("metric: '%s'" % metric_name)
+
+        message = "%s%s%s %f %d\n" % (self.prefix, metric_name, self.suffix,
+                                      metric_value, timestamp)
+        if self.lowercase_metric_names:
+            message = message.lower()
+        return message
+
+
+def per_metric(formatter, number=NUMBER):
+    timer = timeit.Timer(lambda: formatter('cpu.user', 42.5, 1500000000))
+    return min(timer.repeat(3, number)) / number * 1e9
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    options = dict(prefix='bench', system_name='host')
+    results = [
+        ('eager logging', per_metric(EagerLoggingFormatter(**options))),
+        ('tracer', per_metric(GraphiteStructuredFormatter(**options))),
+        ('template', per_metric(
+            GraphiteStructuredFormatter(**options).compile_template())),
+    ]
+    for name, nanoseconds in results:
+        print("%-20s %8.0f ns/metric" % (name, nanoseconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+Cost of client.last() on a large last values cache, for a pattern matching
+a handful of series, compared with matching every remembered name, and of
+remembering a value when sending.
+
+    $ python benchmarks/bench_last.py
+"""
+import fnmatch
+import timeit
+
+from graphitesend.graphitesend import GraphiteClient
+
+SERIES = 100000
+
+
+def main():
+    client = GraphiteClient(dryrun=True, prefix='', system_name='',
+                            last_values=True, last_values_max_series=SERIES)
+    client.send_list([('app%d.requests.%s' % (n // 10, n % 10), n, 1)
+                      for n in range(SERIES)])
+    cache = client.last_values
+    pattern = 'app4242.requests.*'
+
+    def scan():
+        return dict((name, entry) for name, entry in cache._entries.items()
+                    if fnmatch.fnmatchcase(name, pattern))
+
+    assert scan() == client.last(pattern)
+    for name, function, number in (
+            ('last()', lambda: client.last(pattern), 10000),
+            ('scan', scan, 10)):
+        seconds = min(timeit.repeat(function, number=number, repeat=3))
+        print("%-8s %10.2f us/query" % (name, seconds / number * 1e6))
+
+    number = 100000
+    seconds = min(timeit.repeat(
+        lambda: cache.update('app1.requests.1', 1, 1), number=number,
+        repeat=3))
+    print("%-8s %10.2f us/update" % ('update', seconds / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Cost of building pickle frames for GraphitePickleClient, by frame size and
+pickle protocol.
+
+"dumps" is the previous implementation: pickle.dumps() then prepending the
+length header, which copies the payload a second time. "stream" pickles into
+a buffer holding room for the header and patches it in place.
+
+    $ python benchmarks/bench_pickle.py
+"""
+import pickle
+import struct
+import timeit
+
+from graphitesend.graphitesend import GraphitePickleClient
+
+SIZES = [10, 100, 1000, 10000]
+
+
+def dumps_frame(tpl_list, protocol):
+    payload = pickle.dumps(tpl_list, protocol)
+    return struct.pack("!L", len(payload)) + payload
+
+
+def main():
+    print("%-8s %-8s %12s %12s %10s" % ("metrics", "protocol", "dumps us",
+                                        "stream us", "bytes"))
+    for protocol in sorted(set([0, 2, pickle.HIGHEST_PROTOCOL])):
+        client = GraphitePickleClient(dryrun=True, pickle_protocol=protocol)
+        for size in SIZES:
+            message = "".join("metric.%d %f %d\n" % (i, i, 1500000000)
+                              for i in range(size))
+            tpl_list = client._parse_message(message)
+            number = max(1, 20000 // size)
+
+            dumps = min(timeit.repeat(
+                lambda: dumps_frame(tpl_list, protocol),
+                number=number, repeat=3)) / number
+            stream = min(timeit.repeat(
+                lambda: client._pickle_frame(tpl_list).getbuffer(),
+                number=number, repeat=3)) / number
+            frame_size = len(dumps_frame(tpl_list, protocol))
+            print("%-8d %-8d %12.1f %12.1f %10d" % (
+                size, protocol, dumps * 1e6, stream * 1e6, frame_size))
+
+
+if __name__ == '__main__':
+    main()
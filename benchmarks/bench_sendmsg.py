@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Throughput and peak memory of send_list() over TCP loopback, joining the
+batch into one string ("join") versus handing the lines to sendmsg()
+("vectored").
+
+    $ python benchmarks/bench_sendmsg.py
+"""
+import socket
+import threading
+import time
+import tracemalloc
+
+from graphitesend.graphitesend import GraphiteClient
+
+BATCHES = [100, 1000, 10000, 100000]
+
+
+def drain(server):
+    conn, _ = server.accept()
+    while conn.recv(1 << 20):
+        pass
+    conn.close()
+
+
+def run(vectored, data, rounds):
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    reader = threading.Thread(target=drain, args=(server,))
+    reader.start()
+
+    client = GraphiteClient(graphite_server='127.0.0.1',
+                            graphite_port=server.getsockname()[1],
+                            prefix='bench', system_name='host',
+                            vectored_writes=vectored)
+    tracemalloc.start()
+    start = time.time()
+    for _ in range(rounds):
+        client.send_list(data, timestamp=1500000000)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    client.disconnect()
+    reader.join()
+    server.close()
+    return elapsed, peak
+
+
+def main():
+    print("%-8s %-9s %14s %12s" % ("metrics", "mode", "metrics/s", "peak KiB"))
+    for size in BATCHES:
+        data = [('metric.%d' % i, i) for i in range(size)]
+        rounds = max(1, 200000 // size)
+        for vectored in (False, True):
+            elapsed, peak = run(vectored, data, rounds)
+            print("%-8d %-9s %14.0f %12.0f" % (
+                size, "vectored" if vectored else "join",
+                size * rounds / elapsed, peak / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
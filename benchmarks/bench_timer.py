@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Overhead of client.timer() per timed block, as a context manager and as a
+decorator, compared with the time.time() and send() idiom it replaces.
+The durations are recorded in the client's buffer, flushed to a dry run
+client every 10000 blocks.
+
+    $ python benchmarks/bench_timer.py
+"""
+import time
+import timeit
+
+from graphitesend.graphitesend import GraphiteClient
+
+NUMBER = 100000
+
+
+def per_block(function, client, number=NUMBER):
+    def run():
+        for _ in range(number // 10000):
+            for _ in range(10000):
+                function()
+            client.flush()
+    return min(timeit.repeat(run, number=1, repeat=3)) / number * 1e6
+
+
+def main():
+    client = GraphiteClient(dryrun=True, prefix='bench', system_name='host')
+    timer = client.timer('block')
+
+    def empty():
+        pass
+
+    def send_idiom():
+        start = time.time()
+        client.send('block', (time.time() - start) * 1000)
+
+    def context_manager():
+        with timer:
+            pass
+
+    decorated = timer(empty)
+
+    baseline = per_block(empty, client)
+    for name, function in (('time.time + send', send_idiom),
+                           ('with timer', context_manager),
+                           ('@timer', decorated)):
+        print("%-20s %6.2f us/block" % (
+            name, per_block(function, client) - baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Memory and connections used per subsystem, with one GraphiteClient per
+subsystem compared with views of a single client, all sending to a
+FakeCarbon.
+
+    $ python benchmarks/bench_views.py
+"""
+import gc
+import tracemalloc
+
+from graphitesend.graphitesend import GraphiteClient
+from graphitesend.testing import FakeCarbon
+
+SUBSYSTEMS = 200
+
+
+def measure(create):
+    carbon = FakeCarbon().start()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    clients = create(carbon.client_kwargs())
+    for client in clients:
+        client.send('metric', 1, 1)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    carbon.wait_for(len(clients))
+    connections = carbon.connections
+    for client in clients:
+        client.disconnect()
+    carbon.stop()
+    return used / len(clients), connections
+
+
+def clients(kwargs):
+    return [GraphiteClient(prefix='apps', group='sub%d' % n, system_name='',
+                           **kwargs) for n in range(SUBSYSTEMS)]
+
+
+def views(kwargs):
+    shared = GraphiteClient(prefix='apps', system_name='', **kwargs)
+    return [shared.view(prefix='apps', group='sub%d' % n, system_name='')
+            for n in range(SUBSYSTEMS)]
+
+
+def main():
+    for name, create in (('clients', clients), ('views', views)):
+        per_subsystem, connections = measure(create)
+        print("%-8s %8.0f bytes/subsystem %5d connections" % (
+            name, per_subsystem, connections))
+
+
+if __name__ == '__main__':
+    main()
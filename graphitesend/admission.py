@@ -0,0 +1,133 @@
+import random
+import time
+from collections import OrderedDict
+
+
+class TokenBucket(object):
+    '''Classic token bucket: `rate` tokens per second, holding up to `burst`.
+    '''
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst=None, now=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.tokens = self.burst
+        self.updated = now if now is not None else time.time()
+
+    def consume(self, now, tokens=1):
+        """
+        Take _tokens_ out of the bucket, return False if there are not enough.
+        """
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+class AdmissionControl(object):
+    '''Decide whether a metric may be sent, protecting carbon from code paths
+    that emit metrics in a tight loop.
+
+    Three checks are applied, cheapest first:
+
+    * probabilistic sampling, keeping `sample_rate` of all metrics
+    * a token bucket per metric prefix (the first `prefix_depth` dotted
+      components of the metric name)
+    * a global token bucket
+
+    Only `max_prefixes` prefix buckets are kept, the least recently used one
+    is dropped when a new prefix shows up.
+
+    :param rate: metrics per second allowed overall
+    :param burst: size of the global bucket
+    :type burst: Default: rate
+    :param prefix_rate: metrics per second allowed per prefix
+    :param prefix_burst: size of each prefix bucket
+    :type prefix_burst: Default: prefix_rate
+    :param prefix_depth: number of dotted components making the prefix
+    :type prefix_depth: Default: 1
+    :param sample_rate: fraction of the metrics to keep
+    :type sample_rate: Default: 1.0
+    :param scale_sampled: divide kept values by sample_rate, so that counts
+        add up to their unsampled totals
+    :type scale_sampled: True or False
+    '''
+
+    def __init__(self, rate=None, burst=None, prefix_rate=None,
+                 prefix_burst=None, prefix_depth=1, max_prefixes=1000,
+                 sample_rate=1.0, scale_sampled=False):
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in ]0, 1]")
+        self.sample_rate = sample_rate
+        self.scale_sampled = scale_sampled
+        self.global_bucket = None
+        if rate is not None:
+            self.global_bucket = TokenBucket(rate, burst)
+        self.prefix_rate = prefix_rate
+        self.prefix_burst = prefix_burst
+        self.prefix_depth = prefix_depth
+        self.max_prefixes = max_prefixes
+        self._buckets = OrderedDict()
+        self._random = random.random
+
+        self.admitted = 0
+        self.sampled_out = 0
+        self.rate_limited = 0
+        self.prefix_rate_limited = 0
+
+    def _prefix(self, metric):
+        return str(metric).split('.', self.prefix_depth)[:self.prefix_depth]
+
+    def _prefix_bucket(self, metric, now):
+        key = '.'.join(self._prefix(metric))
+        buckets = self._buckets
+        bucket = buckets.pop(key, None)
+        if bucket is None:
+            if len(buckets) >= self.max_prefixes:
+                buckets.popitem(last=False)
+            bucket = TokenBucket(self.prefix_rate, self.prefix_burst, now)
+        buckets[key] = bucket
+        return bucket
+
+    def admit(self, metric, now=None):
+        """
+        Return True if _metric_ may be sent now.
+        """
+        if self.sample_rate < 1 and self._random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        if now is None:
+            now = time.time()
+        if self.prefix_rate is not None:
+            if not self._prefix_bucket(metric, now).consume(now):
+                self.prefix_rate_limited += 1
+                return False
+        if self.global_bucket is not None:
+            if not self.global_bucket.consume(now):
+                self.rate_limited += 1
+                return False
+        self.admitted += 1
+        return True
+
+    def scale(self, value):
+        """
+        Scale a sampled value back up, when scale_sampled is set.
+        """
+        if not self.scale_sampled or self.sample_rate == 1:
+            return value
+        return float(value) / self.sample_rate
+
+    def stats(self):
+        return {
+            'admitted': self.admitted,
+            'sampled_out': self.sampled_out,
+            'rate_limited': self.rate_limited,
+            'prefix_rate_limited': self.prefix_rate_limited,
+            'sample_rate': self.sample_rate,
+            'active_prefixes': len(self._buckets),
+        }
@@ -0,0 +1,130 @@
+import logging
+
+try:
+    import gevent
+    import gevent.queue
+except ImportError:
+    gevent = False
+
+log = logging.getLogger("graphitesend")
+
+
+class AsyncWriter(object):
+    '''Single greenlet writing the messages of an asynchronous client.
+
+    Sends only queue the message and return. The writer greenlet is the only
+    one touching the socket: it takes everything waiting in the queue, up to
+    `max_coalesce_bytes`, and writes it at once. Send errors are handled
+    here, reconnecting when the client has autoreconnect, and counted since
+    there is no caller left to raise them to.
+
+    :param client: the GraphiteClient the messages are sent with
+    :param maxsize: maximum number of queued messages, further messages
+        are dropped
+    :type maxsize: Default: None, unbounded
+    :param max_coalesce_bytes: size above which queued messages are no
+        longer merged into the same write
+    :type max_coalesce_bytes: Default: 1048576
+    '''
+
+    def __init__(self, client, maxsize=None, max_coalesce_bytes=1048576):
+        self.client = client
+        self.max_coalesce_bytes = max_coalesce_bytes
+        self.queue = gevent.queue.JoinableQueue(maxsize)
+        self.greenlet = None
+        self.sent = 0
+        self.writes = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+
+    def put(self, message, reserved=0):
+        """
+        Queue a message, a string or a list of lines, holding _reserved_
+        bytes of the client memory budget.
+        """
+        if self.greenlet is None or self.greenlet.dead:
+            self.greenlet = gevent.spawn(self._run)
+        try:
+            self.queue.put_nowait((message, reserved))
+        except gevent.queue.Full:
+            self.dropped += 1
+            self.client._release(reserved)
+            return False
+        return True
+
+    def _take(self):
+        """
+        Wait for a message, then take the ones queued after it as long as
+        they fit in max_coalesce_bytes.
+        """
+        items = [self.queue.get()]
+        size = self._size(items[0][0])
+        while size < self.max_coalesce_bytes:
+            try:
+                item = self.queue.get_nowait()
+            except gevent.queue.Empty:
+                break
+            items.append(item)
+            size += self._size(item[0])
+        return items
+
+    @staticmethod
+    def _size(message):
+        if isinstance(message, list):
+            return sum(map(len, message))
+        return len(message)
+
+    def _run(self):
+        while True:
+            items = self._take()
+            lines = []
+            reserved = 0
+            for message, size in items:
+                if isinstance(message, list):
+                    lines.extend(message)
+                else:
+                    lines.append(message)
+                reserved += size
+            message = lines
+            if not self.client.vectored_writes:
+                message = "".join(lines)
+            try:
+                self._write(message)
+                self.sent += len(items)
+                self.writes += 1
+            except Exception as error:
+                self.errors += 1
+                self.dropped += len(items)
+                self.last_error = error
+                log.warning("graphitesend: dropped %d messages to %s: %s",
+                            len(items), self.client.addr, error)
+            finally:
+                self.client._release(reserved)
+                for _ in items:
+                    self.queue.task_done()
+
+    def _write(self, message):
+        client = self.client
+        if client._autoreconnect:
+            client._send_and_reconnect(message)
+        else:
+            client._send(message)
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued message has been written, or dropped.
+        Return False if _timeout_ expired first.
+        """
+        if self.greenlet is None:
+            return True
+        return self.queue.join(timeout)
+
+    def stats(self):
+        return {
+            'async_queued': self.queue.qsize(),
+            'async_sent': self.sent,
+            'async_writes': self.writes,
+            'async_dropped': self.dropped,
+            'async_errors': self.errors,
+        }
@@ -0,0 +1,76 @@
+import threading
+import time
+
+
+class MemoryBudget(object):
+    '''Account for the bytes graphitesend holds, buffered or in flight, and
+    cap them at `max_bytes`.
+
+    acquire() reserves room before data is kept around, release() gives it
+    back once the data has been written to the socket. A reservation larger
+    than the whole budget is let through when nothing else is reserved, so
+    that it cannot wait forever.
+
+    Waiting is done by polling with `sleep`, which can be gevent.sleep for
+    clients in asynchronous mode.
+
+    :param max_bytes: the budget
+    :param callback: called with (requested, used, max_bytes) every time a
+        reservation does not fit right away
+    '''
+
+    def __init__(self, max_bytes, callback=None, sleep=time.sleep):
+        self.max_bytes = int(max_bytes)
+        self.callback = callback
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.used = 0
+        self.peak = 0
+        self.waited = 0
+        self.rejected = 0
+
+    def _try_acquire(self, size):
+        with self._lock:
+            if self.used and self.used + size > self.max_bytes:
+                return False
+            self.used += size
+            if self.used > self.peak:
+                self.peak = self.used
+            return True
+
+    def acquire(self, size, block=True, timeout=None):
+        """
+        Reserve _size_ bytes. Return False if they do not fit, after waiting
+        up to _timeout_ seconds (forever if None) when _block_ is set.
+        """
+        if self._try_acquire(size):
+            return True
+        if self.callback is not None:
+            self.callback(size, self.used, self.max_bytes)
+        if block:
+            self.waited += 1
+            deadline = None if timeout is None else time.time() + timeout
+            delay = 0.001
+            while deadline is None or time.time() < deadline:
+                self._sleep(delay)
+                if self._try_acquire(size):
+                    return True
+                delay = min(delay * 2, 0.05)
+        self.rejected += 1
+        return False
+
+    def release(self, size):
+        """
+        Give back _size_ bytes reserved with acquire().
+        """
+        with self._lock:
+            self.used = max(0, self.used - size)
+
+    def stats(self):
+        return {
+            'buffer_bytes': self.used,
+            'buffer_peak_bytes': self.peak,
+            'buffer_max_bytes': self.max_bytes,
+            'backpressure_waits': self.waited,
+            'backpressure_rejected': self.rejected,
+        }
@@ -0,0 +1,135 @@
+import logging
+import time
+import zlib
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = False
+
+try:
+    import snappy
+except ImportError:
+    snappy = False
+
+log = logging.getLogger("graphitesend")
+
+# CPU time of the process, wall clock time on old pythons.
+_cpu_clock = getattr(time, 'process_time', time.time)
+
+
+class Compressor(object):
+    '''Base of the streaming compressors.
+
+    A compressor sees the batches of one connection, in order, and each call
+    to compress() returns everything needed for the receiver to decompress
+    that batch: the stream is flushed at every batch boundary. reset() is
+    called when a new connection starts a new stream.
+
+    The amount of data and CPU time spent are counted for the client stats.
+    '''
+
+    name = None
+
+    def __init__(self, level=None):
+        self.level = level
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        self.reset()
+
+    def reset(self):
+        pass
+
+    def _compress(self, data):
+        raise NotImplementedError
+
+    def compress(self, data):
+        start = _cpu_clock()
+        compressed = self._compress(data)
+        self.cpu_seconds += _cpu_clock() - start
+        self.bytes_in += len(data)
+        self.bytes_out += len(compressed)
+        return compressed
+
+    def stats(self):
+        return {
+            'compression': self.name,
+            'compression_bytes_in': self.bytes_in,
+            'compression_bytes_out': self.bytes_out,
+            'compression_ratio': (float(self.bytes_in) / self.bytes_out
+                                  if self.bytes_out else None),
+            'compression_cpu_seconds': self.cpu_seconds,
+        }
+
+
+class ZlibCompressor(Compressor):
+    '''zlib stream, sync flushed after every batch.'''
+
+    name = 'zlib'
+    wbits = zlib.MAX_WBITS
+
+    def reset(self):
+        level = self.level if self.level is not None else 6
+        self._stream = zlib.compressobj(level, zlib.DEFLATED, self.wbits)
+
+    def _compress(self, data):
+        return self._stream.compress(data) + \
+            self._stream.flush(zlib.Z_SYNC_FLUSH)
+
+
+class GzipCompressor(ZlibCompressor):
+    '''gzip stream, sync flushed after every batch.'''
+
+    name = 'gzip'
+    wbits = 16 + zlib.MAX_WBITS
+
+
+class Lz4Compressor(Compressor):
+    '''One lz4 frame per batch, needs the lz4 package.'''
+
+    name = 'lz4'
+
+    def _compress(self, data):
+        return lz4_frame.compress(data, compression_level=self.level or 0)
+
+
+class SnappyCompressor(Compressor):
+    '''snappy framing format stream, needs the python-snappy package.'''
+
+    name = 'snappy'
+
+    def reset(self):
+        self._stream = snappy.StreamCompressor()
+
+    def _compress(self, data):
+        return self._stream.add_chunk(data)
+
+
+compressors = {
+    'zlib': ZlibCompressor,
+    'gzip': GzipCompressor,
+    'lz4': Lz4Compressor,
+    'snappy': SnappyCompressor,
+}
+
+_available = {
+    'lz4': lambda: bool(lz4_frame),
+    'snappy': lambda: bool(snappy),
+}
+
+
+def get_compressor(name, level=None):
+    """
+    Return a new compressor for the codec _name_. Codecs whose library is
+    not installed fall back to zlib, with a warning.
+
+    :raises ValueError: When the codec is unknown.
+    """
+    if name not in compressors:
+        raise ValueError("Unknown compression '%s', must be one of: %s" %
+                         (name, ", ".join(sorted(compressors))))
+    if not _available.get(name, lambda: True)():
+        log.warning("%s compression is not installed, using zlib", name)
+        name = 'zlib'
+    return compressors[name](level)
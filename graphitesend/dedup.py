@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+
+
+class ChangeOnlyFilter(object):
+    '''Suppress metrics whose value has not changed since it was last sent.
+
+    A metric that keeps the same value is still let through once every
+    `heartbeat` seconds, so graphite does not show gaps for slowly changing
+    gauges.
+
+    The last sent value of each series is kept in an LRU ordered dict capped
+    at `max_series` entries. When the cap is reached the least recently sent
+    series is evicted, which only means its next value will be sent again.
+
+    :param heartbeat: resend an unchanged value after this many seconds
+    :type heartbeat: Default: 300
+    :param max_series: maximum number of series to remember
+    :type max_series: Default: 10000
+    '''
+
+    def __init__(self, heartbeat=300, max_series=10000):
+        self.heartbeat = heartbeat
+        self.max_series = max_series
+        self._last = OrderedDict()
+        self.suppressed = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._last)
+
+    def is_duplicate(self, key, value, now=None):
+        """
+        Return True if _value_ is the same as the one last sent for _key_ and
+        the heartbeat has not expired yet.
+        """
+        entry = self._last.get(key)
+        if entry is None:
+            return False
+        last_value, last_sent = entry
+        if last_value != value:
+            return False
+        if now is None:
+            now = time.time()
+        if self.heartbeat is not None and now - last_sent >= self.heartbeat:
+            return False
+        self.suppressed += 1
+        return True
+
+    def remember(self, key, value, now=None):
+        """
+        Record that _value_ was sent for _key_.
+        """
+        if now is None:
+            now = time.time()
+        last = self._last
+        if key in last:
+            del last[key]
+        elif len(last) >= self.max_series:
+            last.popitem(last=False)
+            self.evicted += 1
+        last[key] = (value, now)
+
+    def forget(self, key=None):
+        """
+        Drop the remembered value of _key_, or of every series if no key is
+        given, so that the next value is always sent.
+        """
+        if key is None:
+            self._last.clear()
+        else:
+            self._last.pop(key, None)
@@ -0,0 +1,248 @@
+import collections
+import itertools
+import multiprocessing
+import pickle
+import struct
+import threading
+
+try:
+    import queue
+except ImportError:  # python2
+    import Queue as queue
+
+
+class ChunkFormatter(object):
+    '''Turn a chunk of send_list() style tuples into the bytes sent to
+    carbon, plaintext lines or a pickle frame.
+
+    It is pickled once to every process of the pool, so it only holds the
+    formatter and plain settings.
+
+    :param formatter: the formatter of the client
+    :param timestamp: timestamp of the metrics that do not have one
+    :param tags: tags added to every metric
+    :param lowercase: lowercase the whole message, as the pickle client does
+    :param pickled: send a pickle frame instead of plaintext lines
+    :param pickle_protocol: protocol of the pickle frame
+    :type pickle_protocol: Default: the default protocol of this python
+    '''
+
+    def __init__(self, formatter, timestamp, tags=None, lowercase=False,
+                 pickled=False, pickle_protocol=None):
+        self.formatter = formatter
+        self.timestamp = timestamp
+        self.tags = tags
+        self.lowercase = lowercase
+        self.pickled = pickled
+        self.pickle_protocol = pickle_protocol
+
+    def lines(self, chunk):
+        formatter = self.formatter
+        tags = self.tags
+        for metric_info in chunk:
+            series_tags = tags
+            metric_timestamp = None
+            if len(metric_info) == 4:
+                (metric, value, metric_timestamp, metric_tags) = metric_info
+                if metric_tags:
+                    series_tags = dict(tags or {})
+                    series_tags.update(metric_tags)
+            elif len(metric_info) == 3:
+                (metric, value, metric_timestamp) = metric_info
+            else:
+                (metric, value) = metric_info
+            if metric_timestamp is None:
+                metric_timestamp = self.timestamp
+            if series_tags:
+                yield formatter(metric, value, metric_timestamp,
+                                tags=series_tags)
+            else:
+                yield formatter(metric, value, metric_timestamp)
+
+    def __call__(self, chunk):
+        message = "".join(self.lines(chunk))
+        if self.lowercase:
+            message = message.lower()
+        if not self.pickled:
+            return message.encode("ascii")
+        tpl_list = []
+        for line in message.splitlines():
+            (path, value, timestamp) = line.split()
+            tpl_list.append((path, (float(timestamp), value)))
+        payload = pickle.dumps(tpl_list, self.pickle_protocol)
+        return struct.pack("!L", len(payload)) + payload
+
+
+_chunk_formatter = None
+
+
+def _init_worker(chunk_formatter):
+    global _chunk_formatter
+    _chunk_formatter = chunk_formatter
+
+
+def _format_chunk(chunk):
+    return _chunk_formatter(chunk)
+
+
+def _format_chunk_or_error(chunk):
+    # Callbacks of apply_async() do not see errors on python2, return them.
+    try:
+        return _chunk_formatter(chunk)
+    except Exception as error:
+        return error
+
+
+def chunked(data, chunk_size):
+    """
+    Split the iterable _data_ into lists of _chunk_size_ items.
+    """
+    iterator = iter(data)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Sender(threading.Thread):
+    '''Thread writing formatted chunks to one connection, so the network
+    writes of several connections overlap with each other and with the
+    formatting.
+    '''
+
+    def __init__(self, write, maxsize):
+        super(Sender, self).__init__()
+        self.daemon = True
+        self.write = write
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+
+    def run(self):
+        while True:
+            payload = self.queue.get()
+            if payload is None:
+                return
+            if self.error is not None:
+                continue
+            try:
+                self.write(payload)
+            except Exception as error:
+                self.error = error
+
+
+class BulkExporter(object):
+    '''Format a very large iterable of metrics on a pool of processes, and
+    write the resulting chunks to one or more connections.
+
+    The input is consumed lazily: at most `max_pending` chunks are being
+    formatted at any time, so memory does not grow with the size of the
+    export. With `ordered` the chunks are written in input order, otherwise
+    as soon as they are formatted. With several connections, the chunks are
+    spread round robin over them and the order only holds per connection.
+
+    :param writers: one callable(payload) writing bytes per connection
+    :param chunk_formatter: the ChunkFormatter run by the workers
+    :param processes: number of worker processes, 0 formats in the calling
+        process
+    :type processes: Default: the number of CPUs
+    :param chunk_size: number of metrics per chunk
+    :type chunk_size: Default: 10000
+    :param ordered: write the chunks in input order
+    :type ordered: Default: True
+    :param max_pending: number of chunks formatted ahead of the writes
+    :type max_pending: Default: twice the number of processes
+    '''
+
+    def __init__(self, writers, chunk_formatter, processes=None,
+                 chunk_size=10000, ordered=True, max_pending=None):
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if max_pending is None:
+            max_pending = 2 * max(processes, 1)
+        self.writers = writers
+        self.chunk_formatter = chunk_formatter
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.max_pending = max_pending
+        self.chunks = 0
+
+    def _formatted(self, data):
+        """
+        Yield the formatted chunks of _data_.
+        """
+        chunks = chunked(data, self.chunk_size)
+        if not self.processes:
+            for chunk in chunks:
+                yield self.chunk_formatter(chunk)
+            return
+
+        pool = multiprocessing.Pool(self.processes, _init_worker,
+                                    (self.chunk_formatter,))
+        try:
+            if self.ordered:
+                for payload in self._ordered(pool, chunks):
+                    yield payload
+            else:
+                for payload in self._unordered(pool, chunks):
+                    yield payload
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _ordered(self, pool, chunks):
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_format_chunk, (chunk,)))
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def _unordered(self, pool, chunks):
+        done = queue.Queue()
+        pending = 0
+        for chunk in chunks:
+            pool.apply_async(_format_chunk_or_error, (chunk,),
+                             callback=done.put)
+            pending += 1
+            if pending >= self.max_pending:
+                yield self._result(done.get())
+                pending -= 1
+        while pending:
+            yield self._result(done.get())
+            pending -= 1
+
+    @staticmethod
+    def _result(result):
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def run(self, data):
+        """
+        Export _data_, return the number of chunks written. The first write
+        error is raised once every sender has stopped.
+        """
+        senders = [Sender(write, self.max_pending) for write in self.writers]
+        for sender in senders:
+            sender.start()
+        formatted = self._formatted(data)
+        try:
+            for payload, sender in zip(formatted, itertools.cycle(senders)):
+                if sender.error is not None:
+                    break
+                sender.queue.put(payload)
+                self.chunks += 1
+        finally:
+            formatted.close()
+            for sender in senders:
+                sender.queue.put(None)
+            for sender in senders:
+                sender.join()
+        for sender in senders:
+            if sender.error is not None:
+                raise sender.error
+        return self.chunks
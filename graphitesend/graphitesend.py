@@ -5,27 +5,63 @@ try:
 except ImportError:
     gevent = False
 
+import io
+import logging
 import pickle
 import socket
 import struct
+import threading
 import time
 import random
 
+from .admission import AdmissionControl
+from .asynchronous import AsyncWriter
+from .buffering import MemoryBudget
+from .compression import get_compressor
+from .dedup import ChangeOnlyFilter
+from .export import BulkExporter, ChunkFormatter
 from .formatter import GraphiteStructuredFormatter
+from .lastvalue import LastValueCache
+from .names import InvalidMetricName  # noqa
+from .registry import MetricHandle
+from .replay import ReplayRing
+from .resolver import CachingResolver
+from .scheduler import AdaptiveFlushScheduler, FlushThread
+from .timing import Timer
+from .tracing import Tracer
+from .transport import (apply_socket_options, corked, read_socket_options,
+                        sendmsg_all, split_datagrams)
+from .view import ClientView
+
+log = logging.getLogger("graphitesend")
 
 _module_instance = None
 
 default_graphite_pickle_port = 2004
 default_graphite_plaintext_port = 2003
 default_graphite_server = 'graphite'
+default_datagram_size = 32768
+
+transports = ['tcp', 'unix_stream', 'unix_dgram']
 
 VERSION = "0.10.0"
 
 
+# Returned instead of sending when the memory budget is exhausted and the
+# backpressure policy is 'would_block'.
+WOULD_BLOCK = 'would_block'
+
+backpressure_policies = ['block', 'raise', 'would_block']
+
+
 class GraphiteSendException(Exception):
     pass
 
 
+class GraphiteBackpressureException(GraphiteSendException):
+    pass
+
+
 class GraphiteClient(object):
     """
     Graphite Client that will setup a TCP connection to graphite.
@@ -36,7 +72,9 @@ class GraphiteClient(object):
     :type graphite_server: Default: graphite
     :param graphite_port: TCP port we will connect to
     :type graphite_port: Default: 2003
-    :param debug: Toggle debug messages
+    :param debug: Log a summary of every batch sent, even if the
+        "graphitesend" logger was not enabled for debug when the client
+        was created
     :type debug: True or False
     :param group: string added to after system_name and before metric name
     :param system_name: FDQN of the system generating the metrics
@@ -49,8 +87,106 @@ class GraphiteClient(object):
     :type dryrun: True or False
     :param timeout_in_seconds: Number of seconds before a connection is timed out.
     :param asynchronous: Send messages asynchronouly via gevent (You have to monkey patch sockets for it to work)
+    :param async_queue_size: Number of messages the asynchronous writer
+        queues before dropping new ones
+    :type async_queue_size: Default: None, unbounded
     :param clean_metric_name: Does GraphiteClient needs to clean metric's name
     :type clean_metric_name: True or False
+    :param strict_metric_names: Reject metric names that would need
+        cleaning, instead of cleaning them
+    :type strict_metric_names: True or False
+    :param validate_metric_names: Also transliterate Unicode, replace the
+        characters graphite cannot store (whitespace, control characters,
+        ';') and remove empty path components when cleaning metric names
+    :type validate_metric_names: True or False
+    :param dedup: Only send a metric when its value has changed
+    :type dedup: True or False
+    :param dedup_heartbeat: Seconds after which an unchanged value is sent anyway
+    :type dedup_heartbeat: Default: 300
+    :param dedup_max_series: Number of series whose last value is remembered
+    :type dedup_max_series: Default: 10000
+    :param rate_limit: Maximum number of metrics sent per second
+    :param rate_limit_burst: Number of metrics that can be sent in a burst
+    :type rate_limit_burst: Default: rate_limit
+    :param prefix_rate_limit: Maximum number of metrics sent per second for
+        each metric prefix
+    :param prefix_rate_limit_burst: Burst allowed for each metric prefix
+    :type prefix_rate_limit_burst: Default: prefix_rate_limit
+    :param rate_limit_prefix_depth: Number of dotted components in a prefix
+    :type rate_limit_prefix_depth: Default: 1
+    :param sample_rate: Fraction of the metrics that are actually sent
+    :type sample_rate: Default: 1.0
+    :param sample_scale: Divide sampled values by sample_rate
+    :type sample_scale: True or False
+    :param timestamp_interval: Align timestamps on multiples of this many
+        seconds, the retention step of the whisper files
+    :param vectored_writes: Hand the lines of a batch to sendmsg() instead of
+        joining them into a single string first
+    :type vectored_writes: True or False
+    :param tcp_nodelay: Disable Nagle's algorithm
+    :type tcp_nodelay: True or False
+    :param send_buffer_size: Size in bytes of the kernel send buffer
+    :param keepalive: Seconds of idleness before TCP keepalive probes are
+        sent, so that dead connections are noticed
+    :param tcp_cork: Cork the socket while a batch is written
+    :type tcp_cork: True or False
+
+    :param transport: How to reach the carbon server, 'tcp' or 'unix_stream'
+        and 'unix_dgram' for a local relay listening on a unix socket
+    :type transport: Default: 'tcp'
+    :param unix_socket_path: Path of the unix socket of the local relay
+    :param datagram_size: Maximum size of the datagrams sent with
+        'unix_dgram', batches are split on line boundaries to fit
+    :type datagram_size: Default: 32768
+    :param dns_cache_ttl: Seconds the addresses of graphite_server are kept,
+        instead of being looked up again on every reconnect
+    :type dns_cache_ttl: Default: 60
+    :param resolver: Object resolving graphite_server, see CachingResolver
+    :param compression: Compress the stream, for relays that accept it:
+        'zlib', 'gzip', 'lz4' or 'snappy'. Without the lz4 or snappy
+        package, zlib is used instead.
+    :param compression_level: Level passed to the compression codec
+    :param max_buffer_bytes: Budget of memory for the metrics buffered by
+        record() or waiting to be written to the socket
+    :type max_buffer_bytes: Default: None, unbounded
+    :param backpressure: What happens to a send that does not fit in the
+        budget: 'block' until there is room, 'raise' a
+        GraphiteBackpressureException, or 'would_block' to return
+        WOULD_BLOCK without sending
+    :type backpressure: Default: 'block'
+    :param backpressure_timeout: Seconds 'block' waits before raising
+    :type backpressure_timeout: Default: None, wait forever
+    :param on_backpressure: Called with (requested, used, max_bytes) when a
+        send does not fit in the budget
+    :param max_batch_bytes: send_list() sends its batch in pieces of that
+        many bytes, so that huge iterables are never fully materialized
+    :type max_batch_bytes: Default: max_buffer_bytes / 4 with a budget,
+        otherwise unbounded
+    :param replay_bytes: Keep this many of the last bytes written, and write
+        them again after a reconnect, so what was in flight when the
+        connection died is delivered at least once
+    :param replay_seconds: Keep what was written in the last seconds for
+        replay, alone or on top of replay_bytes
+    :param adaptive_flush: Flush the buffer of record() from a background
+        thread, tuning the flush interval and batch size to the observed
+        write duration and input rate. True, or an AdaptiveFlushScheduler
+        for other bounds
+    :param flush_target_delay: Seconds between record() and the write that
+        adaptive_flush aims for
+    :type flush_target_delay: Default: 1.0
+    :param last_values: Remember the last value and timestamp sent for
+        every series, for last() to return them
+    :type last_values: True or False
+    :param last_values_max_series: Number of series whose last value is
+        remembered, the least recently sent are forgotten first
+    :type last_values_max_series: Default: 10000
+    :param max_metric_handles: Number of handles kept by metric() and
+        timer(). The cache is emptied once full, handles already returned
+        keep working
+    :type max_metric_handles: Default: 10000
+
+    The socket options left to None take the value of
+    default_socket_options, which depends on the type of client.
     It will then send any metrics that you give it via
     the .send() or .send_dict().
 
@@ -76,12 +212,36 @@ class GraphiteClient(object):
 
     """
 
+    # Socket options used when they are not given to the constructor.
+    default_socket_options = {
+        'tcp_nodelay': None,
+        'send_buffer_size': None,
+        'keepalive': None,
+        'tcp_cork': False,
+    }
+
     def __init__(self, prefix=None, graphite_server=None, graphite_port=2003,
                  timeout_in_seconds=2, debug=False, group=None,
                  system_name=None, suffix=None, lowercase_metric_names=False,
                  connect_on_create=True, fqdn_squash=False,
                  dryrun=False, asynchronous=False, autoreconnect=False,
-                 clean_metric_name=True):
+                 clean_metric_name=True, dedup=False, dedup_heartbeat=300,
+                 dedup_max_series=10000, rate_limit=None,
+                 rate_limit_burst=None, prefix_rate_limit=None,
+                 prefix_rate_limit_burst=None, rate_limit_prefix_depth=1,
+                 sample_rate=1.0, sample_scale=False,
+                 timestamp_interval=None, vectored_writes=False,
+                 tcp_nodelay=None, send_buffer_size=None, keepalive=None,
+                 tcp_cork=None, transport='tcp', unix_socket_path=None,
+                 datagram_size=default_datagram_size, dns_cache_ttl=60,
+                 resolver=None, compression=None, compression_level=None,
+                 max_buffer_bytes=None, backpressure='block',
+                 backpressure_timeout=None, on_backpressure=None,
+                 max_batch_bytes=None, async_queue_size=None,
+                 replay_bytes=None, replay_seconds=None, adaptive_flush=None,
+                 flush_target_delay=1.0, last_values=False,
+                 last_values_max_series=10000, strict_metric_names=False,
+                 max_metric_handles=10000, validate_metric_names=False):
         """
         setup the connection to the graphite server and work out the
         prefix.
@@ -91,11 +251,34 @@ class GraphiteClient(object):
 
         """
 
+        if transport not in transports:
+            raise GraphiteSendException(
+                "Invalid transport '%s', must be one of: %s" %
+                (transport, ", ".join(transports)))
+        self.transport = transport
+        self.datagram_size = datagram_size
+
+        self.compressor = None
+        if compression:
+            if transport == 'unix_dgram':
+                raise GraphiteSendException(
+                    "Compression needs a stream transport")
+            try:
+                self.compressor = get_compressor(compression,
+                                                 compression_level)
+            except ValueError as error:
+                raise GraphiteSendException(str(error))
+
         # If we are not passed a host, then use the graphite server defined
         # in the module.
         if not graphite_server:
             graphite_server = default_graphite_server
         self.addr = (graphite_server, graphite_port)
+        if transport != 'tcp':
+            if not unix_socket_path and not dryrun:
+                raise GraphiteSendException(
+                    "The %s transport needs a unix_socket_path" % transport)
+            self.addr = unix_socket_path
 
         # If this is a dry run, then we do not want to configure a connection
         # or try and make the connection once we create the object.
@@ -105,24 +288,119 @@ class GraphiteClient(object):
             graphite_server = None
             connect_on_create = False
 
+        if resolver is None:
+            resolver = CachingResolver(ttl=dns_cache_ttl)
+        self.resolver = resolver
+        self.connected_addr = None
+
+        self.socket_options = dict(self.default_socket_options)
+        for option, value in (('tcp_nodelay', tcp_nodelay),
+                              ('send_buffer_size', send_buffer_size),
+                              ('keepalive', keepalive),
+                              ('tcp_cork', tcp_cork)):
+            if value is not None:
+                self.socket_options[option] = value
+
+        self.replay = None
+        if replay_bytes is not None or replay_seconds is not None:
+            self.replay = ReplayRing(max_bytes=replay_bytes,
+                                     max_age=replay_seconds)
+
         # Only connect to the graphite server and port if we tell you too.
         # This is mostly used for testing.
+        self.socket = None
         self.timeout_in_seconds = int(timeout_in_seconds)
         if connect_on_create:
             self.connect()
 
         self.debug = debug
+        self.trace = Tracer(log, force=debug)
         self.lastmessage = None
 
+        if adaptive_flush and asynchronous:
+            raise GraphiteSendException(
+                "adaptive_flush is not available in asynchronous mode")
+
         self.asynchronous = False
+        self.writer = None
         if asynchronous:
             self.asynchronous = self.enable_asynchronous()
+            if gevent:
+                self.writer = AsyncWriter(self, maxsize=async_queue_size)
+
+        if backpressure not in backpressure_policies:
+            raise GraphiteSendException(
+                "Invalid backpressure '%s', must be one of: %s" %
+                (backpressure, ", ".join(backpressure_policies)))
+        self.backpressure = backpressure
+        self.backpressure_timeout = backpressure_timeout
+        self.budget = None
+        if max_buffer_bytes:
+            sleep = time.sleep
+            if self.asynchronous and gevent:
+                sleep = gevent.sleep
+            self.budget = MemoryBudget(max_buffer_bytes,
+                                       callback=on_backpressure, sleep=sleep)
+            if max_batch_bytes is None:
+                max_batch_bytes = max(1, int(max_buffer_bytes) // 4)
+        self.max_batch_bytes = max_batch_bytes
+        self._pending_bytes = 0
         self._autoreconnect = autoreconnect
 
+        self.rejected_metrics = 0
+        self.dedup = None
+        if dedup:
+            self.dedup = ChangeOnlyFilter(heartbeat=dedup_heartbeat,
+                                          max_series=dedup_max_series)
+
+        self.last_values = None
+        if last_values:
+            self.last_values = LastValueCache(
+                max_series=last_values_max_series)
+
+        self.admission = None
+        if (rate_limit is not None or prefix_rate_limit is not None or
+                sample_rate != 1):
+            try:
+                self.admission = AdmissionControl(
+                    rate=rate_limit, burst=rate_limit_burst,
+                    prefix_rate=prefix_rate_limit,
+                    prefix_burst=prefix_rate_limit_burst,
+                    prefix_depth=rate_limit_prefix_depth,
+                    sample_rate=sample_rate, scale_sampled=sample_scale)
+            except ValueError as error:
+                raise GraphiteSendException(str(error))
+
+        self._registry = {}
+        self.max_metric_handles = max_metric_handles
+        self._pending = []
+        self._pending_sent = []
+        self.vectored_writes = vectored_writes
+        self.vectored_chunk_lines = 256
+
         self.formatter = GraphiteStructuredFormatter(prefix=prefix, group=group,
                                                      system_name=system_name, suffix=suffix,
                                                      lowercase_metric_names=lowercase_metric_names, fqdn_squash=fqdn_squash,
-                                                     clean_metric_name=clean_metric_name)
+                                                     clean_metric_name=clean_metric_name,
+                                                     timestamp_interval=timestamp_interval,
+                                                     strict_metric_names=strict_metric_names,
+                                                     validate_metric_names=validate_metric_names)
+
+        self.scheduler = None
+        self.flush_thread = None
+        self._write_lock = None
+        self._buffer_lock = None
+        self._pending_since = None
+        if adaptive_flush:
+            self.scheduler = adaptive_flush
+            if not isinstance(adaptive_flush, AdaptiveFlushScheduler):
+                self.scheduler = AdaptiveFlushScheduler(
+                    target_delay=flush_target_delay)
+            # The buffer and the socket are now shared with the thread.
+            self._write_lock = threading.RLock()
+            self._buffer_lock = threading.Lock()
+            self.flush_thread = FlushThread(self)
+            self.flush_thread.start()
 
     @property
     def prefix(self):
@@ -145,32 +423,106 @@ class GraphiteClient(object):
         '''
         return self.formatter.lowercase_metric_names
 
-    def connect(self):
+    def _new_socket(self, family=socket.AF_INET):
         """
-        Make a TCP connection to the graphite server on port self.port
+        Create the socket matching the transport.
         """
-        self.socket = socket.socket()
-        self.socket.settimeout(self.timeout_in_seconds)
-        try:
-            self.socket.connect(self.addr)
-        except socket.timeout:
+        if self.transport == 'unix_stream':
+            return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.transport == 'unix_dgram':
+            return socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        return socket.socket(family, socket.SOCK_STREAM)
+
+    def _connect_targets(self):
+        """
+        Return the (family, address) pairs to try to connect to, in order.
+        """
+        if self.addr is None:
             raise GraphiteSendException(
-                "Took over %d second(s) to connect to %s" %
-                (self.timeout_in_seconds, self.addr))
+                "No graphite server to connect to in dryrun mode")
+        if self.transport != 'tcp':
+            return [(socket.AF_UNIX, self.addr)]
+        try:
+            addresses = self.resolver.resolve(*self.addr)
         except socket.gaierror:
             raise GraphiteSendException(
                 "No address associated with hostname %s:%s" % self.addr)
-        except Exception as error:
+        return [(address[0], address[4]) for address in addresses]
+
+    def connect(self):
+        """
+        Make a TCP connection to the graphite server on port self.port, or
+        connect to the unix socket of a local relay.
+
+        All the addresses of the graphite server are tried in turn. If none
+        of them accepts the connection, they are dropped from the DNS cache
+        so that the next attempt looks the name up again.
+        """
+        self.socket = None
+        error = None
+        for family, address in self._connect_targets():
+            sock = self._new_socket(family)
+            sock.settimeout(self.timeout_in_seconds)
+            try:
+                apply_socket_options(sock, self.socket_options)
+                sock.connect(address)
+            except Exception as connect_error:
+                error = connect_error
+                sock.close()
+                continue
+            self.socket = sock
+            self.connected_addr = address
+            # A new connection is a new compressed stream.
+            if self.compressor is not None:
+                self.compressor.reset()
+            return self.socket
+
+        if self.transport == 'tcp':
+            self.resolver.invalidate(*self.addr)
+
+        if isinstance(error, socket.timeout):
             raise GraphiteSendException(
-                "unknown exception while connecting to %s - %s" %
-                (self.addr, error)
-            )
+                "Took over %d second(s) to connect to %s" %
+                (self.timeout_in_seconds, self.addr))
+        raise GraphiteSendException(
+            "unknown exception while connecting to %s - %s" %
+            (self.addr, error)
+        )
 
-        return self.socket
+    def effective_socket_options(self):
+        """
+        Return the socket options as the kernel applied them, or None when
+        not connected.
+        """
+        if not self.socket:
+            return None
+        return read_socket_options(self.socket)
 
     def reconnect(self):
+        if self._write_lock is None:
+            return self._reconnect()
+        # The flush thread must not write between the disconnect and the
+        # replay.
+        with self._write_lock:
+            return self._reconnect()
+
+    def _reconnect(self):
         self.disconnect()
         self.connect()
+        if self.replay is not None:
+            self._replay()
+
+    def _replay(self):
+        """
+        Write the replay window again on the new connection.
+        """
+        try:
+            for data in self.replay.replay():
+                self._write_raw(data)
+        except socket.error as error:
+            raise GraphiteSendException(
+                "Failed to replay %d bytes to %s, with error: %s" %
+                (self.replay.size, self.addr, error))
 
     def autoreconnect(self, sleep=1, attempt=3, exponential=True, jitter=5):
         """
@@ -218,6 +570,16 @@ class GraphiteClient(object):
         """
         return self.formatter.clean_metric_name(metric_name)
 
+    def refresh_tracing(self):
+        """
+        Pick up a change of the logging configuration made after the client
+        was created.
+        """
+        self.trace.refresh()
+        trace = getattr(self.formatter, 'trace', None)
+        if trace is not None:
+            trace.refresh()
+
     def disconnect(self):
         """
         Close the TCP connection with the graphite server.
@@ -235,32 +597,119 @@ class GraphiteClient(object):
         finally:
             self.socket = None
 
-    def _dispatch_send(self, message):
+    def _reserve(self, size):
+        """
+        Reserve _size_ bytes of the memory budget, applying the backpressure
+        policy when they do not fit. Return False for the would_block
+        policy, raise GraphiteBackpressureException for the others.
+        """
+        if self.budget is None:
+            return True
+        block = self.backpressure == 'block'
+        if self.budget.acquire(size, block, self.backpressure_timeout):
+            return True
+        if self.backpressure == 'would_block':
+            return False
+        raise GraphiteBackpressureException(
+            "%d bytes do not fit in the %d bytes buffer budget (%d used)" %
+            (size, self.budget.max_bytes, self.budget.used))
+
+    def _release(self, size):
+        if self.budget is not None and size:
+            self.budget.release(size)
+
+    def _send_and_release(self, sending_function, message, reserved):
+        try:
+            if self._write_lock is None:
+                sending_function(message)
+            else:
+                with self._write_lock:
+                    sending_function(message)
+        finally:
+            self._release(reserved)
+
+    def _dispatch_send(self, message, reserved=0):
         """
         Dispatch the different steps of sending
+
+        _reserved_ is the number of bytes of the memory budget already
+        reserved for _message_, they are released once it is sent.
         """
 
         if self.dryrun:
+            self._release(reserved)
+            if isinstance(message, list):
+                return "".join(message)
             return message
 
-        if not self.socket:
+        length = self._deliver(message, reserved)
+        if length == WOULD_BLOCK:
+            return WOULD_BLOCK
+
+        if isinstance(message, list):
+            # Only join as many lines as the preview needs.
+            preview = []
+            preview_length = 0
+            for line in message:
+                if preview_length >= 75:
+                    break
+                preview.append(line)
+                preview_length += len(line)
+            preview = "".join(preview)
+        else:
+            preview = message
+
+        return "sent {0} long message: {1}".format(length, preview[:75])
+
+    def _deliver(self, message, reserved=0):
+        """
+        Reserve, send and trace _message_, without building any description
+        of it. Return its length, or WOULD_BLOCK.
+        """
+
+        # With autoreconnect, _send_and_reconnect() gets a chance to open
+        # the connection that failed earlier.
+        if not self.socket and not self._autoreconnect:
+            self._release(reserved)
             raise GraphiteSendException(
                 "Socket was not created before send"
             )
 
+        if isinstance(message, list):
+            length = sum(map(len, message))
+        else:
+            length = len(message)
+
+        if self.budget is not None and not reserved:
+            if not self.budget.acquire(length, block=False):
+                # What record() buffered may be holding the budget, and
+                # only a flush releases it: flush before waiting.
+                if self._pending:
+                    self._flush_pending()
+                if not self._reserve(length):
+                    return WOULD_BLOCK
+            reserved = length
+
         sending_function = self._send
         if self._autoreconnect:
             sending_function = self._send_and_reconnect
 
         try:
-            if self.asynchronous and gevent:
-                gevent.spawn(sending_function, message)
+            if self.writer is not None:
+                self.writer.put(message, reserved)
             else:
-                sending_function(message)
+                self._send_and_release(sending_function, message, reserved)
         except Exception as e:
             self._handle_send_error(e)
 
-        return "sent {0} long message: {1}".format(len(message), message[:75])
+        if self.trace.enabled:
+            if isinstance(message, list):
+                count = len(message)
+            else:
+                count = message.count("\n")
+            self.trace.batch(count, length, addr=self.addr)
+
+        return length
 
     def _handle_send_error(self, error):
         if isinstance(error, socket.gaierror):
@@ -285,9 +734,53 @@ class GraphiteClient(object):
     def _send(self, message):
         """
         Given a message send it to the graphite server.
+
+        The message is either a string, or a list of lines when vectored
+        writes are enabled.
         """
+        if isinstance(message, list):
+            # Encode the lines by chunks, so no copy of the whole batch is
+            # ever made and sendmsg() gets a reasonable number of buffers.
+            chunk = self.vectored_chunk_lines
+            buffers = [
+                "".join(message[i:i + chunk]).encode("ascii")
+                for i in range(0, len(message), chunk)]
+            with corked(self.socket, self.socket_options['tcp_cork']):
+                self._write_buffers(buffers)
+        else:
+            with corked(self.socket, self.socket_options['tcp_cork']):
+                self._write(message.encode("ascii"))
 
-        self.socket.sendall(message.encode("ascii"))
+    def _write(self, data):
+        """
+        Write bytes down the socket, and keep them in the replay window.
+        """
+        self._write_raw(data)
+        if self.replay is not None:
+            self.replay.append(data)
+
+    def _write_raw(self, data):
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        if self.transport == 'unix_dgram':
+            for datagram in split_datagrams(data, self.datagram_size):
+                self.socket.send(datagram)
+        else:
+            self.socket.sendall(data)
+
+    def _write_buffers(self, buffers):
+        """
+        Write a list of bytes down the socket, without joining them when the
+        socket supports scatter-gather writes.
+        """
+        if self.transport != 'unix_dgram' and self.compressor is None and \
+                hasattr(self.socket, 'sendmsg'):
+            sendmsg_all(self.socket, buffers)
+            if self.replay is not None:
+                for data in buffers:
+                    self.replay.append(data)
+        else:
+            self._write(b"".join(buffers))
 
     def _send_and_reconnect(self, message):
         """Send _message_ to Graphite Server and attempt reconnect on failure.
@@ -299,12 +792,184 @@ class GraphiteClient(object):
         :raises socket.error: When the socket connection is no longer valid.
         """
         try:
-            self.socket.sendall(message.encode("ascii"))
+            self._send(message)
         except (AttributeError, socket.error):
             if not self.autoreconnect():
                 raise
             else:
-                self.socket.sendall(message.encode("ascii"))
+                self._send(message)
+
+    def _batch_timestamp(self, timestamp, now, formatter=None):
+        """
+        Snapshot the clock once for a whole batch, so every metric without a
+        timestamp of its own lands on the same whisper point. The timestamp
+        is aligned as _formatter_ will, so last() returns the one sent.
+        """
+        if timestamp is None:
+            timestamp = now
+        timestamp = int(timestamp)
+        interval = getattr(formatter, 'timestamp_interval', 0)
+        if interval:
+            timestamp -= timestamp % interval
+        return timestamp
+
+    def _series_key(self, metric, tags, formatter=None):
+        """
+        Identify a series, for the change-only filter, last() and metric(),
+        by the name it is sent as: the series_path() of its formatter, tags
+        included. The series of other formatters are named by the metric
+        between the prefix and suffix of the formatter, and told apart by
+        the formatter itself when it has no prefix.
+        """
+        if formatter is None:
+            formatter = self.formatter
+        series_path = getattr(formatter, 'series_path', None)
+        if series_path is not None:
+            return series_path(metric, tags)
+        if formatter is not self.formatter:
+            prefix = getattr(formatter, 'prefix', None)
+            if prefix is None:
+                return (metric, frozenset(tags.items()) if tags else
+                        frozenset(), formatter)
+            metric = "%s%s%s" % (prefix, metric,
+                                 getattr(formatter, 'suffix', ''))
+        if not tags:
+            return metric
+        return (metric, frozenset(tags.items()))
+
+    def _tracked_key(self, metric, tags, formatter):
+        """
+        Return the series key of a metric being sent, or None when neither
+        the change-only filter nor last() need it.
+        """
+        if self.dedup is None and self.last_values is None:
+            return None
+        return self._series_key(metric, tags, formatter)
+
+    def _merge_tags(self, tags, metric_tags):
+        """
+        Combine the tags given for a whole call with the ones given for a
+        single metric, the latter taking precedence.
+        """
+        if not metric_tags:
+            return tags
+        if not tags:
+            return metric_tags
+        merged = dict(tags)
+        merged.update(metric_tags)
+        return merged
+
+    def _format(self, formatter, metric, value, timestamp, tags):
+        """
+        Call the formatter, only passing tags along when there are some so
+        that formatters without tags support keep working.
+        """
+        if tags:
+            return formatter(metric, value, timestamp, tags=tags)
+        return formatter(metric, value, timestamp)
+
+    def _format_item(self, formatter, metric, value, timestamp, tags):
+        """
+        Format a metric of a batch. A metric the formatter rejects, for an
+        invalid name or value, is logged and counted, and None is returned
+        so the rest of the batch is still sent.
+        """
+        try:
+            return self._format(formatter, metric, value, timestamp, tags)
+        except ValueError as error:
+            self._reject(metric, error)
+            return None
+
+    def _reject(self, metric, error):
+        self.rejected_metrics += 1
+        log.warning("Rejected metric %r: %s", metric, error)
+
+    def _admit(self, metric, value, now, key=None):
+        """
+        Run a metric through the change-only filter and the admission
+        control, if they are enabled. _key_ identifies the series for the
+        change-only filter and defaults to the metric name. The change-only
+        filter compares _value_ before it is scaled for sampling.
+
+        Return the value to send, or None if the metric must be dropped.
+        """
+        if key is None:
+            key = metric
+        if self.dedup is not None and \
+                self.dedup.is_duplicate(key, value, now):
+            return None
+        if self.admission is not None:
+            if not self.admission.admit(metric, now):
+                return None
+            value = self.admission.scale(value)
+        return value
+
+    def stats(self):
+        """
+        Return the counters of the optional sending stages.
+        """
+        stats = {}
+        if self.rejected_metrics:
+            stats['rejected_metrics'] = self.rejected_metrics
+        if self.dedup is not None:
+            stats['dedup_series'] = len(self.dedup)
+            stats['dedup_suppressed'] = self.dedup.suppressed
+            stats['dedup_evicted'] = self.dedup.evicted
+        if self.last_values is not None:
+            stats.update(self.last_values.stats())
+        if self.admission is not None:
+            stats.update(self.admission.stats())
+        if self.compressor is not None:
+            stats.update(self.compressor.stats())
+        if self.budget is not None:
+            stats.update(self.budget.stats())
+        if self.writer is not None:
+            stats.update(self.writer.stats())
+        if self.replay is not None:
+            stats.update(self.replay.stats())
+        if self.scheduler is not None:
+            stats.update(self.scheduler.stats())
+        return stats
+
+    def _remember(self, sent, now):
+        """
+        Record the (series key, value given, value sent, timestamp) tuples
+        that made it to the socket. The change-only filter remembers the
+        value given, as it compares values before sampling scales them, and
+        last() returns the value sent.
+        """
+        if self.dedup is not None:
+            for key, raw, _, _ in sent:
+                self.dedup.remember(key, raw, now)
+        if self.last_values is not None:
+            for key, _, value, timestamp in sent:
+                self.last_values.update(key, value, timestamp)
+
+    def last(self, pattern=None):
+        """
+        Return the last value sent for every series matching a graphite
+        glob, as a dict of (value, timestamp) by series name. Requires
+        last_values=True.
+
+        What record() buffered only shows once it has been flushed.
+
+        Series are named as they were sent: prefix, cleaned metric name and
+        suffix, followed by the tags for a tagged series
+        ('metric;tag=value'), which are matched on their metric name.
+
+        .. code-block:: python
+
+          >>> g = init(last_values=True, prefix="app", system_name="")
+          >>> g.send("requests.get", 12, 1500000000)
+          >>> g.last("app.requests.*")
+          {'app.requests.get': (12, 1500000000)}
+
+        Without a pattern, every remembered series is returned.
+        """
+        if self.last_values is None:
+            raise GraphiteSendException(
+                "last() needs the client to be created with last_values=True")
+        return self.last_values.query(pattern)
 
     def _presend(self, message):
         """
@@ -313,7 +978,7 @@ class GraphiteClient(object):
         """
         return message
 
-    def send(self, metric, value, timestamp=None, formatter=None):
+    def send(self, metric, value, timestamp=None, formatter=None, tags=None):
         """
         Format a single metric/value pair, and send it to the graphite
         server.
@@ -326,25 +991,79 @@ class GraphiteClient(object):
         :type prefix: float or int
         :param formatter: option non-default formatter
         :type prefix: callable
+        :param tags: graphite 1.1 tags of the series
+        :type tags: dict
 
         .. code-block:: python
 
           >>> g = init()
           >>> g.send("metric", 54)
 
+        .. code-block:: python
+
+          >>> g = init()
+          >>> g.send("requests", 12, tags={"status": "200"})
+
         .. code-block:: python
 
           >>> g = init()
           >>> g.send(metric="metricname", value=73)
 
+        None is returned when the metric was dropped, either because dedup
+        is enabled and the value has not changed since it was last sent, or
+        because of the rate limits and sampling.
+
         """
         if formatter is None:
             formatter = self.formatter
-        message = formatter(metric, value, timestamp)
+        now = time.time()
+        key = self._tracked_key(metric, tags, formatter)
+        raw = value
+        value = self._admit(metric, value, now, key)
+        if value is None:
+            return None
+        timestamp = self._batch_timestamp(timestamp, now, formatter)
+        message = self._format(formatter, metric, value, timestamp, tags)
         message = self. _presend(message)
-        return self._dispatch_send(message)
+        response = self._dispatch_send(message)
+        if response != WOULD_BLOCK:
+            self._remember([(key, raw, value, timestamp)], now)
+        return response
 
-    def send_dict(self, data, timestamp=None, formatter=None):
+    def emit(self, metric, value, timestamp=None, tags=None, formatter=None):
+        """
+        Send a single metric/value pair, like send(), but without building
+        the "sent ... long message" description nobody reads.
+
+        Return True when the metric was sent (or dry run), None when it was
+        dropped by dedup or the rate limits, and WOULD_BLOCK when the memory
+        budget is full.
+
+        .. code-block:: python
+
+          >>> g = init()
+          >>> g.emit("metric", 54)
+          True
+
+        """
+        if formatter is None:
+            formatter = self.formatter
+        now = time.time()
+        key = self._tracked_key(metric, tags, formatter)
+        raw = value
+        value = self._admit(metric, value, now, key)
+        if value is None:
+            return None
+        timestamp = self._batch_timestamp(timestamp, now, formatter)
+        message = self._presend(
+            self._format(formatter, metric, value, timestamp, tags))
+        if not self.dryrun and self._deliver(message) == WOULD_BLOCK:
+            return WOULD_BLOCK
+        self._remember([(key, raw, value, timestamp)], now)
+        return True
+
+    def send_dict(self, data, timestamp=None, formatter=None, tags=None,
+                  metric_tags=None):
         """
         Format a dict of metric/values pairs, and send them all to the
         graphite server.
@@ -355,26 +1074,62 @@ class GraphiteClient(object):
         :type prefix: float or int
         :param formatter: option non-default formatter
         :type prefix: callable
+        :param tags: graphite 1.1 tags added to every metric
+        :type tags: dict
+        :param metric_tags: tags of individual metrics, by metric name
+        :type metric_tags: dict of dict
 
         .. code-block:: python
 
           >>> g = init()
           >>> g.send_dict({'metric1': 54, 'metric2': 43, 'metricN': 999})
 
+        .. code-block:: python
+
+          >>> g = init()
+          >>> g.send_dict({'rx': 54, 'tx': 43}, tags={'iface': 'eth0'},
+          ...             metric_tags={'rx': {'unit': 'packets'}})
+
         """
         if formatter is None:
             formatter = self.formatter
 
+        now = time.time()
+        timestamp = self._batch_timestamp(timestamp, now, formatter)
         metric_list = []
+        sent = []
+        rejected = self.rejected_metrics
 
         for metric, value in data.items():
-            tmp_message = formatter(metric, value, timestamp)
+            series_tags = tags
+            if metric_tags:
+                series_tags = self._merge_tags(tags, metric_tags.get(metric))
+            try:
+                key = self._tracked_key(metric, series_tags, formatter)
+            except ValueError as error:
+                self._reject(metric, error)
+                continue
+            raw = value
+            value = self._admit(metric, value, now, key)
+            if value is None:
+                continue
+            tmp_message = self._format_item(formatter, metric, value,
+                                            timestamp, series_tags)
+            if tmp_message is None:
+                continue
             metric_list.append(tmp_message)
+            sent.append((key, raw, value, timestamp))
+
+        # Everything was suppressed by the change-only filter or the
+        # admission control, or rejected.
+        if not metric_list and (self.dedup is not None or
+                                self.admission is not None or
+                                self.rejected_metrics != rejected):
+            return None
 
-        message = "".join(metric_list)
-        return self._dispatch_send(message)
+        return self._send_batch(metric_list, sent, now)
 
-    def send_list(self, data, timestamp=None, formatter=None):
+    def send_list(self, data, timestamp=None, formatter=None, tags=None):
         """
 
         Format a list of set's of (metric, value) pairs, and send them all
@@ -386,22 +1141,38 @@ class GraphiteClient(object):
         :type prefix: float or int
         :param formatter: option non-default formatter
         :type prefix: callable
+        :param tags: graphite 1.1 tags added to every metric
+        :type tags: dict
 
         .. code-block:: python
 
           >>> g = init()
           >>> g.send_list([('metric1', 54),('metric2', 43, 1384418995)])
 
+        Tags of a single metric are given as a fourth item, its timestamp
+        can then be None to use the default one.
+
+        .. code-block:: python
+
+          >>> g = init()
+          >>> g.send_list([('rx', 54, None, {'iface': 'eth0'})],
+          ...             tags={'unit': 'packets'})
+
+        _data_ can be any iterable. With max_batch_bytes set, the metrics are
+        sent in batches of that size as the iterable is consumed, and the
+        response of the last batch is returned.
+
         """
         if formatter is None:
             formatter = self.formatter
 
-        if timestamp is None:
-            timestamp = int(time.time())
-        else:
-            timestamp = int(timestamp)
-
+        now = time.time()
+        timestamp = self._batch_timestamp(timestamp, now, formatter)
         metric_list = []
+        sent = []
+        rejected = self.rejected_metrics
+        batch_bytes = 0
+        response = None
 
         for metric_info in data:
 
@@ -410,17 +1181,383 @@ class GraphiteClient(object):
             # If the metric_info provides a timestamp then use the timestamp.
             # If the metric_info fails to provide a timestamp, use the one
             # provided to send_list() or generated on the fly by time.time()
-            if len(metric_info) == 3:
+            # A fourth item holds the tags of that metric.
+            series_tags = tags
+            if len(metric_info) == 4:
+                (metric, value, metric_timestamp, metric_tags) = metric_info
+                series_tags = self._merge_tags(tags, metric_tags)
+            elif len(metric_info) == 3:
                 (metric, value, metric_timestamp) = metric_info
             else:
                 (metric, value) = metric_info
-                metric_timestamp = timestamp
+                metric_timestamp = None
+            metric_timestamp = self._batch_timestamp(metric_timestamp,
+                                                     timestamp, formatter)
 
-            tmp_message = formatter(metric, value, metric_timestamp)
+            try:
+                key = self._tracked_key(metric, series_tags, formatter)
+            except ValueError as error:
+                self._reject(metric, error)
+                continue
+            raw = value
+            value = self._admit(metric, value, now, key)
+            if value is None:
+                continue
+            tmp_message = self._format_item(formatter, metric, value,
+                                            metric_timestamp, series_tags)
+            if tmp_message is None:
+                continue
             metric_list.append(tmp_message)
+            sent.append((key, raw, value, metric_timestamp))
+
+            if self.max_batch_bytes:
+                batch_bytes += len(tmp_message)
+                if batch_bytes >= self.max_batch_bytes:
+                    response = self._send_batch(metric_list, sent, now)
+                    if response == WOULD_BLOCK:
+                        return response
+                    metric_list = []
+                    sent = []
+                    batch_bytes = 0
+
+        # Everything was suppressed by the change-only filter or the
+        # admission control, rejected, or already sent.
+        if not metric_list and (self.dedup is not None or
+                                self.admission is not None or
+                                self.rejected_metrics != rejected or
+                                response is not None):
+            return response
+
+        return self._send_batch(metric_list, sent, now)
+
+    def _send_batch(self, metric_list, sent, now):
+        """
+        Send formatted lines as one message, and remember the (series key,
+        value given, value sent, timestamp) tuples in _sent_.
+        """
+        message = metric_list
+        if not self.vectored_writes:
+            message = "".join(metric_list)
+        response = self._dispatch_send(message)
+        if response != WOULD_BLOCK:
+            self._remember(sent, now)
+        return response
+
+    def bulk_export(self, data, timestamp=None, tags=None, processes=None,
+                    chunk_size=10000, ordered=True, senders=None,
+                    formatter=None):
+        """
+        Send a very large iterable of metrics, like send_list(), formatting
+        chunks of it on a pool of processes while they are written.
+
+        :param data: iterable of (metric, value[, timestamp[, tags]])
+        :param timestamp: epoch time of the metrics that do not have one
+        :param tags: graphite 1.1 tags added to every metric
+        :param processes: number of formatting processes, 0 formats in this
+            process
+        :type processes: Default: the number of CPUs
+        :param chunk_size: number of metrics formatted and written at once
+        :type chunk_size: Default: 10000
+        :param ordered: write the chunks in input order
+        :type ordered: Default: True
+        :param senders: more clients to the same server, the chunks are
+            written round robin over this client and them
+        :type senders: list of GraphiteClient
+        :param formatter: option non-default formatter
+        :type formatter: callable
+
+        .. code-block:: python
+
+          >>> g = init()
+          >>> g.bulk_export(((name, value, ts) for name, value, ts in rows),
+          ...               processes=4)
+
+        Historical exports bypass dedup, rate limiting, sampling, the
+        memory budget and the last values cache. Return the number of
+        chunks written.
+
+        """
+        clients = [self] + list(senders or [])
+        for client in clients:
+            if not client.socket and not client._autoreconnect and \
+                    not client.dryrun:
+                raise GraphiteSendException(
+                    "Socket was not created before send")
+        timestamp = self._batch_timestamp(timestamp, time.time())
+        exporter = BulkExporter(
+            [client._write_chunk for client in clients],
+            self._chunk_formatter(timestamp, tags, formatter),
+            processes=processes,
+            chunk_size=chunk_size, ordered=ordered)
+        try:
+            return exporter.run(data)
+        except socket.error as e:
+            self._handle_send_error(e)
+
+    def _chunk_formatter(self, timestamp, tags, formatter=None):
+        return ChunkFormatter(formatter or self.formatter, timestamp, tags)
+
+    def _write_chunk(self, payload):
+        """
+        Write a chunk formatted by bulk_export(), reconnecting once on
+        failure when autoreconnect is enabled.
+        """
+        if self.dryrun:
+            return
+        if self._write_lock is None:
+            return self._write_chunk_unlocked(payload)
+        with self._write_lock:
+            return self._write_chunk_unlocked(payload)
+
+    def _write_chunk_unlocked(self, payload):
+        try:
+            with corked(self.socket, self.socket_options['tcp_cork']):
+                self._write(payload)
+        except (AttributeError, socket.error):
+            if not self._autoreconnect or not self.autoreconnect():
+                raise
+            self._write(payload)
 
-        message = "".join(metric_list)
-        return self._dispatch_send(message)
+    def metric(self, name, tags=None, formatter=None):
+        """
+        Return the handle of a series, created on first use. The series path
+        is computed once, so sending through the handle is cheaper than
+        calling send() with the metric name.
+
+        .. code-block:: python
+
+          >>> g = init()
+          >>> requests_ok = g.metric("requests.ok", tags={"app": "web"})
+          >>> requests_ok.send(1)
+
+        """
+        if formatter is None:
+            formatter = self.formatter
+        # Formatters naming a series alike can still format it differently.
+        key = (self._series_key(name, tags, formatter), formatter)
+        handle = self._registry.get(key)
+        if handle is None:
+            if len(self._registry) >= self.max_metric_handles:
+                self._registry.clear()
+            handle = self._registry[key] = MetricHandle(self, name, tags,
+                                                        formatter)
+        return handle
+
+    def timer(self, name, tags=None, buffered=True):
+        """
+        Return a Timer measuring, in milliseconds, a block of code as a
+        context manager or every call of a function as a decorator.
+
+        The durations are recorded in the buffer sent by flush(), unless
+        _buffered_ is False. Without adaptive_flush or max_buffer_bytes
+        that buffer grows until flush() is called, so call it regularly.
+
+        .. code-block:: python
+
+          >>> g = init()
+          >>> with g.timer("db.query"):
+          ...     run_query()
+          >>> @g.timer("handler", tags={"route": "/"})
+          ... async def handler(request):
+          ...     ...
+          >>> g.flush()
+
+        """
+        return Timer(self.metric(name, tags), buffered)
+
+    def view(self, prefix=None, group=None, system_name=None, suffix=None,
+             fqdn_squash=False, formatter=None):
+        """
+        Return a ClientView naming metrics with its own prefix, group,
+        system name and suffix, that sends them through this client's
+        connection, buffer and flush thread.
+
+        The arguments default as they do for a new client. Lowercasing,
+        cleaning and timestamp alignment are those of this client, and so is
+        the cache of cleaned names. A _formatter_ can be given instead.
+
+        .. code-block:: python
+
+          >>> g = init(prefix='apps', system_name='')
+          >>> db = g.view(prefix='apps', group='db', system_name='')
+          >>> db.record('queries', 12)
+          >>> g.flush()
+
+        """
+        if formatter is None:
+            base = self.formatter
+            formatter = GraphiteStructuredFormatter(
+                prefix=prefix, group=group, system_name=system_name,
+                suffix=suffix, fqdn_squash=fqdn_squash,
+                lowercase_metric_names=getattr(
+                    base, 'lowercase_metric_names', False),
+                clean_metric_name=getattr(base, '_clean_metric_name', True),
+                strict_metric_names=getattr(base, '_strict_metric_names',
+                                            False),
+                validate_metric_names=getattr(base, '_validate_metric_names',
+                                              False),
+                timestamp_interval=getattr(base, 'timestamp_interval', None))
+            if isinstance(base, GraphiteStructuredFormatter) and \
+                    base.name_cleaner.replacements == \
+                    formatter.name_cleaner.replacements:
+                formatter.name_cleaner = base.name_cleaner
+        return ClientView(self, formatter)
+
+    def _send_handle(self, handle, value, timestamp=None, buffered=False):
+        """
+        Send, or buffer, a value for a pre-encoded series.
+        """
+        now = time.time()
+        raw = value
+        value = self._admit(handle.name, value, now, handle.key)
+        if value is None:
+            return None
+        timestamp = self._batch_timestamp(timestamp, now, handle.formatter)
+        message = handle.line(value, timestamp)
+        if buffered:
+            return self._buffer(message, (handle.key, raw, value, timestamp))
+        response = self._dispatch_send(self._presend(message))
+        if response != WOULD_BLOCK:
+            self._remember([(handle.key, raw, value, timestamp)], now)
+        return response
+
+    def record(self, metric, value, timestamp=None, formatter=None,
+               tags=None):
+        """
+        Format a metric/value pair and keep it in a buffer, until flush() sends
+        the whole buffer at once.
+
+        .. code-block:: python
+
+          >>> g = init()
+          >>> g.record("metric1", 54)
+          >>> g.record("metric2", 43)
+          >>> g.flush()
+
+        """
+        if formatter is None:
+            formatter = self.formatter
+        now = time.time()
+        key = self._tracked_key(metric, tags, formatter)
+        raw = value
+        value = self._admit(metric, value, now, key)
+        if value is None:
+            return None
+        timestamp = self._batch_timestamp(timestamp, now, formatter)
+        return self._buffer(
+            self._format(formatter, metric, value, timestamp, tags),
+            (key, raw, value, timestamp))
+
+    def _buffer(self, line, sent):
+        """
+        Keep a formatted line until the next flush(), within the memory
+        budget. When the budget is full, what is already buffered is sent
+        first to make room.
+
+        _sent_ is the (series key, value given, value sent, timestamp) of
+        the line, remembered for dedup and last() once the line is written.
+        """
+        size = len(line)
+        # No lock is held while waiting for the budget, the writes that
+        # free it must go on.
+        if self.budget is not None and \
+                not self.budget.acquire(size, block=False):
+            self._flush_pending()
+            if not self._reserve(size):
+                return WOULD_BLOCK
+        if self._buffer_lock is None:
+            pending = self._append_pending(line, sent, size)
+        else:
+            with self._buffer_lock:
+                pending = self._append_pending(line, sent, size)
+        if self.scheduler is not None:
+            if pending >= self.scheduler.batch_size:
+                self._flush_pending(by_size=True)
+            elif pending == 1:
+                self.flush_thread.wakeup()
+        return None
+
+    def _append_pending(self, line, sent, size):
+        if not self._pending:
+            self._pending_since = time.time()
+        self._pending.append(line)
+        self._pending_sent.append(sent)
+        self._pending_bytes += size
+        return len(self._pending)
+
+    def flush(self, timeout=None):
+        """
+        Send everything buffered by record(), as a single message.
+        Return None when the buffer was empty.
+
+        In asynchronous mode, also wait up to _timeout_ seconds for the
+        writer greenlet to have written everything queued, and raise
+        GraphiteSendException if it has not.
+        """
+        response = self._flush_pending()
+        if self.writer is not None and not self.writer.flush(timeout):
+            raise GraphiteSendException(
+                "%d queued messages were not written within %ss" %
+                (self.writer.queue.qsize(), timeout))
+        return response
+
+    def _flush_pending(self, by_size=False):
+        """
+        Send what is buffered. The buffer is swapped for an empty one under
+        the buffer lock, and only the write holds the write lock, so
+        record() never waits for a write or a reconnection.
+        """
+        if self._buffer_lock is None:
+            return self._send_pending(self._take_pending(), by_size)
+        with self._buffer_lock:
+            pending = self._take_pending()
+        return self._send_pending(pending, by_size)
+
+    def _take_pending(self):
+        pending = (self._pending, self._pending_bytes, self._pending_sent,
+                   self._pending_since)
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_sent = []
+        return pending
+
+    def _send_pending(self, pending, by_size=False):
+        lines, reserved, sent, pending_since = pending
+        if not lines:
+            return None
+        message = lines
+        if not self.vectored_writes:
+            message = self._presend("".join(lines))
+        start = time.time()
+        response = self._dispatch_send(message, reserved=reserved)
+        # Only what was written is remembered, a failed flush raised.
+        self._remember(sent, start)
+        if self.scheduler is not None:
+            with self._buffer_lock:
+                self.scheduler.observe(len(lines), time.time() - start,
+                                       pending_since, by_size)
+        return response
+
+    def _flush_due_in(self):
+        """
+        Seconds until the scheduler wants the buffer flushed.
+        """
+        with self._buffer_lock:
+            return self.scheduler.due_in(len(self._pending),
+                                         self._pending_since)
+
+    def close(self):
+        """
+        Stop the background flush thread, send what is buffered and close
+        the connection.
+        """
+        if self.flush_thread is not None:
+            self.flush_thread.stop()
+            self.flush_thread = None
+        try:
+            self.flush()
+        finally:
+            self.disconnect()
 
     def enable_asynchronous(self):
         """Check if socket have been monkey patched by gevent"""
@@ -441,6 +1578,20 @@ class GraphiteClient(object):
 
 
 class GraphitePickleClient(GraphiteClient):
+    """
+    Graphite Client sending pickled batches to the pickle receiver of
+    graphite. It accepts the same arguments as GraphiteClient and:
+
+    :param pickle_protocol: pickle protocol of the payloads, it must be one
+        the carbon receiver can load (carbon on python 2 only loads
+        protocols 0 to 2)
+    :type pickle_protocol: Default: the default protocol of this python
+    """
+
+    # Every pickle frame is a complete batch, there is nothing to gain from
+    # waiting for more data before sending it.
+    default_socket_options = dict(GraphiteClient.default_socket_options,
+                                  tcp_nodelay=True)
 
     def __init__(self, *args, **kwargs):
         # If the user has not given a graphite_port, then use the default pick
@@ -448,19 +1599,24 @@ class GraphitePickleClient(GraphiteClient):
         if 'graphite_port' not in kwargs:
             kwargs['graphite_port'] = default_graphite_pickle_port
 
+        pickle_protocol = kwargs.pop('pickle_protocol', None)
+        if pickle_protocol is not None and \
+                not 0 <= pickle_protocol <= pickle.HIGHEST_PROTOCOL:
+            raise GraphiteSendException(
+                "Invalid pickle_protocol %s, must be between 0 and %d" %
+                (pickle_protocol, pickle.HIGHEST_PROTOCOL))
+        self.pickle_protocol = pickle_protocol
+
         # TODO: Fix this hack and use super.
         # self = GraphiteClient(*args, **kwargs)  # noqa
         super(self.__class__, self).__init__(*args, **kwargs)
 
-    def str2listtuple(self, string_message):
-        "Covert a string that is ready to be sent to graphite into a tuple"
+    def _parse_message(self, string_message):
+        "Covert a string that is ready to be sent to graphite into tuples"
 
         if type(string_message).__name__ not in ('str', 'unicode'):
             raise TypeError("Must provide a string or unicode")
 
-        if not string_message.endswith('\n'):
-            string_message += "\n"
-
         tpl_list = []
         for line in string_message.split('\n'):
             line = line.strip()
@@ -483,42 +1639,80 @@ class GraphitePickleClient(GraphiteClient):
         if len(tpl_list) == 0:
             raise GraphiteSendException("No messages to send")
 
-        payload = pickle.dumps(tpl_list)
-        header = struct.pack("!L", len(payload))
-        message = header + payload
+        return tpl_list
 
-        return message
+    def _pickle_frame(self, tpl_list):
+        """
+        Pickle _tpl_list_ straight into a buffer that starts with room for
+        the length header, then patch the header in place. This avoids
+        copying the whole payload to prepend the header.
+        """
+        frame = io.BytesIO()
+        frame.write(b"\0\0\0\0")
+        pickle.Pickler(frame, self.pickle_protocol).dump(tpl_list)
+        length = frame.tell() - 4
+        frame.seek(0)
+        frame.write(struct.pack("!L", length))
+        return frame
+
+    def _pickle_datagrams(self, tpl_list):
+        """
+        Pickle _tpl_list_ in as many frames as needed for each of them to
+        fit in a datagram.
+        """
+        frame = self._pickle_frame(tpl_list).getvalue()
+        if len(frame) <= self.datagram_size or len(tpl_list) == 1:
+            return [frame]
+        middle = len(tpl_list) // 2
+        return (self._pickle_datagrams(tpl_list[:middle]) +
+                self._pickle_datagrams(tpl_list[middle:]))
+
+    def _chunk_formatter(self, timestamp, tags, formatter=None):
+        if self.transport == 'unix_dgram':
+            raise GraphiteSendException(
+                "bulk_export() of pickled metrics needs a stream transport")
+        formatter = formatter or self.formatter
+        return ChunkFormatter(formatter, timestamp, tags,
+                              lowercase=getattr(formatter,
+                                                'lowercase_metric_names',
+                                                False),
+                              pickled=True,
+                              pickle_protocol=self.pickle_protocol)
+
+    def str2listtuple(self, string_message):
+        "Covert a string that is ready to be sent to graphite into a tuple"
+        return self._pickle_frame(
+            self._parse_message(string_message)).getvalue()
 
     def _send(self, message):
         """ Given a message send it to the graphite server. """
 
+        if isinstance(message, list):
+            message = "".join(message)
+
         # An option to lowercase the entire message
         if self.lowercase_metric_names:
             message = message.lower()
 
-        # convert the message into a pickled payload.
-        message = self.str2listtuple(message)
+        tpl_list = self._parse_message(message)
+        if self.transport == 'unix_dgram':
+            frames = self._pickle_datagrams(tpl_list)
+            for frame in frames:
+                self.socket.send(frame)
+            return "sent %d pickled datagrams" % len(frames)
 
+        # convert the message into a pickled payload, without copying it
+        # when the buffer protocol allows it.
+        frame = self._pickle_frame(tpl_list)
         try:
-            self.socket.sendall(message)
-        # Capture missing socket.
-        except socket.gaierror as error:
-            raise GraphiteSendException(
-                "Failed to send data to %s, with error: %s" %
-                (self.addr, error))  # noqa
+            message = frame.getbuffer()
+        except AttributeError:  # python2
+            message = frame.getvalue()
 
-        # Capture socket closure before send.
-        except socket.error as error:
-            raise GraphiteSendException(
-                "Socket closed before able to send data to %s, "
-                "with error: %s" %
-                (self.addr, error))  # noqa
-
-        except Exception as error:
-            raise GraphiteSendException(
-                "Unknown error while trying to send data down socket to %s, "
-                "error: %s" %
-                (self.addr, error))  # noqa
+        # Socket errors are turned into GraphiteSendException by
+        # _dispatch_send(), _send_and_reconnect() needs to see them first.
+        with corked(self.socket, self.socket_options['tcp_cork']):
+            self._write(message)
 
         return "sent %d long pickled message" % len(message)
 
@@ -531,7 +1725,7 @@ def init(init_type='plaintext_tcp', *args, **kwargs):
     reset()
 
     validate_init_types = ['plaintext_tcp', 'plaintext', 'pickle_tcp',
-                           'pickle', 'plain']
+                           'pickle', 'plain', 'unix_stream', 'unix_dgram']
 
     if init_type not in validate_init_types:
         raise GraphiteSendException(
@@ -542,6 +1736,12 @@ def init(init_type='plaintext_tcp', *args, **kwargs):
     if init_type in ['plaintext_tcp', 'plaintext', 'plain']:
         _module_instance = GraphiteClient(*args, **kwargs)
 
+    # Send plain text to a local relay listening on a unix socket. Use the
+    # pickle init_type with transport= for pickled data.
+    if init_type in ['unix_stream', 'unix_dgram']:
+        kwargs['transport'] = init_type
+        _module_instance = GraphiteClient(*args, **kwargs)
+
     # Use TCP to send pickled data to the pickle receiver on the graphite
     # server.
     if init_type in ['pickle_tcp', 'pickle']:
@@ -563,6 +1763,42 @@ def send(*args, **kwargs):
     return _module_instance
 
 
+def emit(*args, **kwargs):
+    """ Make sure that we have an instance of the GraphiteClient.
+    Then send the metric to the graphite server, without building a
+    description of the message.
+    User consumable method.
+    """
+    if not _module_instance:
+        raise GraphiteSendException(
+            "Must call graphitesend.init() before sending")
+    return _module_instance.emit(*args, **kwargs)
+
+
+def bulk_export(*args, **kwargs):
+    """ Make sure that we have an instance of the GraphiteClient.
+    Then export the metrics to the graphite server, formatting them on a
+    pool of processes.
+    User consumable method.
+    """
+    if not _module_instance:
+        raise GraphiteSendException(
+            "Must call graphitesend.init() before sending")
+    _module_instance.bulk_export(*args, **kwargs)
+    return _module_instance
+
+
+def last(*args, **kwargs):
+    """ Make sure that we have an instance of the GraphiteClient.
+    Then return the last values it sent.
+    User consumable method.
+    """
+    if not _module_instance:
+        raise GraphiteSendException(
+            "Must call graphitesend.init() before reading last values")
+    return _module_instance.last(*args, **kwargs)
+
+
 def send_dict(*args, **kwargs):
     """ Make sure that we have an instance of the GraphiteClient.
     Then send the metrics to the graphite server.
@@ -593,6 +1829,8 @@ def reset():
     global _module_instance
     if not _module_instance:
         return False
+    if _module_instance.flush_thread is not None:
+        _module_instance.flush_thread.stop()
     _module_instance.disconnect()
     _module_instance = None
 
@@ -0,0 +1,153 @@
+import bisect
+import re
+import threading
+from collections import OrderedDict
+
+WILDCARDS = '*?[{'
+
+
+def series_name(key):
+    """
+    Return the graphite name of a series key: the metric name, followed by
+    its sorted tags for a tagged series ('metric;tag=value'). Keys may also
+    carry the formatter of the series, after the tags.
+    """
+    if isinstance(key, tuple):
+        metric, tags = key[:2]
+        return metric + ''.join(';%s=%s' % tag for tag in sorted(tags))
+    return key
+
+
+def compile_pattern(pattern):
+    """
+    Compile a graphite glob into a regular expression matching metric
+    names. As in graphite, * and ? do not match across dots, and {a,b}
+    matches either alternative.
+    """
+    regex = []
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        position += 1
+        if char == '*':
+            regex.append('[^.]*')
+        elif char == '?':
+            regex.append('[^.]')
+        elif char == '[':
+            end = pattern.find(']', position)
+            if end == -1:
+                regex.append(re.escape(char))
+                continue
+            regex.append('[%s]' % pattern[position:end].replace('\\', '\\\\'))
+            position = end + 1
+        elif char == '{':
+            end = pattern.find('}', position)
+            if end == -1:
+                regex.append(re.escape(char))
+                continue
+            alternatives = pattern[position:end].split(',')
+            regex.append('(?:%s)' % '|'.join(map(re.escape, alternatives)))
+            position = end + 1
+        else:
+            regex.append(re.escape(char))
+    return re.compile(''.join(regex) + r'\Z')
+
+
+class LastValueCache(object):
+    '''Remember the last value and timestamp sent for every series, so that
+    local consumers can read them without querying graphite.
+
+    Entries are kept in an LRU ordered dict capped at `max_series`; the
+    series that was sent the longest time ago is evicted first. Reading an
+    entry does not make it more recent.
+
+    A series is named by its key: the full name it was sent as, tags
+    included (see series_name()).
+
+    Series names are also kept in a sorted list, so a query only looks at
+    the names starting with the literal part of its pattern instead of
+    every series.
+
+    :param max_series: maximum number of series to remember
+    :type max_series: Default: 10000
+    '''
+
+    def __init__(self, max_series=10000):
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._index = []
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, key, value, timestamp):
+        """
+        Record that _value_ was sent at _timestamp_ for the series _key_.
+        """
+        name = series_name(key)
+        with self._lock:
+            entries = self._entries
+            if name in entries:
+                del entries[name]
+            else:
+                if len(entries) >= self.max_series:
+                    evicted, _ = entries.popitem(last=False)
+                    del self._index[bisect.bisect_left(self._index, evicted)]
+                    self.evicted += 1
+                bisect.insort(self._index, name)
+            entries[name] = (value, timestamp)
+
+    def get(self, name):
+        """
+        Return the (value, timestamp) last sent for the series _name_, or
+        None.
+        """
+        with self._lock:
+            return self._entries.get(name)
+
+    def query(self, pattern=None):
+        """
+        Return a dict of (value, timestamp) by series name, for every series
+        whose metric name matches the graphite glob _pattern_, or for every
+        series if no pattern is given.
+        """
+        with self._lock:
+            if pattern is None:
+                return dict(self._entries)
+            if not any(char in pattern for char in WILDCARDS):
+                return self._collect(pattern, pattern + ';', None)
+            prefix = pattern
+            for char in WILDCARDS:
+                prefix = prefix.split(char, 1)[0]
+            return self._collect(prefix, None, compile_pattern(pattern))
+
+    def _collect(self, prefix, tagged_prefix, regex):
+        index = self._index
+        found = {}
+        position = bisect.bisect_left(index, prefix)
+        while position < len(index):
+            name = index[position]
+            position += 1
+            if not name.startswith(prefix):
+                break
+            metric = name.split(';', 1)[0]
+            if regex is None:
+                if name != prefix and not name.startswith(tagged_prefix):
+                    continue
+            elif not regex.match(metric):
+                continue
+            found[name] = self._entries[name]
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            del self._index[:]
+
+    def stats(self):
+        return {
+            'last_value_series': len(self._entries),
+            'last_value_evicted': self.evicted,
+        }
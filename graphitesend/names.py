@@ -0,0 +1,138 @@
+import re
+import unicodedata
+
+# unicode on python2, str on python3
+text_type = type(u'')
+
+# Anything but printable ASCII, and ';' which starts the tags of a series.
+_invalid_name_chars = re.compile(r'[^\x21-\x3a\x3c-\x7e]')
+_repeated_dots = re.compile(r'\.{2,}')
+
+
+class InvalidMetricName(ValueError):
+    pass
+
+
+def _text(metric_name):
+    if isinstance(metric_name, bytes):
+        return metric_name.decode('utf-8', 'replace')
+    if not isinstance(metric_name, text_type):
+        return text_type(metric_name)
+    return metric_name
+
+
+def to_ascii(name):
+    """
+    Transliterate _name_ to ASCII where Unicode has a compatibility
+    decomposition ('é' to 'e', 'ﬁ' to 'fi'), leaving other characters in
+    place for the cleaning to replace.
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(char for char in decomposed
+                   if not unicodedata.combining(char))
+
+
+class MetricNameCleaner(object):
+    '''Clean metric names, once per unique name.
+
+    A name goes through the single character _replacements_. With
+    _validate_, Unicode is then transliterated to ASCII, every character
+    graphite cannot store (whitespace, control characters, ';' and what is
+    left of non-ASCII text) is replaced by _, and empty path components are
+    removed, so 'a..b.' becomes 'a.b'; a name left empty is rejected.
+
+    Without _validate_, a name that is not ASCII once replaced raises
+    InvalidMetricName, as it could not be sent. In strict mode names are
+    validated but not cleaned: a name that would be changed by the
+    validation raises InvalidMetricName.
+
+    The results, rejections included, are kept in a cache emptied once it
+    holds `max_size` names.
+
+    :param replacements: (from, to) pairs of single characters
+    :param strict: reject names instead of cleaning them
+    :type strict: Default: False
+    :param validate: also clean what graphite cannot store
+    :type validate: Default: False
+    :param max_size: number of names kept in the cache
+    :type max_size: Default: 10000
+    '''
+
+    def __init__(self, replacements=(), strict=False, max_size=10000,
+                 validate=False):
+        self.replacements = list(replacements)
+        self.strict = strict
+        self.validate = validate or strict
+        self.max_size = max_size
+        self._cache = {}
+        try:
+            self._table = str.maketrans(dict(self.replacements))
+        except AttributeError:  # python2
+            self._table = None
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __call__(self, metric_name):
+        """
+        Return the cleaned _metric_name_.
+
+        :raises InvalidMetricName: When the name is rejected.
+        """
+        try:
+            cleaned = self._cache.get(metric_name)
+        except TypeError:  # unhashable
+            return self._check(metric_name)
+        if cleaned is None:
+            if len(self._cache) >= self.max_size:
+                self._cache.clear()
+            try:
+                cleaned = self._check(metric_name)
+            except InvalidMetricName as error:
+                cleaned = error
+            self._cache[metric_name] = cleaned
+        if isinstance(cleaned, InvalidMetricName):
+            raise cleaned
+        return cleaned
+
+    def _check(self, metric_name):
+        if not self.validate:
+            try:
+                cleaned = self.clean(metric_name)
+                cleaned.encode('ascii')
+            except UnicodeError:
+                raise InvalidMetricName("Metric name is not ASCII: %r"
+                                        % (metric_name,))
+            return cleaned
+        metric_name = _text(metric_name)
+        cleaned = self.clean(metric_name)
+        if not cleaned:
+            raise InvalidMetricName("Empty metric name: %r" % (metric_name,))
+        if self.strict and cleaned != metric_name:
+            raise InvalidMetricName("Invalid metric name: %r, would be %r"
+                                    % (metric_name, cleaned))
+        return cleaned
+
+    def _replace(self, metric_name):
+        if self._table is not None:
+            return metric_name.translate(self._table)
+        for _from, _to in self.replacements:
+            metric_name = metric_name.replace(_from, _to)
+        return metric_name
+
+    def clean(self, metric_name):
+        """
+        Clean _metric_name_, without the cache or the strict mode.
+        """
+        if not self.validate:
+            return self._replace(str(metric_name))
+        name = self._replace(_text(metric_name))
+        if _invalid_name_chars.search(name):
+            try:
+                name.encode('ascii')
+            except UnicodeError:
+                name = self._replace(to_ascii(name))
+            name = _invalid_name_chars.sub('_', name)
+        if '..' in name or name.startswith('.') or name.endswith('.'):
+            name = _repeated_dots.sub('.', name).strip('.')
+        return str(name)
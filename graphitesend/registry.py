@@ -0,0 +1,67 @@
+import time
+
+
+class MetricHandle(object):
+    '''A pre-encoded series, returned by GraphiteClient.metric().
+
+    The full series path (prefix, cleaned name, suffix and tags) is computed
+    once when the handle is created, so sending through the handle only
+    formats the value and the timestamp.
+
+    .. code-block:: python
+
+      >>> requests_ok = g.metric("requests.ok")
+      >>> requests_ok.send(1)
+      >>> requests_ok.record(1)  # buffered until g.flush()
+
+    '''
+
+    __slots__ = ('client', 'name', 'tags', 'key', 'path', 'interval',
+                 'formatter')
+
+    def __init__(self, client, name, tags=None, formatter=None):
+        self.client = client
+        self.name = name
+        self.tags = tags
+        if formatter is None:
+            formatter = client.formatter
+        self.key = client._series_key(name, tags, formatter)
+        self.formatter = formatter
+        self.interval = getattr(formatter, 'timestamp_interval', 0)
+        # Custom formatters may not know how to build a path on their own,
+        # those are called for every value instead.
+        self.path = None
+        if hasattr(formatter, 'series_path'):
+            self.path = formatter.series_path(name, tags)
+
+    def __repr__(self):
+        return "<MetricHandle %s>" % self.path
+
+    def line(self, value, timestamp=None):
+        """
+        Format a line of the plaintext protocol for this series.
+        """
+        if self.path is None:
+            return self.client._format(self.formatter, self.name, value,
+                                       timestamp, self.tags)
+        if timestamp is None:
+            timestamp = time.time()
+        timestamp = int(timestamp)
+        if self.interval:
+            timestamp -= timestamp % self.interval
+        if type(value).__name__ in ['str', 'unicode']:
+            value = float(value)
+        return "%s %f %d\n" % (self.path, value, timestamp)
+
+    def send(self, value, timestamp=None):
+        """
+        Send a value of this series right away.
+        """
+        return self.client._send_handle(self, value, timestamp)
+
+    def record(self, value, timestamp=None):
+        """
+        Add a value of this series to the client's buffer, it is sent on the
+        next GraphiteClient.flush().
+        """
+        return self.client._send_handle(self, value, timestamp, buffered=True)
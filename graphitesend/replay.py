@@ -0,0 +1,91 @@
+import collections
+import threading
+import time
+
+
+class ReplayRing(object):
+    '''Keep the last bytes written to carbon, to write them again after a
+    reconnect.
+
+    Carbon does not acknowledge what it receives: a write that made it to
+    the kernel buffer is lost if the connection dies before it is sent.
+    Keeping a window of what was written recently, and replaying it on the
+    new connection, turns that loss into duplicates. Whole messages are
+    kept, so carbon only ever sees complete lines or pickle frames, and a
+    point written twice for the same timestamp keeps the same value.
+
+    The window is capped at `max_bytes`, and at `max_age` seconds; a message
+    larger than the whole window is not kept.
+
+    :param max_bytes: size of the window
+    :type max_bytes: Default: None, no size limit
+    :param max_age: seconds a message stays in the window
+    :type max_age: Default: None, no age limit
+    '''
+
+    def __init__(self, max_bytes=None, max_age=None, clock=time.time):
+        if max_bytes is None and max_age is None:
+            raise ValueError("A replay window needs max_bytes or max_age")
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._messages = collections.deque()
+        self.size = 0
+        self.replays = 0
+        self.replayed_bytes = 0
+        self.uncovered_bytes = 0
+
+    def __len__(self):
+        return len(self._messages)
+
+    def _expired(self, written, now):
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            return True
+        return self.max_age is not None and now - written > self.max_age
+
+    def _expire(self, now):
+        messages = self._messages
+        while messages and self._expired(messages[0][0], now):
+            self.size -= len(messages.popleft()[1])
+
+    def append(self, data):
+        """
+        Keep _data_, bytes just written to the socket.
+        """
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            self.uncovered_bytes += len(data)
+            return
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        now = self._clock()
+        with self._lock:
+            self._messages.append((now, data))
+            self.size += len(data)
+            self._expire(now)
+
+    def replay(self):
+        """
+        Return the messages of the window, oldest first, and count them as
+        replayed.
+        """
+        with self._lock:
+            self._expire(self._clock())
+            messages = [data for _, data in self._messages]
+        self.replays += 1
+        self.replayed_bytes += sum(map(len, messages))
+        return messages
+
+    def clear(self):
+        with self._lock:
+            self._messages.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            'replay_window_bytes': self.size,
+            'replay_window_messages': len(self._messages),
+            'replays': self.replays,
+            'replayed_bytes': self.replayed_bytes,
+            'replay_uncovered_bytes': self.uncovered_bytes,
+        }
@@ -0,0 +1,74 @@
+import socket
+import time
+
+
+def interleave_families(addresses):
+    """
+    Reorder getaddrinfo() results so that address families alternate,
+    starting with the family of the first result, as happy eyeballs
+    (RFC 8305) does. A host whose IPv6 route is broken then costs one failed
+    attempt before IPv4 is tried, instead of one per IPv6 address.
+    """
+    by_family = []
+    for address in addresses:
+        for family_addresses in by_family:
+            if family_addresses[0][0] == address[0]:
+                family_addresses.append(address)
+                break
+        else:
+            by_family.append([address])
+    ordered = []
+    while by_family:
+        for family_addresses in list(by_family):
+            ordered.append(family_addresses.pop(0))
+            if not family_addresses:
+                by_family.remove(family_addresses)
+    return ordered
+
+
+class CachingResolver(object):
+    '''Resolve graphite server names with getaddrinfo() and keep all of the
+    A and AAAA results for `ttl` seconds.
+
+    Reconnecting then does not need a DNS lookup, which matters when the
+    DNS is slow because of the same incident that broke the connection.
+
+    :param ttl: seconds the addresses of a name are kept
+    :type ttl: Default: 60
+    :param getaddrinfo: function used to resolve names
+    :type getaddrinfo: Default: socket.getaddrinfo
+    '''
+
+    def __init__(self, ttl=60, getaddrinfo=None, clock=time.time):
+        self.ttl = ttl
+        self._getaddrinfo = getaddrinfo or socket.getaddrinfo
+        self._clock = clock
+        self._cache = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def resolve(self, host, port):
+        """
+        Return the (family, socktype, proto, canonname, sockaddr) tuples of
+        _host_, in the order they should be tried.
+
+        :raises socket.gaierror: When the name does not resolve.
+        """
+        now = self._clock()
+        entry = self._cache.get((host, port))
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        self.lookups += 1
+        addresses = interleave_families(self._getaddrinfo(
+            host, port, 0, socket.SOCK_STREAM, socket.IPPROTO_TCP))
+        if not addresses:
+            raise socket.gaierror("No address associated with %s" % host)
+        self._cache[(host, port)] = (now + self.ttl, addresses)
+        return addresses
+
+    def invalidate(self, host, port):
+        """
+        Forget the addresses of _host_, the next resolve() will look it up.
+        """
+        self._cache.pop((host, port), None)
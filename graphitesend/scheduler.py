@@ -0,0 +1,162 @@
+import threading
+import time
+import weakref
+
+
+class AdaptiveFlushScheduler(object):
+    '''Decide when the buffer of record() is flushed, tuning the flush
+    interval and the batch size so that a metric reaches carbon within
+    `target_delay` seconds of being recorded.
+
+    A recorded metric waits up to the flush interval in the buffer, then
+    for its batch to be written. After every flush the scheduler updates
+    moving averages of the write duration and of the input rate, and picks:
+
+    * interval = target_delay - write duration, so a slow carbon shortens
+      the wait in the buffer
+    * batch size = input rate * interval, the lines expected per interval,
+      so a burst of input is flushed early in batches of the usual size
+      instead of one huge one
+
+    both kept within their bounds.
+
+    :param target_delay: seconds between record() and the end of the write
+    :type target_delay: Default: 1.0
+    :param min_interval: shortest flush interval
+    :type min_interval: Default: 0.05
+    :param max_interval: longest flush interval
+    :type max_interval: Default: 10
+    :param min_batch: smallest batch size, in lines
+    :type min_batch: Default: 100
+    :param max_batch: largest batch size, in lines
+    :type max_batch: Default: 10000
+    :param smoothing: weight of the newest observation in the averages
+    :type smoothing: Default: 0.2
+    '''
+
+    def __init__(self, target_delay=1.0, min_interval=0.05, max_interval=10,
+                 min_batch=100, max_batch=10000, smoothing=0.2,
+                 clock=time.time):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("Invalid flush interval bounds")
+        if not 0 < min_batch <= max_batch:
+            raise ValueError("Invalid batch size bounds")
+        self.target_delay = target_delay
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.smoothing = smoothing
+        self._clock = clock
+
+        self.interval = self._clamp(target_delay, min_interval, max_interval)
+        self.batch_size = max_batch
+        self.write_seconds = 0.0
+        self.input_rate = None
+        self.last_delay = 0.0
+        self._last_flush = clock()
+
+        self.flushes = 0
+        self.flushes_by_size = 0
+        self.flushes_by_time = 0
+
+    @staticmethod
+    def _clamp(value, low, high):
+        return max(low, min(high, value))
+
+    def _average(self, average, value):
+        if average is None:
+            return value
+        return average + self.smoothing * (value - average)
+
+    def due_in(self, pending, pending_since, now=None):
+        """
+        Return the seconds until a buffer of _pending_ lines, the oldest
+        recorded at _pending_since_, must be flushed. 0 means now.
+        """
+        if not pending:
+            return self.interval
+        if pending >= self.batch_size:
+            return 0
+        if now is None:
+            now = self._clock()
+        return max(0, pending_since + self.interval - now)
+
+    def observe(self, lines, write_seconds, pending_since, by_size=False):
+        """
+        Account for a flush of _lines_ that took _write_seconds_ to write,
+        then adapt the interval and the batch size.
+        """
+        now = self._clock()
+        self.flushes += 1
+        if by_size:
+            self.flushes_by_size += 1
+        else:
+            self.flushes_by_time += 1
+        self.last_delay = now - pending_since
+        self.write_seconds = self._average(self.write_seconds, write_seconds)
+        elapsed = now - self._last_flush
+        self._last_flush = now
+        if elapsed > 0:
+            self.input_rate = self._average(self.input_rate, lines / elapsed)
+
+        self.interval = self._clamp(self.target_delay - self.write_seconds,
+                                    self.min_interval, self.max_interval)
+        if self.input_rate is not None:
+            self.batch_size = int(self._clamp(
+                self.input_rate * self.interval, self.min_batch,
+                self.max_batch))
+
+    def stats(self):
+        return {
+            'flush_interval': self.interval,
+            'flush_batch_size': self.batch_size,
+            'flush_write_seconds': self.write_seconds,
+            'flush_input_rate': self.input_rate or 0.0,
+            'flush_last_delay': self.last_delay,
+            'flushes': self.flushes,
+            'flushes_by_size': self.flushes_by_size,
+            'flushes_by_time': self.flushes_by_time,
+        }
+
+
+class FlushThread(threading.Thread):
+    '''Flush the buffer of a client when its scheduler says so, even when
+    nothing is recorded for a while.
+
+    Only a weak reference to the client is kept, the thread ends with it.
+    '''
+
+    def __init__(self, client):
+        super(FlushThread, self).__init__(name='graphitesend flush')
+        self.daemon = True
+        self._client = weakref.ref(client)
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self.errors = 0
+        self.last_error = None
+
+    def wakeup(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            client = self._client()
+            if client is None:
+                return
+            delay = client._flush_due_in()
+            if delay <= 0:
+                try:
+                    client._flush_pending()
+                except Exception as error:
+                    self.errors += 1
+                    self.last_error = error
+                    delay = client.scheduler.interval
+            del client
+            if delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
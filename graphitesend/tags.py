@@ -0,0 +1,88 @@
+import re
+
+# Characters graphite does not accept in tag names and values.
+_invalid_tag_name = re.compile(r'[;!^=\s]')
+_invalid_tag_value = re.compile(r'[;\s]')
+
+
+def canonicalize_tags(tags):
+    """
+    Encode a dict of tags in the graphite 1.1 format, sorted by tag name and
+    with the characters graphite does not accept replaced by _.
+
+    .. code-block:: python
+
+      >>> canonicalize_tags({'env': 'prod', 'dc': 'eu west'})
+      ';dc=eu_west;env=prod'
+
+    :raises ValueError: When a tag name or value is empty, or is not ASCII.
+    """
+    parts = []
+    for name, value in sorted((str(k), str(v)) for k, v in tags.items()):
+        if not name or not value:
+            raise ValueError("Tag names and values must not be empty: %r=%r"
+                             % (name, value))
+        try:
+            (name + value).encode('ascii')
+        except UnicodeError:
+            raise ValueError("Tag names and values must be ASCII: %r=%r"
+                             % (name, value))
+        name = _invalid_tag_name.sub('_', name)
+        value = _invalid_tag_value.sub('_', value)
+        if value.startswith('~'):
+            value = '_' + value[1:]
+        parts.append(';%s=%s' % (name, value))
+    return ''.join(parts)
+
+
+class TagIndex(object):
+    '''Memoize the encoding of tagged series.
+
+    Sorting, validating and joining tags is only done the first time a set
+    of tags, or a (path, tags) pair, is seen. Each cache is emptied once it
+    holds `max_size` entries, which keeps memory bounded when tag values
+    have a high cardinality.
+
+    :param max_size: number of entries kept in each cache
+    :type max_size: Default: 10000
+    '''
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._tags = {}
+        self._series = {}
+
+    def __len__(self):
+        return len(self._series)
+
+    def encode(self, tags):
+        """
+        Return the ";name=value" encoding of _tags_.
+        """
+        if not tags:
+            return ''
+        key = frozenset(tags.items())
+        encoded = self._tags.get(key)
+        if encoded is None:
+            if len(self._tags) >= self.max_size:
+                self._tags.clear()
+            encoded = self._tags[key] = canonicalize_tags(tags)
+        return encoded
+
+    def series(self, path, tags, build=None):
+        """
+        Return the full series name for _path_ and _tags_. If given, _build_
+        is called with (path, encoded_tags) to produce it the first time.
+        """
+        key = (path, frozenset(tags.items()) if tags else None)
+        series = self._series.get(key)
+        if series is None:
+            if len(self._series) >= self.max_size:
+                self._series.clear()
+            encoded = self.encode(tags)
+            if build is None:
+                series = path + encoded
+            else:
+                series = build(path, encoded)
+            self._series[key] = series
+        return series
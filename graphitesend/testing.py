@@ -0,0 +1,570 @@
+import os
+import pickle
+import select
+import socket
+import struct
+import threading
+import time
+
+try:
+    import queue
+except ImportError:  # python2
+    import Queue as queue
+
+protocols = ['plaintext', 'pickle']
+server_transports = ['tcp', 'udp', 'unix_stream', 'unix_dgram']
+
+
+class Connection(object):
+    '''A client connected to a FakeCarbon stream socket.'''
+
+    def __init__(self, sock):
+        self.socket = sock
+        self.buffer = b""
+        self.received_bytes = 0
+
+
+class FakeCarbon(object):
+    '''A carbon receiver for tests and benchmarks, running on a background
+    thread.
+
+    It accepts the plaintext or the pickle protocol over TCP, UDP or unix
+    sockets, parses what it receives and indexes it by series. Faults can
+    be injected while it runs: `latency` seconds of delay before every read,
+    stall() to stop reading for a while, so that the kernel buffers fill up
+    and senders block, and drop_connections() or `drop_after_bytes` to close
+    the connections of the clients.
+
+    A single thread polls every socket with select(), so it keeps working
+    when the socket module is monkey patched by gevent.
+
+    Pickled payloads are loaded with pickle, only point it at clients you
+    trust.
+
+    .. code-block:: python
+
+      >>> with FakeCarbon() as carbon:
+      ...     g = GraphiteClient(prefix='test', system_name='',
+      ...                        **carbon.client_kwargs())
+      ...     g.send('metric', 1, 1500000000)
+      ...     carbon.wait_for(1)
+      ...     carbon.series
+      True
+      {'test.metric': [(1500000000.0, 1.0)]}
+
+    :param protocol: 'plaintext' or 'pickle'
+    :type protocol: Default: 'plaintext'
+    :param transport: 'tcp', 'udp', 'unix_stream' or 'unix_dgram'
+    :type transport: Default: 'tcp'
+    :param host: address to listen on, for tcp and udp
+    :type host: Default: '127.0.0.1'
+    :param port: port to listen on, 0 picks a free one
+    :type port: Default: 0
+    :param path: path of the unix socket
+    :param latency: seconds to wait before every read
+    :param drop_after_bytes: close a connection once it sent this many bytes
+    :param keep_points: index every received point in `series`, turn it off
+        to only count them in a long benchmark
+    :type keep_points: Default: True
+    '''
+
+    def __init__(self, protocol='plaintext', transport='tcp',
+                 host='127.0.0.1', port=0, path=None, latency=0,
+                 drop_after_bytes=None, keep_points=True):
+        if protocol not in protocols:
+            raise ValueError("Invalid protocol '%s', must be one of: %s" %
+                             (protocol, ", ".join(protocols)))
+        if transport not in server_transports:
+            raise ValueError("Invalid transport '%s', must be one of: %s" %
+                             (transport, ", ".join(server_transports)))
+        if transport.startswith('unix') and not path:
+            raise ValueError("The %s transport needs a path" % transport)
+        self.protocol = protocol
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.path = path
+        self.latency = latency
+        self.drop_after_bytes = drop_after_bytes
+        self.keep_points = keep_points
+
+        self.socket = None
+        self._connections = []
+        self._thread = None
+        self._running = False
+        self._stalled_until = 0
+        self._drop = False
+        self._received = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the received points and zero the counters.
+        """
+        with self._received:
+            self.series = {}
+            self.points = 0
+            self.received_bytes = 0
+            self.connections = 0
+            self.dropped_connections = 0
+            self.errors = 0
+            self.first_received = None
+            self.last_received = None
+
+    @property
+    def address(self):
+        if self.transport.startswith('unix'):
+            return self.path
+        return (self.host, self.port)
+
+    def client_kwargs(self):
+        """
+        Return the GraphiteClient arguments sending to this server.
+        """
+        if self.transport == 'tcp':
+            return {'graphite_server': self.host, 'graphite_port': self.port}
+        if self.transport.startswith('unix'):
+            return {'transport': self.transport,
+                    'unix_socket_path': self.path}
+        raise ValueError("GraphiteClient has no %s transport" %
+                         self.transport)
+
+    def _listen(self):
+        if self.transport.startswith('unix'):
+            family = socket.AF_UNIX
+            address = self.path
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        else:
+            family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+            address = (self.host, self.port)
+        if self.transport in ('tcp', 'unix_stream'):
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+        if family != socket.AF_UNIX:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(address)
+        if family != socket.AF_UNIX:
+            self.port = sock.getsockname()[1]
+        if sock.type == socket.SOCK_STREAM:
+            sock.listen(128)
+        return sock
+
+    def start(self):
+        """
+        Listen, and start receiving on a background thread.
+        """
+        self.socket = self._listen()
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name='FakeCarbon %s' % (self.address,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the thread and close every socket.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stall(self, seconds):
+        """
+        Stop reading for _seconds_, senders block once the kernel buffers
+        are full.
+        """
+        self._stalled_until = time.time() + seconds
+
+    def drop_connections(self):
+        """
+        Close the connection of every client.
+        """
+        self._drop = True
+
+    def wait_for(self, points, timeout=5):
+        """
+        Wait until _points_ points have been received in total. Return False
+        if _timeout_ expired first.
+        """
+        deadline = time.time() + timeout
+        with self._received:
+            while self.points < points:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._received.wait(remaining)
+        return True
+
+    def stats(self):
+        """
+        Return the receive counters and throughput.
+        """
+        elapsed = 0
+        if self.first_received is not None:
+            elapsed = self.last_received - self.first_received
+        stats = {
+            'points': self.points,
+            'received_bytes': self.received_bytes,
+            'connections': self.connections,
+            'dropped_connections': self.dropped_connections,
+            'errors': self.errors,
+            'elapsed': elapsed,
+            'points_per_second': 0,
+            'bytes_per_second': 0,
+        }
+        if elapsed > 0:
+            stats['points_per_second'] = self.points / elapsed
+            stats['bytes_per_second'] = self.received_bytes / elapsed
+        return stats
+
+    def _run(self):
+        try:
+            while self._running:
+                if self._drop:
+                    self._drop = False
+                    for connection in list(self._connections):
+                        self._close(connection)
+                if time.time() < self._stalled_until:
+                    time.sleep(0.01)
+                    continue
+                sockets = [self.socket]
+                sockets.extend(c.socket for c in self._connections)
+                readable = select.select(sockets, [], [], 0.05)[0]
+                if time.time() < self._stalled_until:
+                    continue
+                for sock in readable:
+                    if self.latency:
+                        time.sleep(self.latency)
+                    if sock is self.socket:
+                        self._read_listener()
+                    else:
+                        self._read_connection(sock)
+        finally:
+            for connection in list(self._connections):
+                self._close(connection, dropped=False)
+            self.socket.close()
+            if self.transport.startswith('unix') and \
+                    os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def _read_listener(self):
+        if self.socket.type != socket.SOCK_STREAM:
+            data = self.socket.recv(65536)
+            self._count(len(data))
+            self._parse(data, datagram=True)
+            return
+        sock, _ = self.socket.accept()
+        self._connections.append(Connection(sock))
+        self.connections += 1
+
+    def _read_connection(self, sock):
+        connection = [c for c in self._connections if c.socket is sock][0]
+        try:
+            data = sock.recv(65536)
+        except socket.error:
+            data = b""
+        if not data:
+            self._close(connection, dropped=False)
+            return
+        self._count(len(data))
+        connection.received_bytes += len(data)
+        connection.buffer = self._parse(connection.buffer + data)
+        if self.drop_after_bytes is not None and \
+                connection.received_bytes >= self.drop_after_bytes:
+            self._close(connection)
+
+    def _close(self, connection, dropped=True):
+        self._connections.remove(connection)
+        connection.socket.close()
+        if dropped:
+            self.dropped_connections += 1
+
+    def _count(self, size):
+        now = time.time()
+        if self.first_received is None:
+            self.first_received = now
+        self.last_received = now
+        self.received_bytes += size
+
+    def _parse(self, data, datagram=False):
+        """
+        Index the complete points in _data_ and return what is left of it.
+        """
+        if self.protocol == 'pickle':
+            points, data = self._parse_pickle(data)
+        else:
+            points, data = self._parse_plaintext(data, datagram)
+        with self._received:
+            self.points += len(points)
+            if self.keep_points:
+                for path, timestamp, value in points:
+                    self.series.setdefault(path, []).append(
+                        (timestamp, value))
+            self._received.notify_all()
+        return data
+
+    def _parse_plaintext(self, data, datagram):
+        lines = data.split(b"\n")
+        rest = b"" if datagram else lines.pop()
+        points = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                path, value, timestamp = line.decode("ascii").split()
+                points.append((path, float(timestamp), float(value)))
+            except ValueError:
+                self.errors += 1
+        return points, rest
+
+    def _parse_pickle(self, data):
+        points = []
+        while len(data) >= 4:
+            (length,) = struct.unpack("!L", data[:4])
+            if len(data) < 4 + length:
+                break
+            try:
+                tpl_list = pickle.loads(data[4:4 + length])
+                for path, (timestamp, value) in tpl_list:
+                    points.append((path, float(timestamp), float(value)))
+            except Exception:
+                self.errors += 1
+            data = data[4 + length:]
+        return points, data
+
+
+class ProxiedConnection(object):
+    '''A client connection of a ChaosProxy, and its upstream connection.'''
+
+    def __init__(self, client, upstream):
+        self.client = client
+        self.upstream = upstream
+        self.dead = False
+
+
+class ChaosProxy(object):
+    '''A TCP proxy between clients and a carbon server, usually a FakeCarbon,
+    failing on command to see how clients cope.
+
+    * restart() closes every connection and refuses new ones for a while,
+      like carbon being restarted
+    * half_open() makes the current connections silently stop forwarding and
+      reading, like a peer that vanished without closing them; the clients
+      only notice once their socket buffers are full and a write times out
+    * slow() caps the bytes forwarded per second, like an overloaded carbon
+
+    It runs on a single background thread polling with select(), like
+    FakeCarbon.
+
+    :param upstream: (host, port) of the carbon server
+    :param host: address to listen on
+    :type host: Default: '127.0.0.1'
+    :param port: port to listen on, 0 picks a free one
+    :type port: Default: 0
+    :param receive_buffer_size: kernel receive buffer of the accepted
+        connections, a small one makes half_open() and slow() noticed sooner
+    '''
+
+    def __init__(self, upstream, host='127.0.0.1', port=0,
+                 receive_buffer_size=None):
+        self.upstream = upstream
+        self.host = host
+        self.port = port
+        self.receive_buffer_size = receive_buffer_size
+        self.socket = None
+        self._connections = []
+        self._commands = queue.Queue()
+        self._listen_at = None
+        self._rate = None
+        self._allowance = 0
+        self._thread = None
+        self._running = False
+        self.connections = 0
+        self.forwarded_bytes = 0
+        self.restarts = 0
+
+    @property
+    def address(self):
+        return (self.host, self.port)
+
+    def client_kwargs(self):
+        """
+        Return the GraphiteClient arguments sending through this proxy.
+        """
+        return {'graphite_server': self.host, 'graphite_port': self.port}
+
+    def _listen(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.receive_buffer_size:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                            self.receive_buffer_size)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        sock.listen(128)
+        return sock
+
+    def start(self):
+        """
+        Listen, and start forwarding on a background thread.
+        """
+        self.socket = self._listen()
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name='ChaosProxy %s' % (self.address,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the thread and close every socket.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def restart(self, downtime=1):
+        """
+        Close every connection and the listening socket, and listen again
+        after _downtime_ seconds.
+        """
+        self._commands.put(lambda: self._restart(downtime))
+
+    def half_open(self):
+        """
+        Stop forwarding and reading on the current connections, without
+        closing them. New connections are forwarded normally.
+        """
+        self._commands.put(self._half_open)
+
+    def slow(self, bytes_per_second):
+        """
+        Forward at most _bytes_per_second_, or as fast as possible if None.
+        """
+        self._commands.put(lambda: self._slow(bytes_per_second))
+
+    def stats(self):
+        return {
+            'connections': self.connections,
+            'open_connections': len(self._connections),
+            'forwarded_bytes': self.forwarded_bytes,
+            'restarts': self.restarts,
+        }
+
+    def _restart(self, downtime):
+        for connection in list(self._connections):
+            self._close(connection)
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        self._listen_at = time.time() + downtime
+        self.restarts += 1
+
+    def _half_open(self):
+        for connection in self._connections:
+            connection.dead = True
+
+    def _slow(self, bytes_per_second):
+        self._rate = bytes_per_second
+        self._allowance = 0
+
+    def _run(self):
+        last = time.time()
+        try:
+            while self._running:
+                while not self._commands.empty():
+                    self._commands.get_nowait()()
+                now = time.time()
+                if self.socket is None and now >= self._listen_at:
+                    self.socket = self._listen()
+                if self._rate is not None:
+                    self._allowance = min(self._rate, self._allowance +
+                                          (now - last) * self._rate)
+                last = now
+
+                sockets = []
+                if self.socket is not None:
+                    sockets.append(self.socket)
+                throttled = self._rate is not None and self._allowance < 1
+                for connection in self._connections:
+                    if connection.dead:
+                        continue
+                    sockets.append(connection.upstream)
+                    if not throttled:
+                        sockets.append(connection.client)
+                if not sockets:
+                    time.sleep(0.01)
+                    continue
+                readable = select.select(sockets, [], [], 0.01)[0]
+                for sock in readable:
+                    if sock is self.socket:
+                        self._accept()
+                    else:
+                        self._forward(sock)
+        finally:
+            for connection in list(self._connections):
+                self._close(connection)
+            if self.socket is not None:
+                self.socket.close()
+
+    def _accept(self):
+        client, _ = self.socket.accept()
+        try:
+            upstream = socket.create_connection(self.upstream)
+        except socket.error:
+            client.close()
+            return
+        self._connections.append(ProxiedConnection(client, upstream))
+        self.connections += 1
+
+    def _forward(self, sock):
+        for connection in self._connections:
+            if sock is connection.client:
+                destination = connection.upstream
+                break
+            if sock is connection.upstream:
+                destination = connection.client
+                break
+        else:
+            return
+        size = 65536
+        if sock is connection.client and self._rate is not None:
+            size = max(1, min(size, int(self._allowance)))
+        try:
+            data = sock.recv(size)
+        except socket.error:
+            data = b""
+        if not data:
+            self._close(connection)
+            return
+        if sock is connection.client:
+            self.forwarded_bytes += len(data)
+            if self._rate is not None:
+                self._allowance -= len(data)
+        try:
+            destination.sendall(data)
+        except socket.error:
+            self._close(connection)
+
+    def _close(self, connection):
+        self._connections.remove(connection)
+        connection.client.close()
+        connection.upstream.close()
@@ -0,0 +1,147 @@
+import functools
+import inspect
+import threading
+import time
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # python < 3.7, blocks are only told apart by thread
+    class ContextVar(threading.local):
+
+        def __init__(self, name, default=None):
+            self.value = default
+
+        def get(self):
+            return self.value
+
+        def set(self, value):
+            self.value = value
+
+try:
+    perf_counter_ns = time.perf_counter_ns
+except AttributeError:  # python < 3.7
+    _clock = getattr(time, 'perf_counter', time.time)
+
+    def perf_counter_ns():
+        return int(_clock() * 1e9)
+
+
+# The blocks being timed, innermost last. Each thread and each asyncio task
+# has its own.
+_blocks = ContextVar('graphitesend_timed_blocks', default=())
+
+
+def _is_coroutine_function(func):
+    # python2 has no coroutine functions.
+    check = getattr(inspect, 'iscoroutinefunction', None)
+    return check is not None and check(func)
+
+
+class Timer(object):
+    '''Time a block of code, or every call of a function, in milliseconds.
+
+    The duration goes to a MetricHandle, so the series path is only encoded
+    once, and is recorded in the client's buffer until the next flush()
+    unless `buffered` is False.
+
+    .. code-block:: python
+
+      >>> with g.timer("db.query"):
+      ...     run_query()
+
+      >>> @g.timer("handler")
+      ... def handler(request):
+      ...     ...
+
+    Coroutine functions are timed until they return, not until they are
+    called. A timer can be reused in nested blocks, by several threads and
+    by several asyncio tasks: each block is a TimedBlock of its own, which
+    the with statement returns. The timer's `elapsed` is the duration of
+    whichever block or call finished last.
+
+    .. code-block:: python
+
+      >>> with g.timer("db.query") as block:
+      ...     run_query()
+      >>> block.elapsed
+
+    Buffered durations stay in the client's buffer until flush(). Unless
+    the client flushes on its own (adaptive_flush) or caps its buffer
+    (max_buffer_bytes), that buffer grows for as long as flush() is not
+    called: call it regularly, or pass buffered=False.
+
+    :param handle: the MetricHandle the durations are sent to
+    :param buffered: record the durations instead of sending them
+    :type buffered: Default: True
+    '''
+
+    __slots__ = ('handle', 'buffered', 'elapsed')
+
+    def __init__(self, handle, buffered=True):
+        self.handle = handle
+        self.buffered = buffered
+        self.elapsed = None
+
+    def __enter__(self):
+        block = TimedBlock(self)
+        _blocks.set(_blocks.get() + (block,))
+        block.start = perf_counter_ns()
+        return block
+
+    def __exit__(self, *exc_info):
+        end = perf_counter_ns()
+        blocks = _blocks.get()
+        # The innermost block of this timer, other timers may be nested in
+        # it and exited in any order.
+        for position in reversed(range(len(blocks))):
+            if blocks[position].timer is self:
+                break
+        else:
+            raise RuntimeError("%r was exited without being entered" % self)
+        block = blocks[position]
+        _blocks.set(blocks[:position] + blocks[position + 1:])
+        block.elapsed = (end - block.start) / 1e6
+        self.stop(end - block.start)
+
+    def stop(self, elapsed_ns):
+        """
+        Send, or record, a duration of _elapsed_ns_ nanoseconds.
+        """
+        self.elapsed = elapsed_ns / 1e6
+        if self.buffered:
+            self.handle.record(self.elapsed)
+        else:
+            self.handle.send(self.elapsed)
+
+    def __call__(self, func):
+        if _is_coroutine_function(func):
+            # Only imported when needed, the module is python 3 syntax.
+            from .timing_async import time_coroutine
+            return time_coroutine(self, func)
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stop(perf_counter_ns() - start)
+        return timed
+
+
+class TimedBlock(object):
+    '''A block timed by a Timer, returned by its with statement.
+
+    `elapsed` is the duration of the block in milliseconds, once it has
+    finished.
+    '''
+
+    __slots__ = ('timer', 'start', 'elapsed')
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.start = None
+        self.elapsed = None
+
+    def __repr__(self):
+        return "<TimedBlock %r %s>" % (self.timer.handle, self.elapsed)
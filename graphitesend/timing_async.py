@@ -0,0 +1,18 @@
+import functools
+
+from .timing import perf_counter_ns
+
+
+def time_coroutine(timer, func):
+    """
+    Wrap the coroutine function _func_, so that _timer_ measures each call
+    until the coroutine returns.
+    """
+    @functools.wraps(func)
+    async def timed(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            timer.stop(perf_counter_ns() - start)
+    return timed
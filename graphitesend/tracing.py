@@ -0,0 +1,52 @@
+import logging
+
+
+class Tracer(object):
+    '''Debug logging that costs a single attribute lookup when disabled.
+
+    Whether the logger accepts `level` is looked up once, when the tracer is
+    created, instead of on every metric. Call refresh() after changing the
+    logging configuration. Messages are only interpolated by the logging
+    module, so arguments must be passed separately:
+
+    .. code-block:: python
+
+      >>> trace = Tracer(logging.getLogger("graphitesend"))
+      >>> if trace.enabled:
+      ...     trace("metric: '%s'", metric_name)
+
+    :param logger: logger the messages are sent to
+    :param level: level of the messages
+    :type level: Default: logging.DEBUG
+    :param force: trace even if the logger did not ask for it
+    :type force: True or False
+    '''
+
+    def __init__(self, logger, level=logging.DEBUG, force=False):
+        self.logger = logger
+        self.level = level
+        self.force = force
+        self.refresh()
+
+    def refresh(self):
+        """
+        Look up again whether the logger is enabled for our level.
+        """
+        self.enabled = self.force or self.logger.isEnabledFor(self.level)
+        return self.enabled
+
+    def __call__(self, msg, *args):
+        if self.enabled:
+            self.logger.log(self.level, msg, *args)
+
+    def batch(self, count, size, **fields):
+        """
+        Emit one structured summary for a whole batch of metrics. The fields
+        are also attached to the log record as record.graphitesend.
+        """
+        if not self.enabled:
+            return
+        fields['count'] = count
+        fields['size'] = size
+        self.logger.log(self.level, "sent batch of %d metrics, %d bytes",
+                        count, size, extra={'graphitesend': fields})
@@ -0,0 +1,150 @@
+import os
+import socket
+
+# Maximum number of buffers a single sendmsg() call accepts.
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+if IOV_MAX <= 0:
+    IOV_MAX = 1024
+
+
+def sendmsg_all(sock, buffers, iov_max=IOV_MAX):
+    """
+    Write all the _buffers_ to _sock_ with as few sendmsg() calls as
+    possible, passing up to _iov_max_ buffers to each one.
+
+    Like socket.sendall(), this keeps going after a partial write: buffers
+    that were completely written are skipped, and the one that was cut is
+    resumed from where the kernel stopped.
+
+    Return the number of bytes written.
+    """
+    buffers = list(buffers)
+    count = len(buffers)
+    total = 0
+    i = 0
+    while i < count:
+        # Empty buffers would make sendmsg() return 0 forever.
+        if not len(buffers[i]):
+            i += 1
+            continue
+        sent = sock.sendmsg(buffers[i:i + iov_max])
+        total += sent
+        while sent and i < count:
+            size = len(buffers[i])
+            if sent >= size:
+                sent -= size
+                i += 1
+            else:
+                buffers[i] = memoryview(buffers[i])[sent:]
+                sent = 0
+    return total
+
+
+def split_datagrams(data, max_size):
+    """
+    Cut _data_ in pieces of at most _max_size_ bytes, on line boundaries, so
+    that each one can be sent as a datagram. A single line longer than
+    _max_size_ is yielded whole.
+    """
+    view = memoryview(data)
+    start = 0
+    length = len(data)
+    while length - start > max_size:
+        end = data.rfind(b"\n", start, start + max_size)
+        if end == -1:
+            end = data.find(b"\n", start + max_size)
+            if end == -1:
+                break
+        yield view[start:end + 1]
+        start = end + 1
+    if start < length:
+        yield view[start:]
+
+
+def apply_socket_options(sock, options):
+    """
+    Apply the tuning _options_ to a socket that is not connected yet:
+
+    * tcp_nodelay: disable Nagle's algorithm
+    * send_buffer_size: size of the kernel send buffer (SO_SNDBUF)
+    * keepalive: seconds of idleness before TCP keepalive probes are sent,
+      one probe every third of that and the connection is dropped after 3
+      unanswered probes
+
+    Options set to None are left to the kernel defaults, as are the ones
+    the platform does not support.
+    """
+    if options.get('send_buffer_size'):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                        int(options['send_buffer_size']))
+    if sock.family not in (socket.AF_INET, getattr(socket, 'AF_INET6', None)):
+        return
+    if options.get('tcp_nodelay') is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                        int(bool(options['tcp_nodelay'])))
+    keepalive = options.get('keepalive')
+    if keepalive:
+        keepalive = int(keepalive)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for name, value in (('TCP_KEEPIDLE', keepalive),
+                            ('TCP_KEEPINTVL', max(1, keepalive // 3)),
+                            ('TCP_KEEPCNT', 3)):
+            if hasattr(socket, name):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name),
+                                value)
+
+
+def read_socket_options(sock):
+    """
+    Return the values the kernel actually uses for the tuning options of
+    _sock_. Note that linux reports twice the SO_SNDBUF that was asked for.
+    """
+    effective = {
+        'send_buffer_size': sock.getsockopt(socket.SOL_SOCKET,
+                                            socket.SO_SNDBUF),
+        'keepalive': bool(sock.getsockopt(socket.SOL_SOCKET,
+                                          socket.SO_KEEPALIVE)),
+    }
+    if sock.family in (socket.AF_INET, getattr(socket, 'AF_INET6', None)):
+        effective['tcp_nodelay'] = bool(
+            sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        for name, key in (('TCP_KEEPIDLE', 'keepalive_idle'),
+                          ('TCP_KEEPINTVL', 'keepalive_interval'),
+                          ('TCP_KEEPCNT', 'keepalive_count'),
+                          ('TCP_CORK', 'tcp_cork')):
+            if hasattr(socket, name):
+                effective[key] = sock.getsockopt(socket.IPPROTO_TCP,
+                                                 getattr(socket, name))
+    return effective
+
+
+class corked(object):
+    '''Context manager holding back partial frames with TCP_CORK while a
+    batch is written, so it leaves in as few full-sized segments as
+    possible. Does nothing if _enabled_ is false or TCP_CORK is not
+    available.
+    '''
+
+    def __init__(self, sock, enabled=True):
+        self.sock = sock
+        self.enabled = (enabled and hasattr(socket, 'TCP_CORK') and
+                        getattr(sock, 'family', None) in (
+                            socket.AF_INET, getattr(socket, 'AF_INET6', None)))
+
+    def __enter__(self):
+        if self.enabled:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1)
+        return self.sock
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            try:
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 0)
+            except socket.error:
+                # The socket died during the write, the write error is the
+                # one worth reporting.
+                pass
+        return False
@@ -0,0 +1,81 @@
+from .timing import Timer
+
+
+class ClientView(object):
+    '''A GraphiteClient naming its metrics with its own formatter, but
+    sending them through the connection, buffer and flush thread of another
+    client. Returned by GraphiteClient.view().
+
+    A view only holds its formatter: however many are created there is one
+    connection, and what they record() goes to the same buffer, written in
+    one go by flush(). The series of each view are told apart by dedup,
+    last() and the metric() handles.
+
+    Everything that is not about naming metrics, like flush(), stats(),
+    last(), disconnect() or close(), is the shared client's.
+
+    .. code-block:: python
+
+      >>> g = init(prefix='apps', system_name='')
+      >>> db = g.view(prefix='apps', group='db', system_name='')
+      >>> db.send('queries', 12)  # apps.db.queries
+
+    '''
+
+    def __init__(self, client, formatter):
+        self.client = client
+        self.formatter = formatter
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __repr__(self):
+        return "<ClientView %s of %r>" % (self.prefix, self.client)
+
+    @property
+    def prefix(self):
+        return self.formatter.prefix
+
+    @property
+    def suffix(self):
+        return self.formatter.suffix
+
+    @property
+    def lowercase_metric_names(self):
+        return self.formatter.lowercase_metric_names
+
+    def clean_metric_name(self, metric_name):
+        return self.formatter.clean_metric_name(metric_name)
+
+    def send(self, metric, value, timestamp=None, formatter=None, tags=None):
+        return self.client.send(metric, value, timestamp,
+                                formatter or self.formatter, tags)
+
+    def emit(self, metric, value, timestamp=None, tags=None):
+        return self.client.emit(metric, value, timestamp, tags,
+                                formatter=self.formatter)
+
+    def send_dict(self, data, timestamp=None, formatter=None, tags=None,
+                  metric_tags=None):
+        return self.client.send_dict(data, timestamp,
+                                     formatter or self.formatter, tags,
+                                     metric_tags)
+
+    def send_list(self, data, timestamp=None, formatter=None, tags=None):
+        return self.client.send_list(data, timestamp,
+                                     formatter or self.formatter, tags)
+
+    def record(self, metric, value, timestamp=None, formatter=None,
+               tags=None):
+        return self.client.record(metric, value, timestamp,
+                                  formatter or self.formatter, tags)
+
+    def bulk_export(self, data, **kwargs):
+        kwargs.setdefault('formatter', self.formatter)
+        return self.client.bulk_export(data, **kwargs)
+
+    def metric(self, name, tags=None):
+        return self.client.metric(name, tags, formatter=self.formatter)
+
+    def timer(self, name, tags=None, buffered=True):
+        return Timer(self.metric(name, tags), buffered)
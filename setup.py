@@ -17,5 +17,7 @@ setup(
     },
     extras_require={
         'asynchronous': ['gevent>=1.0.0'],
+        'lz4': ['lz4'],
+        'snappy': ['python-snappy'],
     }
 )
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.admission import AdmissionControl, TokenBucket
+import unittest2 as unittest
+
+
+class TestAdmission(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def test_admission_default(self):
+        g = graphitesend.init(dryrun=True)
+        self.assertEqual(g.admission, None)
+        self.assertEqual(g.stats(), {})
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=1, burst=2, now=0)
+        self.assertTrue(bucket.consume(0))
+        self.assertTrue(bucket.consume(0))
+        self.assertFalse(bucket.consume(0))
+        self.assertTrue(bucket.consume(1))
+        self.assertFalse(bucket.consume(1.5))
+
+    def test_global_rate_limit(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              rate_limit=0.001, rate_limit_burst=2)
+        message = g.send_list([('a', 1), ('b', 2), ('c', 3)], timestamp=1)
+        self.assertEqual(message, 'a 1.000000 1\nb 2.000000 1\n')
+        self.assertEqual(g.send('d', 4), None)
+        self.assertEqual(g.stats()['rate_limited'], 2)
+
+    def test_prefix_rate_limit(self):
+        control = AdmissionControl(prefix_rate=1, prefix_burst=1)
+        self.assertTrue(control.admit('loop.metric', now=0))
+        self.assertFalse(control.admit('loop.other', now=0))
+        self.assertTrue(control.admit('quiet.metric', now=0))
+        self.assertEqual(control.prefix_rate_limited, 1)
+
+    def test_prefix_buckets_bounded(self):
+        control = AdmissionControl(prefix_rate=1, max_prefixes=2)
+        for prefix in 'abcd':
+            control.admit(prefix + '.metric', now=0)
+        self.assertEqual(control.stats()['active_prefixes'], 2)
+
+    def test_sampling(self):
+        control = AdmissionControl(sample_rate=0.5, scale_sampled=True)
+        draws = iter([0.1, 0.9])
+        control._random = lambda: next(draws)
+        self.assertTrue(control.admit('metric', now=0))
+        self.assertFalse(control.admit('metric', now=0))
+        self.assertEqual(control.sampled_out, 1)
+        self.assertEqual(control.scale(3), 6.0)
+
+    def test_bad_sample_rate(self):
+        with self.assertRaises(ValueError):
+            AdmissionControl(sample_rate=0)
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.init(dryrun=True, sample_rate=2)
+
+    def test_dedup_compares_values_before_scaling(self):
+        g = graphitesend.init(dryrun=True, dedup=True, sample_rate=0.5,
+                              sample_scale=True, last_values=True)
+        g.admission._random = lambda: 0
+        self.assertTrue(g.send('metric', 1, 1))
+        self.assertEqual(g.send('metric', 1, 2), None)
+        self.assertEqual(g.stats()['dedup_suppressed'], 1)
+        self.assertEqual(list(g.last().values()), [(2.0, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
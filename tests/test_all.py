@@ -249,6 +249,28 @@ class TestAll(unittest.TestCase):
         response = graphite_instance.send(42, "1", "1")
         self.assertEqual('42' in response, True)
 
+    def test_emit(self):
+        graphite_instance = graphitesend.init(prefix='test', system_name='')
+        (c, addr) = self.server.accept()
+        self.assertTrue(graphite_instance.emit('metric', 1, 1) is True)
+        sent_on_socket = c.recv(69)
+        self.assertEqual(sent_on_socket, b'test.metric 1.000000 1\n')
+
+    def test_emit_module_level(self):
+        graphitesend.init(dryrun=True)
+        self.assertTrue(graphitesend.emit('metric', 1) is True)
+
+    def test_emit_dropped(self):
+        graphite_instance = graphitesend.init(dryrun=True, dedup=True)
+        self.assertTrue(graphite_instance.emit('metric', 1) is True)
+        self.assertEqual(graphite_instance.emit('metric', 1), None)
+
+    def test_emit_without_socket(self):
+        graphite_instance = graphitesend.init()
+        graphite_instance.socket = None
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphite_instance.emit('metric', 0)
+
 
 if __name__ == '__main__':
     unittest.main()
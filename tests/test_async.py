@@ -2,8 +2,8 @@
 
 from gevent import monkey
 from graphitesend import graphitesend
+from graphitesend.testing import FakeCarbon
 import unittest2 as unittest
-import socket
 
 monkey.patch_socket()
 
@@ -13,21 +13,18 @@ class TestAsync(unittest.TestCase):
 
     def setUp(self):
         """ reset graphitesend """
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server.bind(('localhost', 2003))
-        self.server.listen(5)
+        self.carbon = FakeCarbon().start()
 
     def tearDown(self):
         """ reset graphitesend """
         # Drop any connections or modules that have been setup from other tests
         graphitesend.reset()
-        try:
-            self.server.shutdown(socket.SHUT_RD)
-            self.server.close()
-        except Exception:
-            pass
-        self.server = None
+        self.carbon.stop()
+
+    def init(self, **kwargs):
+        kwargs.update(self.carbon.client_kwargs())
+        return graphitesend.init(prefix='', system_name='', asynchronous=True,
+                                 **kwargs)
 
     def test_set_async_default(self):
         g = graphitesend.init(dryrun=True)
@@ -42,8 +39,57 @@ class TestAsync(unittest.TestCase):
         self.assertEqual(g.asynchronous, False)
 
     def test_send_reconnect_send_again(self):
-        g = graphitesend.init(prefix='', system_name='', asynchronous=True)
+        g = self.init()
         g.send('test_send', 50)
-        (c, addr) = self.server.accept()
-        sent_on_socket = str(c.recv(69))
-        self.assertIn('test_send 50.000000', sent_on_socket)
+        g.flush(timeout=5)
+        self.assertTrue(self.carbon.wait_for(1))
+        self.assertEqual(self.carbon.series['test_send'][0][1], 50.0)
+
+    def test_single_writer_coalesces(self):
+        g = self.init()
+        for i in range(10):
+            g.send('metric', i, 1)
+        self.assertEqual(g.stats()['async_queued'], 10)
+        self.assertTrue(g.flush(timeout=5) is None)
+        stats = g.stats()
+        self.assertEqual(stats['async_sent'], 10)
+        self.assertEqual(stats['async_writes'], 1)
+        self.assertTrue(self.carbon.wait_for(10))
+        self.assertEqual(self.carbon.series['metric'],
+                         [(1.0, float(i)) for i in range(10)])
+
+    def test_flush_timeout(self):
+        g = self.init(send_buffer_size=4096)
+        self.carbon.stall(1)
+        # More than the kernel buffers hold while carbon is not reading.
+        for _ in range(200):
+            g.send_list([('m%d' % n, n, 1) for n in range(100)])
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            g.flush(timeout=0.1)
+        self.assertTrue(g.flush(timeout=10) is None)
+
+    def test_queue_size_drops(self):
+        g = self.init(async_queue_size=2)
+        for i in range(5):
+            g.send('metric', i, 1)
+        self.assertEqual(g.stats()['async_dropped'], 3)
+
+    def test_writer_errors_are_counted(self):
+        g = self.init()
+        g.socket.close()
+        g.send('metric', 1, 1)
+        g.flush(timeout=5)
+        stats = g.stats()
+        self.assertEqual(stats['async_errors'], 1)
+        self.assertEqual(stats['async_dropped'], 1)
+        self.assertFalse(g.writer.greenlet.dead)
+
+    def test_writer_reconnects(self):
+        g = self.init(autoreconnect=True)
+        g.socket.close()
+        g.send('metric', 1, 1)
+        g.flush(timeout=5)
+        self.assertTrue(self.carbon.wait_for(1))
+        self.assertEqual(self.carbon.series['metric'], [(1.0, 1.0)])
+        self.assertEqual(self.carbon.connections, 2)
+        self.assertEqual(g.stats()['async_errors'], 0)
@@ -1,29 +1,21 @@
 #!/usr/bin/env python
 
 from graphitesend import graphitesend
+from graphitesend.testing import FakeCarbon
 import unittest2 as unittest
-import socket
 
 
 class TestAutoreconnect(unittest.TestCase):
 
     def setUp(self):
         """ reset graphitesend """
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server.bind(('localhost', 2003))
-        self.server.listen(5)
+        self.carbon = FakeCarbon().start()
 
     def tearDown(self):
         """ reset graphitesend """
         # Drop any connections or modules that have been setup from other tests
         graphitesend.reset()
-        try:
-            self.server.shutdown(socket.SHUT_RD)
-            self.server.close()
-        except Exception:
-            pass
-        self.server = None
+        self.carbon.stop()
 
     def test_set_autoreconnect_default(self):
         g = graphitesend.init(dryrun=True)
@@ -38,10 +30,18 @@ class TestAutoreconnect(unittest.TestCase):
         self.assertEqual(g._autoreconnect, False)
 
     def test_autoreconnect(self):
-        g = graphitesend.GraphiteClient(autoreconnect=True)
-        g.send("metric", 42)
-        self.tearDown()
+        g = graphitesend.GraphiteClient(autoreconnect=True, prefix='',
+                                        system_name='',
+                                        **self.carbon.client_kwargs())
+        g.send("metric", 42, 1)
+        self.assertTrue(self.carbon.wait_for(1))
+        self.carbon.stop()
+        # The first write after the server went away can still make it to
+        # the kernel buffer, the error shows up on the next ones.
         with self.assertRaises(graphitesend.GraphiteSendException):
-            g.send("metric", 2)
-        self.setUp()
-        g.send("metric", 3)
+            for _ in range(10):
+                g.send("metric", 2, 2)
+        self.carbon = FakeCarbon(port=self.carbon.port).start()
+        g.send("metric", 3, 3)
+        self.assertTrue(self.carbon.wait_for(1))
+        self.assertEqual(self.carbon.series['metric'], [(3.0, 3.0)])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.buffering import MemoryBudget
+import socket
+import threading
+import time
+import unittest2 as unittest
+
+
+class TestMemoryBudget(unittest.TestCase):
+
+    def test_acquire_release(self):
+        budget = MemoryBudget(10)
+        self.assertTrue(budget.acquire(6))
+        self.assertFalse(budget.acquire(6, block=False))
+        budget.release(6)
+        self.assertTrue(budget.acquire(6, block=False))
+        self.assertEqual(budget.peak, 6)
+        self.assertEqual(budget.rejected, 1)
+
+    def test_oversized_reservation_when_empty(self):
+        budget = MemoryBudget(10)
+        self.assertTrue(budget.acquire(100, block=False))
+
+    def test_block_timeout_and_callback(self):
+        calls = []
+        budget = MemoryBudget(10, callback=lambda *args: calls.append(args))
+        budget.acquire(10)
+        self.assertFalse(budget.acquire(1, timeout=0.01))
+        self.assertEqual(calls, [(1, 10, 10)])
+
+    def test_block_until_released(self):
+        budget = MemoryBudget(10)
+        budget.acquire(10)
+        timer = threading.Timer(0.05, budget.release, (10,))
+        timer.start()
+        self.assertTrue(budget.acquire(5, timeout=5))
+        timer.join()
+
+
+class TestBackpressure(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def client(self, **kwargs):
+        g = graphitesend.GraphiteClient(prefix='', system_name='',
+                                        connect_on_create=False, **kwargs)
+        g.socket, self.server = socket.socketpair()
+        self.addCleanup(self.server.close)
+        return g
+
+    def test_invalid_policy(self):
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.init(dryrun=True, backpressure='drop')
+
+    def test_record_flushes_to_make_room(self):
+        g = self.client(max_buffer_bytes=30)
+        g.record('a', 1, 1)
+        g.record('b', 2, 1)
+        g.record('c', 3, 1)
+        self.assertEqual(self.server.recv(1024),
+                         b'a 1.000000 1\nb 2.000000 1\n')
+        self.assertEqual(g.stats()['buffer_bytes'], 13)
+        g.flush()
+        self.assertEqual(g.stats()['buffer_bytes'], 0)
+
+    def test_send_flushes_the_buffer_holding_the_budget(self):
+        g = self.client(max_buffer_bytes=40)
+        g.record('a', 1, 1)
+        g.record('b', 2, 1)
+        # Would the send wait for a flush of this same thread, the watchdog
+        # ends the wait instead, and the test fails on the elapsed time.
+        watchdog = threading.Timer(5, g.budget.release, (40,))
+        watchdog.start()
+        self.addCleanup(watchdog.cancel)
+        start = time.time()
+        g.send('ccccc', 3, 1)
+        self.assertTrue(time.time() - start < 5)
+        received = b''
+        while len(received) < 43:
+            received += self.server.recv(1024)
+        self.assertEqual(received, b'a 1.000000 1\nb 2.000000 1\n'
+                         b'ccccc 3.000000 1\n')
+        self.assertEqual(g.stats()['buffer_bytes'], 0)
+
+    def test_would_block(self):
+        g = self.client(max_buffer_bytes=20, backpressure='would_block')
+        # Somebody else holds the whole budget.
+        g.budget.acquire(20)
+        self.assertEqual(g.send('a', 1, 1), graphitesend.WOULD_BLOCK)
+        self.assertEqual(g.record('a', 1, 1), graphitesend.WOULD_BLOCK)
+        g.budget.release(20)
+        self.assertNotEqual(g.send('a', 1, 1), graphitesend.WOULD_BLOCK)
+
+    def test_raise(self):
+        g = self.client(max_buffer_bytes=20, backpressure='raise')
+        g.budget.acquire(20)
+        with self.assertRaises(graphitesend.GraphiteBackpressureException):
+            g.send('a', 1, 1)
+
+    def test_send_list_generator_in_batches(self):
+        g = self.client(max_buffer_bytes=400)
+        self.assertEqual(g.max_batch_bytes, 100)
+        sizes = []
+        original = g._dispatch_send
+
+        def dispatch(message, reserved=0):
+            sizes.append(len(message))
+            return original(message, reserved)
+        g._dispatch_send = dispatch
+
+        metrics = (('m%d' % (i % 10), i % 10) for i in range(100))
+        g.send_list(metrics, timestamp=1)
+        self.assertEqual(sum(sizes), 1400)
+        self.assertTrue(max(sizes) <= 100 + 14)
+        self.assertTrue(g.stats()['buffer_peak_bytes'] <= 100 + 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend import compression
+import socket
+import zlib
+import unittest2 as unittest
+
+
+class TestCompression(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def client(self, codec, **kwargs):
+        g = graphitesend.GraphiteClient(prefix='', system_name='',
+                                        connect_on_create=False,
+                                        compression=codec, **kwargs)
+        g.socket, self.server = socket.socketpair()
+        self.server.settimeout(2)
+        self.addCleanup(self.server.close)
+        return g
+
+    def assertBatchDecompresses(self, g, stream, batch, expected):
+        g.send_list(batch, 1)
+        # The stream is flushed at the end of each batch, so it can be
+        # decompressed without waiting for the next one.
+        received = b""
+        while len(received) < len(expected):
+            received += stream.decompress(self.server.recv(65536))
+        self.assertEqual(received, expected)
+
+    def test_zlib(self):
+        g = self.client('zlib')
+        stream = zlib.decompressobj()
+        self.assertBatchDecompresses(g, stream, [('a', 1)], b'a 1.000000 1\n')
+        self.assertBatchDecompresses(g, stream, [('b', 2), ('c', 3)],
+                                     b'b 2.000000 1\nc 3.000000 1\n')
+
+    def test_gzip(self):
+        g = self.client('gzip')
+        stream = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertBatchDecompresses(g, stream, [('a', 1)], b'a 1.000000 1\n')
+
+    def test_vectored_writes_are_compressed(self):
+        g = self.client('zlib', vectored_writes=True)
+        stream = zlib.decompressobj()
+        self.assertBatchDecompresses(g, stream, [('a', 1), ('b', 2)],
+                                     b'a 1.000000 1\nb 2.000000 1\n')
+
+    def test_stats(self):
+        g = self.client('zlib')
+        g.send_list([('metric.%d' % i, 1) for i in range(100)], 1)
+        stats = g.stats()
+        self.assertEqual(stats['compression'], 'zlib')
+        self.assertTrue(stats['compression_ratio'] > 2)
+        self.assertTrue(stats['compression_bytes_in'] >
+                        stats['compression_bytes_out'])
+
+    def test_missing_codec_falls_back_to_zlib(self):
+        available = compression.lz4_frame
+        compression.lz4_frame = False
+        try:
+            compressor = compression.get_compressor('lz4')
+        finally:
+            compression.lz4_frame = available
+        self.assertEqual(compressor.name, 'zlib')
+
+    def test_unknown_codec(self):
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.init(dryrun=True, compression='brotli')
+
+    def test_datagrams_not_supported(self):
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.init(dryrun=True, transport='unix_dgram',
+                              compression='zlib')
+
+
+if __name__ == '__main__':
+    unittest.main()
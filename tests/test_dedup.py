@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.dedup import ChangeOnlyFilter
+import unittest2 as unittest
+
+
+class TestDedup(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def test_dedup_default(self):
+        g = graphitesend.init(dryrun=True)
+        self.assertEqual(g.dedup, None)
+
+    def test_send_unchanged_value_suppressed(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              dedup=True)
+        self.assertEqual(g.send('metric', 1, 1), 'metric 1.000000 1\n')
+        self.assertEqual(g.send('metric', 1, 2), None)
+        self.assertEqual(g.send('metric', 2, 3), 'metric 2.000000 3\n')
+        self.assertEqual(g.dedup.suppressed, 1)
+
+    def test_send_dict_only_changed(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              dedup=True)
+        g.send_dict({'a': 1, 'b': 2}, timestamp=1)
+        message = g.send_dict({'a': 1, 'b': 3}, timestamp=2)
+        self.assertEqual(message, 'b 3.000000 2\n')
+        self.assertEqual(g.send_dict({'a': 1, 'b': 3}, timestamp=3), None)
+
+    def test_send_list_only_changed(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              dedup=True)
+        g.send_list([('a', 1), ('b', 2)], timestamp=1)
+        message = g.send_list([('a', 5), ('b', 2)], timestamp=2)
+        self.assertEqual(message, 'a 5.000000 2\n')
+
+    def test_record_remembered_once_flushed(self):
+        g = graphitesend.GraphiteClient(connect_on_create=False, prefix='',
+                                        system_name='', dedup=True,
+                                        last_values=True)
+        g.record('metric', 1, 1)
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            g.flush()
+        self.assertEqual(g.last(), {})
+        g.dryrun = True
+        g.record('metric', 1, 1)
+        self.assertEqual(g.flush(), 'metric 1.000000 1\n')
+        self.assertEqual(g.last(), {'metric': (1, 1)})
+        g.record('metric', 1, 1)
+        self.assertEqual(g.flush(), None)
+
+    def test_heartbeat(self):
+        f = ChangeOnlyFilter(heartbeat=10)
+        f.remember('metric', 1, now=100)
+        self.assertTrue(f.is_duplicate('metric', 1, now=105))
+        self.assertFalse(f.is_duplicate('metric', 1, now=110))
+        self.assertFalse(f.is_duplicate('metric', 2, now=105))
+
+    def test_max_series_evicts_oldest(self):
+        f = ChangeOnlyFilter(max_series=2)
+        f.remember('a', 1, now=1)
+        f.remember('b', 1, now=1)
+        f.remember('a', 1, now=2)
+        f.remember('c', 1, now=2)
+        self.assertEqual(len(f), 2)
+        self.assertEqual(f.evicted, 1)
+        self.assertFalse(f.is_duplicate('b', 1, now=3))
+        self.assertTrue(f.is_duplicate('a', 1, now=3))
+
+    def test_forget(self):
+        f = ChangeOnlyFilter()
+        f.remember('a', 1, now=1)
+        f.forget('a')
+        self.assertFalse(f.is_duplicate('a', 1, now=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.export import BulkExporter, ChunkFormatter, chunked
+from graphitesend.formatter import (GraphiteStructuredFormatter,
+                                    compile_template)
+import pickle
+import socket
+import struct
+import unittest2 as unittest
+
+
+class Receiver(object):
+    """ Listen for the exporting clients, then read everything each of them
+    sent once they are disconnected. The exports of these tests fit in the
+    socket buffers, so nothing needs to read while they run. """
+
+    def __init__(self, connections=1):
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(connections)
+        self.port = self.server.getsockname()[1]
+        self.connections = connections
+
+    def received(self):
+        received = []
+        for _ in range(self.connections):
+            conn, _ = self.server.accept()
+            data = []
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                data.append(chunk)
+            conn.close()
+            received.append(b"".join(data))
+        self.server.close()
+        return received
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.data = [('metric.%d' % i, i, 1000 + i) for i in range(1000)]
+        self.expected = b"".join(
+            ('test.metric.%d %f %d\n' % (i, i, 1000 + i)).encode('ascii')
+            for i in range(1000))
+        self.formatter = GraphiteStructuredFormatter(prefix='',
+                                                     system_name='')
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def export(self, **kwargs):
+        receiver = Receiver()
+        g = graphitesend.GraphiteClient(graphite_server='127.0.0.1',
+                                        graphite_port=receiver.port,
+                                        prefix='test', system_name='')
+        chunks = g.bulk_export(self.data, chunk_size=100, **kwargs)
+        g.disconnect()
+        return chunks, receiver.received()[0]
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked([], 2)), [])
+
+    def test_chunk_formatter(self):
+        formatter = ChunkFormatter(self.formatter, 10, tags={'dc': 'a'})
+        payload = formatter([('a', 1), ('b', 2, 20, {'dc': 'b'})])
+        self.assertEqual(payload,
+                         b'a;dc=a 1.000000 10\nb;dc=b 2.000000 20\n')
+
+    def test_chunk_formatter_pickled(self):
+        formatter = ChunkFormatter(self.formatter, 10, lowercase=True,
+                                   pickled=True, pickle_protocol=2)
+        frame = formatter([('A', 1), ('b', 2, 20)])
+        (length,) = struct.unpack("!L", frame[:4])
+        self.assertEqual(length, len(frame) - 4)
+        self.assertEqual(frame[4:6], b'\x80\x02')
+        self.assertEqual(pickle.loads(frame[4:]),
+                         [('a', (10.0, '1.000000')),
+                          ('b', (20.0, '2.000000'))])
+
+    def test_in_process(self):
+        self.assertEqual(self.export(processes=0), (10, self.expected))
+
+    def test_process_pool_ordered(self):
+        self.assertEqual(self.export(processes=2), (10, self.expected))
+
+    def test_process_pool_unordered(self):
+        chunks, received = self.export(processes=2, ordered=False)
+        self.assertEqual(chunks, 10)
+        self.assertEqual(sorted(received.splitlines()),
+                         sorted(self.expected.splitlines()))
+
+    def test_process_pool_template(self):
+        template = compile_template("{path} {value} {timestamp}\n",
+                                    prefix='test.')
+        self.assertEqual(self.export(processes=2, formatter=template),
+                         (10, self.expected))
+
+    def test_senders(self):
+        receiver = Receiver(connections=2)
+        clients = [graphitesend.GraphiteClient(graphite_server='127.0.0.1',
+                                               graphite_port=receiver.port,
+                                               prefix='test', system_name='')
+                   for _ in range(2)]
+        clients[0].bulk_export(self.data, chunk_size=100, processes=0,
+                               senders=clients[1:])
+        for client in clients:
+            client.disconnect()
+        first, second = receiver.received()
+        self.assertEqual(first.count(b'\n'), 500)
+        self.assertEqual(second.count(b'\n'), 500)
+        self.assertEqual(sorted((first + second).splitlines()),
+                         sorted(self.expected.splitlines()))
+
+    def test_dryrun(self):
+        g = graphitesend.init(dryrun=True)
+        self.assertEqual(g.bulk_export(self.data, chunk_size=300,
+                                       processes=0), 4)
+
+    def test_write_error(self):
+        def fail(payload):
+            raise socket.error("broken pipe")
+        exporter = BulkExporter([fail], ChunkFormatter(self.formatter, 10),
+                                processes=0, chunk_size=10)
+        with self.assertRaises(socket.error):
+            exporter.run(self.data)
+
+    def test_without_socket(self):
+        g = graphitesend.init(dryrun=True)
+        g.dryrun = False
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            g.bulk_export(self.data)
+
+    def test_pickle_unix_dgram(self):
+        g = graphitesend.init(init_type='pickle', dryrun=True,
+                              transport='unix_dgram',
+                              unix_socket_path='/nonexistent')
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            g.bulk_export(self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.lastvalue import LastValueCache, compile_pattern
+import unittest2 as unittest
+
+
+class TestLastValueCache(unittest.TestCase):
+
+    def test_update_and_get(self):
+        cache = LastValueCache()
+        cache.update('a.b', 1, 10)
+        cache.update('a.b', 2, 20)
+        self.assertEqual(cache.get('a.b'), (2, 20))
+        self.assertEqual(cache.get('a.c'), None)
+        self.assertEqual(len(cache), 1)
+
+    def test_tagged_series_name(self):
+        cache = LastValueCache()
+        cache.update(('a.b', frozenset([('z', '1'), ('y', '2')])), 1, 10)
+        self.assertEqual(cache.get('a.b;y=2;z=1'), (1, 10))
+
+    def test_lru_eviction(self):
+        cache = LastValueCache(max_series=2)
+        cache.update('a', 1, 1)
+        cache.update('b', 2, 2)
+        cache.update('a', 3, 3)
+        cache.update('c', 4, 4)
+        self.assertEqual(sorted(cache.query()), ['a', 'c'])
+        self.assertEqual(cache.query('b'), {})
+        self.assertEqual(cache.stats()['last_value_evicted'], 1)
+
+    def test_query(self):
+        cache = LastValueCache()
+        for name in ('app.requests.get', 'app.requests.post',
+                     'app.requests.get.slow', 'app.requestsx', 'app.errors',
+                     'other'):
+            cache.update(name, 1, 1)
+        self.assertEqual(sorted(cache.query('app.requests.*')),
+                         ['app.requests.get', 'app.requests.post'])
+        self.assertEqual(sorted(cache.query('app.*.get')),
+                         ['app.requests.get'])
+        self.assertEqual(sorted(cache.query('app.{errors,requestsx}')),
+                         ['app.errors', 'app.requestsx'])
+        self.assertEqual(sorted(cache.query('app.requests.ge[st]')),
+                         ['app.requests.get'])
+        self.assertEqual(len(cache.query()), 6)
+
+    def test_exact_query_includes_tagged_series(self):
+        cache = LastValueCache()
+        cache.update('a', 1, 1)
+        cache.update('ab', 2, 2)
+        cache.update(('a', frozenset([('t', 'x')])), 3, 3)
+        self.assertEqual(cache.query('a'), {'a': (1, 1), 'a;t=x': (3, 3)})
+
+    def test_compile_pattern(self):
+        self.assertTrue(compile_pattern('a.?').match('a.b'))
+        self.assertFalse(compile_pattern('a*').match('a.b'))
+        self.assertFalse(compile_pattern('a.b').match('a.bc'))
+        self.assertTrue(compile_pattern('a{').match('a{'))
+
+    def test_clear(self):
+        cache = LastValueCache()
+        cache.update('a', 1, 1)
+        cache.clear()
+        self.assertEqual(cache.query(), {})
+
+
+class TestLastValues(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def test_disabled_by_default(self):
+        g = graphitesend.init(dryrun=True)
+        self.assertEqual(g.last_values, None)
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            g.last()
+
+    def test_send_methods(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              last_values=True)
+        g.send('app.a', 1, 10)
+        g.emit('app.b', 2, 20)
+        g.send_dict({'app.c': 3}, timestamp=30)
+        g.send_list([('app.d', 4, 40), ('app.e', 5, None, {'t': 'x'})],
+                    timestamp=50)
+        g.record('app.f', 6, 60)
+        g.metric('app.g').send(7, 70)
+        self.assertEqual(g.last('app.f'), {})
+        g.flush()
+        self.assertEqual(g.last('app.*'), {
+            'app.a': (1, 10),
+            'app.b': (2, 20),
+            'app.c': (3, 30),
+            'app.d': (4, 40),
+            'app.e;t=x': (5, 50),
+            'app.f': (6, 60),
+            'app.g': (7, 70),
+        })
+        self.assertEqual(g.stats()['last_value_series'], 7)
+
+    def test_aligned_timestamps(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              last_values=True, timestamp_interval=60)
+        g.send('a', 1, 130.5)
+        g.send_list([('b', 2, 125), ('c', 3)], timestamp=61)
+        g.metric('d').send(4, 179)
+        with g.timer('e'):
+            pass
+        g.flush()
+        last = g.last()
+        self.assertEqual(last['a'], (1, 120))
+        self.assertEqual(last['b'], (2, 120))
+        self.assertEqual(last['c'], (3, 60))
+        self.assertEqual(last['d'], (4, 120))
+        self.assertIsInstance(last['e'][1], int)
+        self.assertEqual(last['e'][1] % 60, 0)
+
+    def test_series_names(self):
+        g = graphitesend.init(dryrun=True, prefix='apps', system_name='',
+                              last_values=True)
+        g.send('a b', 1, 10)
+        g.view(prefix='apps', group='db', system_name='').send('q', 2, 20)
+        g.metric('h').send(3, 30)
+        g.send('t', 4, 40, tags={'k': 'a b'})
+        self.assertEqual(g.last(), {'apps.a_b': (1, 10),
+                                    'apps.db.q': (2, 20),
+                                    'apps.h': (3, 30),
+                                    'apps.t;k=a_b': (4, 40)})
+
+    def test_module_last(self):
+        graphitesend.init(dryrun=True, prefix='', system_name='',
+                          last_values=True)
+        graphitesend.send('a', 1, 10)
+        self.assertEqual(graphitesend.last('a'), {'a': (1, 10)})
+
+    def test_dropped_metrics_are_not_remembered(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              last_values=True, dedup=True)
+        g.send('a', 1, 10)
+        g.send('a', 1, 20)
+        self.assertEqual(g.last('a'), {'a': (1, 10)})
+
+
+if __name__ == '__main__':
+    unittest.main()
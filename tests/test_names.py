@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from graphitesend import graphitesend
+from graphitesend.formatter import GraphiteStructuredFormatter
+from graphitesend.names import InvalidMetricName, MetricNameCleaner
+import unittest2 as unittest
+
+REPLACEMENTS = GraphiteStructuredFormatter.cleaning_replacement_list
+
+
+class TestMetricNameCleaner(unittest.TestCase):
+
+    def setUp(self):
+        self.clean = MetricNameCleaner(REPLACEMENTS, validate=True)
+
+    def test_default_only_replaces(self):
+        clean = MetricNameCleaner(REPLACEMENTS)
+        for name in ('cpu;host=a', 'a..b', '.a.b.', 'a\tb', ''):
+            self.assertEqual(clean(name), name)
+        self.assertEqual(clean('a b(c)'), 'a_b_c')
+
+    def test_default_rejects_non_ascii(self):
+        clean = MetricNameCleaner(REPLACEMENTS)
+        for _ in range(2):
+            with self.assertRaises(InvalidMetricName):
+                clean(u'caf\xe9')
+        self.assertEqual(len(clean), 1)
+
+    def test_valid_names_unchanged(self):
+        for name in ('a.b.c', 'a_b:c', 'cpu.100%'):
+            self.assertEqual(self.clean(name), name)
+
+    def test_replacements(self):
+        self.assertEqual(self.clean('test(name)'), 'test_name')
+        self.assertEqual(self.clean('a b/c-d'), 'a_b_c_d')
+
+    def test_invalid_characters(self):
+        self.assertEqual(self.clean('line\nbreak'), 'line_break')
+        self.assertEqual(self.clean('tab\tx'), 'tab_x')
+        self.assertEqual(self.clean('a;b=c'), 'a_b=c')
+
+    def test_unicode(self):
+        self.assertEqual(self.clean(u'caf\xe9.ﬁle'), 'cafe.file')
+        self.assertEqual(self.clean(u'日本.cpu'), '__.cpu')
+        self.assertEqual(self.clean(u'caf\xe9'.encode('utf-8')), 'cafe')
+
+    def test_dots(self):
+        self.assertEqual(self.clean('.a..b.'), 'a.b')
+
+    def test_not_a_string(self):
+        self.assertEqual(self.clean(42), '42')
+
+    def test_empty(self):
+        for name in ('', '...'):
+            with self.assertRaises(InvalidMetricName):
+                self.clean(name)
+
+    def test_strict(self):
+        clean = MetricNameCleaner(REPLACEMENTS, strict=True)
+        self.assertEqual(clean('a.b'), 'a.b')
+        for name in ('a b', 'a..b', u'caf\xe9'):
+            with self.assertRaises(InvalidMetricName):
+                clean(name)
+
+    def test_cache(self):
+        clean = MetricNameCleaner(REPLACEMENTS, strict=True, max_size=2)
+        clean('a')
+        with self.assertRaises(InvalidMetricName):
+            clean('b c')
+        with self.assertRaises(InvalidMetricName):
+            clean('b c')
+        self.assertEqual(len(clean), 2)
+        clean('d')
+        self.assertEqual(len(clean), 1)
+
+
+class TestNameValidation(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def client(self, **kwargs):
+        return graphitesend.init(dryrun=True, prefix='', system_name='',
+                                 **kwargs)
+
+    def test_default_names_unchanged(self):
+        g = self.client()
+        self.assertEqual(g.send('cpu;host=a', 1, 1),
+                         'cpu;host=a 1.000000 1\n')
+        self.assertEqual(g.send('a..b', 1, 1), 'a..b 1.000000 1\n')
+
+    def test_non_ascii_rejected_per_metric(self):
+        g = self.client()
+        message = g.send_dict({u'caf\xe9': 1, 'ok': 2}, timestamp=1)
+        self.assertEqual(message, 'ok 2.000000 1\n')
+        self.assertEqual(g.stats()['rejected_metrics'], 1)
+
+    def test_unicode_names_are_sent(self):
+        g = self.client(validate_metric_names=True)
+        self.assertEqual(g.send(u'caf\xe9', 1, 1),
+                         'cafe 1.000000 1\n')
+
+    def test_validated_view(self):
+        g = self.client(validate_metric_names=True)
+        view = g.view(prefix='apps', system_name='')
+        self.assertEqual(view.send('a..b', 1, 1), 'apps.a.b 1.000000 1\n')
+
+    def test_strict_send_raises(self):
+        g = self.client(strict_metric_names=True)
+        with self.assertRaises(graphitesend.InvalidMetricName):
+            g.send('bad name', 1, 1)
+
+    def test_strict_without_cleaning(self):
+        g = self.client(clean_metric_name=False, strict_metric_names=True)
+        with self.assertRaises(graphitesend.InvalidMetricName):
+            g.send('bad name', 1, 1)
+
+    def test_strict_metric_handle(self):
+        g = self.client(strict_metric_names=True)
+        with self.assertRaises(graphitesend.InvalidMetricName):
+            g.metric('bad..name')
+
+    def test_strict_template(self):
+        g = self.client(strict_metric_names=True)
+        template = g.formatter.compile_template()
+        with self.assertRaises(graphitesend.InvalidMetricName):
+            template('bad name', 1, 1)
+
+    def test_batch_rejects_single_metrics(self):
+        g = self.client(strict_metric_names=True)
+        message = g.send_list([('good', 1, 1), ('bad name', 2, 1),
+                               ('value', 'nan?', 1), ('also.good', 3, 1)])
+        self.assertIn('good 1.000000 1\nalso.good 3.000000 1\n', message)
+        message = g.send_dict({'good': 1, 'bad name': 2}, timestamp=1)
+        self.assertIn('good 1.000000 1\n', message)
+        self.assertNotIn('bad', message)
+        self.assertEqual(g.stats()['rejected_metrics'], 3)
+
+    def test_batch_rejects_single_metrics_with_dedup(self):
+        g = self.client(strict_metric_names=True, dedup=True)
+        message = g.send_list([('bad name', 1, 1), ('good', 2, 1)])
+        self.assertIn('good 2.000000 1\n', message)
+        self.assertEqual(g.stats()['rejected_metrics'], 1)
+
+    def test_batch_all_rejected(self):
+        g = self.client(strict_metric_names=True)
+        self.assertEqual(g.send_list([('bad name', 1, 1)]), None)
+        self.assertEqual(g.send_dict({'bad name': 1}), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+import pickle
+import struct
+import unittest2 as unittest
+
+
+class TestPickle(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def unframe(self, frame):
+        (length,) = struct.unpack("!L", frame[:4])
+        self.assertEqual(length, len(frame) - 4)
+        return pickle.loads(frame[4:])
+
+    def test_default_protocol(self):
+        g = graphitesend.init(init_type='pickle', dryrun=True)
+        self.assertEqual(g.pickle_protocol, None)
+
+    def test_frame_roundtrip(self):
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            g = graphitesend.init(init_type='pickle', dryrun=True,
+                                  pickle_protocol=protocol)
+            frame = g.str2listtuple("a 1.000000 10\nb 2.000000 20\n")
+            self.assertEqual(self.unframe(frame),
+                             [('a', (10.0, '1.000000')),
+                              ('b', (20.0, '2.000000'))])
+
+    def test_protocol_is_used(self):
+        g = graphitesend.init(init_type='pickle', dryrun=True,
+                              pickle_protocol=2)
+        frame = g.str2listtuple("a 1 10")
+        # protocol 2 and above start with the PROTO opcode
+        self.assertEqual(frame[4:6], b'\x80\x02')
+
+    def test_invalid_protocol(self):
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.init(init_type='pickle', dryrun=True,
+                              pickle_protocol=pickle.HIGHEST_PROTOCOL + 1)
+
+    def test_no_messages(self):
+        g = graphitesend.init(init_type='pickle', dryrun=True)
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            g.str2listtuple("\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+import unittest2 as unittest
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.g = graphitesend.init(dryrun=True, prefix='test', system_name='')
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def test_handle_is_interned(self):
+        self.assertIs(self.g.metric('requests.ok'),
+                      self.g.metric('requests.ok'))
+        self.assertIsNot(self.g.metric('requests.ok'),
+                         self.g.metric('requests.ok', tags={'a': 'b'}))
+
+    def test_registry_is_bounded(self):
+        g = graphitesend.init(dryrun=True, max_metric_handles=2)
+        first = g.metric('a')
+        g.metric('b')
+        g.metric('c')
+        self.assertEqual(len(g._registry), 1)
+        self.assertIsNot(g.metric('a'), first)
+        self.assertTrue(first.send(1))
+
+    def test_handle_timestamp_is_an_integer(self):
+        handle = self.g.metric('requests.ok')
+        self.assertEqual(handle.send(1, 1.9),
+                         self.g.send('requests.ok', 1, 1))
+
+    def test_handle_has_no_dict(self):
+        handle = self.g.metric('requests.ok')
+        with self.assertRaises(AttributeError):
+            handle.__dict__
+
+    def test_handle_path(self):
+        handle = self.g.metric('requests (ok)', tags={'app': 'web'})
+        self.assertEqual(handle.path, 'test.requests__ok;app=web')
+
+    def test_handle_send(self):
+        handle = self.g.metric('requests.ok')
+        self.assertEqual(handle.send(3, 10), 'test.requests.ok 3.000000 10\n')
+        self.assertEqual(handle.send(3, 10),
+                         self.g.send('requests.ok', 3, 10))
+
+    def test_handle_timestamp_interval(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              timestamp_interval=60)
+        self.assertEqual(g.metric('m').send(1, 125), 'm 1.000000 120\n')
+
+    def test_record_and_flush(self):
+        self.assertEqual(self.g.flush(), None)
+        self.g.metric('a').record(1, 1)
+        self.g.record('b', 2, 1)
+        self.assertEqual(self.g.flush(),
+                         'test.a 1.000000 1\ntest.b 2.000000 1\n')
+        self.assertEqual(self.g.flush(), None)
+
+    def test_handle_dedup(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              dedup=True)
+        handle = g.metric('m')
+        self.assertNotEqual(handle.send(1), None)
+        self.assertEqual(handle.send(1), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
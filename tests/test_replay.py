@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.replay import ReplayRing
+import socket
+import unittest2 as unittest
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReplayRing(unittest.TestCase):
+
+    def test_needs_a_limit(self):
+        with self.assertRaises(ValueError):
+            ReplayRing()
+
+    def test_max_bytes(self):
+        ring = ReplayRing(max_bytes=10)
+        for data in (b'aaaa', b'bbbb', b'cccc'):
+            ring.append(data)
+        self.assertEqual(ring.replay(), [b'bbbb', b'cccc'])
+        self.assertEqual(ring.size, 8)
+
+    def test_larger_than_window(self):
+        ring = ReplayRing(max_bytes=4)
+        ring.append(b'aaaa')
+        ring.append(b'bbbbbbbb')
+        self.assertEqual(ring.replay(), [b'aaaa'])
+        self.assertEqual(ring.uncovered_bytes, 8)
+
+    def test_max_age(self):
+        clock = FakeClock()
+        ring = ReplayRing(max_age=10, clock=clock)
+        ring.append(b'old')
+        clock.now += 5
+        ring.append(b'new')
+        clock.now += 6
+        self.assertEqual(ring.replay(), [b'new'])
+
+    def test_copies_buffers(self):
+        ring = ReplayRing(max_bytes=10)
+        data = bytearray(b'abc')
+        ring.append(memoryview(data))
+        data[0:1] = b'x'
+        self.assertEqual(ring.replay(), [b'abc'])
+
+    def test_stats(self):
+        ring = ReplayRing(max_bytes=10)
+        ring.append(b'abc')
+        ring.replay()
+        ring.replay()
+        stats = ring.stats()
+        self.assertEqual(stats['replays'], 2)
+        self.assertEqual(stats['replayed_bytes'], 6)
+        self.assertEqual(stats['replay_window_bytes'], 3)
+        ring.clear()
+        self.assertEqual(len(ring), 0)
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+
+    def tearDown(self):
+        graphitesend.reset()
+        self.server.close()
+
+    def read(self, conn, size):
+        received = b""
+        while len(received) < size:
+            received += conn.recv(size - len(received))
+        return received
+
+    def test_disabled_by_default(self):
+        g = graphitesend.init(dryrun=True)
+        self.assertEqual(g.replay, None)
+
+    def test_replay_after_reconnect(self):
+        g = graphitesend.GraphiteClient(graphite_server='127.0.0.1',
+                                        graphite_port=self.port,
+                                        prefix='', system_name='',
+                                        replay_bytes=1024)
+        first, _ = self.server.accept()
+        g.send('a', 1, 1)
+        g.send_list([('b', 2, 2)])
+        self.assertEqual(self.read(first, 26),
+                         b'a 1.000000 1\nb 2.000000 2\n')
+        g.reconnect()
+        second, _ = self.server.accept()
+        self.assertEqual(self.read(second, 26),
+                         b'a 1.000000 1\nb 2.000000 2\n')
+        g.send('c', 3, 3)
+        self.assertEqual(self.read(second, 13), b'c 3.000000 3\n')
+        stats = g.stats()
+        self.assertEqual(stats['replays'], 1)
+        self.assertEqual(stats['replayed_bytes'], 26)
+        self.assertEqual(stats['replay_window_bytes'], 39)
+
+    def test_replay_vectored(self):
+        g = graphitesend.GraphiteClient(graphite_server='127.0.0.1',
+                                        graphite_port=self.port,
+                                        prefix='', system_name='',
+                                        vectored_writes=True,
+                                        replay_bytes=1024)
+        self.server.accept()
+        g.send_list([('a', 1, 1), ('b', 2, 2)])
+        g.reconnect()
+        second, _ = self.server.accept()
+        self.assertEqual(self.read(second, 26),
+                         b'a 1.000000 1\nb 2.000000 2\n')
+
+    def test_replay_pickle_frames(self):
+        g = graphitesend.GraphitePickleClient(graphite_server='127.0.0.1',
+                                              graphite_port=self.port,
+                                              prefix='', system_name='',
+                                              replay_bytes=1024)
+        first, _ = self.server.accept()
+        g.send('a', 1, 1)
+        frame = first.recv(1024)
+        g.reconnect()
+        second, _ = self.server.accept()
+        self.assertEqual(self.read(second, len(frame)), frame)
+
+
+if __name__ == '__main__':
+    unittest.main()
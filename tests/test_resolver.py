@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.resolver import CachingResolver, interleave_families
+import socket
+import unittest2 as unittest
+
+V4 = socket.AF_INET
+V6 = getattr(socket, 'AF_INET6', 10)
+
+
+def address(family, host, port=2003):
+    return (family, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', (host, port))
+
+
+class StubResolver(object):
+
+    def __init__(self, addresses):
+        self.addresses = addresses
+        self.calls = 0
+
+    def __call__(self, host, port, *args):
+        self.calls += 1
+        if isinstance(self.addresses, Exception):
+            raise self.addresses
+        return [address(family, ip, port) for family, ip in self.addresses]
+
+
+class TestResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+        self.now = 0
+
+    def tearDown(self):
+        graphitesend.reset()
+        self.server.close()
+
+    def resolver(self, addresses, ttl=60):
+        stub = StubResolver(addresses)
+        return stub, CachingResolver(ttl=ttl, getaddrinfo=stub,
+                                     clock=lambda: self.now)
+
+    def test_interleave_families(self):
+        addresses = [address(V6, 'a'), address(V6, 'b'), address(V4, 'c'),
+                     address(V4, 'd'), address(V4, 'e')]
+        ordered = [a[4][0] for a in interleave_families(addresses)]
+        self.assertEqual(ordered, ['a', 'c', 'b', 'd', 'e'])
+
+    def test_cache_ttl(self):
+        stub, resolver = self.resolver([(V4, '127.0.0.1')], ttl=10)
+        resolver.resolve('graphite', 2003)
+        resolver.resolve('graphite', 2003)
+        self.assertEqual(stub.calls, 1)
+        self.now = 11
+        resolver.resolve('graphite', 2003)
+        self.assertEqual(stub.calls, 2)
+        self.assertEqual(resolver.hits, 1)
+
+    def test_reconnect_does_not_resolve(self):
+        stub, resolver = self.resolver([(V4, '127.0.0.1')])
+        g = graphitesend.GraphiteClient(graphite_server='graphite',
+                                        graphite_port=self.port,
+                                        resolver=resolver)
+        g.reconnect()
+        g.reconnect()
+        self.assertEqual(stub.calls, 1)
+        self.assertEqual(g.connected_addr, ('127.0.0.1', self.port))
+
+    def test_failover_to_next_address(self):
+        # Nothing listens on 127.0.0.2 at that port, 127.0.0.1 accepts.
+        stub, resolver = self.resolver([(V4, '127.0.0.2'), (V4, '127.0.0.1')])
+        g = graphitesend.GraphiteClient(graphite_server='graphite',
+                                        graphite_port=self.port,
+                                        resolver=resolver)
+        self.assertEqual(g.connected_addr, ('127.0.0.1', self.port))
+
+    def test_all_addresses_fail_invalidates(self):
+        stub, resolver = self.resolver([(V4, '127.0.0.2')])
+        for _ in range(2):
+            with self.assertRaises(graphitesend.GraphiteSendException):
+                graphitesend.GraphiteClient(graphite_server='graphite',
+                                            graphite_port=self.port,
+                                            resolver=resolver)
+        self.assertEqual(stub.calls, 2)
+
+    def test_unknown_host(self):
+        stub, resolver = self.resolver(socket.gaierror("unknown"))
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.GraphiteClient(graphite_server='graphite',
+                                        resolver=resolver)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.scheduler import AdaptiveFlushScheduler
+from graphitesend.testing import FakeCarbon
+import threading
+import unittest2 as unittest
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdaptiveFlushScheduler(unittest.TestCase):
+
+    def scheduler(self, **kwargs):
+        self.clock = FakeClock()
+        return AdaptiveFlushScheduler(clock=self.clock, **kwargs)
+
+    def test_invalid_bounds(self):
+        with self.assertRaises(ValueError):
+            AdaptiveFlushScheduler(min_interval=2, max_interval=1)
+        with self.assertRaises(ValueError):
+            AdaptiveFlushScheduler(min_batch=0)
+
+    def test_due_in(self):
+        scheduler = self.scheduler(target_delay=1.0)
+        self.assertEqual(scheduler.due_in(0, None), 1.0)
+        self.assertEqual(scheduler.due_in(1, 999.75), 0.75)
+        self.assertEqual(scheduler.due_in(1, 998.0), 0)
+        self.assertEqual(scheduler.due_in(scheduler.batch_size, 1000.0), 0)
+
+    def test_slow_writes_shorten_the_interval(self):
+        scheduler = self.scheduler(target_delay=1.0, smoothing=1.0)
+        self.clock.now += 1
+        scheduler.observe(100, 0.4, 999.0)
+        self.assertAlmostEqual(scheduler.interval, 0.6)
+        self.clock.now += 1
+        scheduler.observe(100, 5, 999.0)
+        self.assertEqual(scheduler.interval, scheduler.min_interval)
+
+    def test_batch_size_follows_input_rate(self):
+        scheduler = self.scheduler(target_delay=1.0, smoothing=1.0,
+                                   min_batch=10, max_batch=1000)
+        self.clock.now += 2
+        scheduler.observe(400, 0.0, 998.0)
+        self.assertEqual(scheduler.input_rate, 200)
+        self.assertEqual(scheduler.batch_size, 200)
+        self.clock.now += 1
+        scheduler.observe(1, 0.0, 1001.0)
+        self.assertEqual(scheduler.batch_size, 10)
+
+    def test_stats(self):
+        scheduler = self.scheduler()
+        self.clock.now += 1
+        scheduler.observe(10, 0.1, 999.5, by_size=True)
+        scheduler.observe(10, 0.1, 1000.5)
+        stats = scheduler.stats()
+        self.assertEqual(stats['flushes'], 2)
+        self.assertEqual(stats['flushes_by_size'], 1)
+        self.assertEqual(stats['flushes_by_time'], 1)
+        self.assertEqual(stats['flush_last_delay'], 0.5)
+
+
+class TestAdaptiveFlush(unittest.TestCase):
+
+    def setUp(self):
+        self.carbon = FakeCarbon().start()
+
+    def tearDown(self):
+        graphitesend.reset()
+        self.carbon.stop()
+
+    def client(self, **kwargs):
+        g = graphitesend.GraphiteClient(prefix='', system_name='',
+                                        **dict(self.carbon.client_kwargs(),
+                                               **kwargs))
+        self.addCleanup(g.close)
+        return g
+
+    def test_disabled_by_default(self):
+        g = graphitesend.init(dryrun=True)
+        self.assertEqual(g.scheduler, None)
+        self.assertEqual(g.flush_thread, None)
+
+    def test_not_asynchronous(self):
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.GraphiteClient(dryrun=True, asynchronous=True,
+                                        adaptive_flush=True)
+
+    def test_flush_after_target_delay(self):
+        g = self.client(adaptive_flush=True, flush_target_delay=0.1)
+        g.record('a', 1, 1)
+        g.record('b', 2, 2)
+        self.assertTrue(self.carbon.wait_for(2, timeout=5))
+        stats = g.stats()
+        self.assertEqual(stats['flushes_by_time'], 1)
+        self.assertEqual(stats['flushes_by_size'], 0)
+
+    def test_flush_on_batch_size(self):
+        scheduler = AdaptiveFlushScheduler(target_delay=60, max_interval=60,
+                                           min_batch=1, max_batch=3)
+        g = self.client(adaptive_flush=scheduler)
+        for n in range(3):
+            g.record('a', n, n)
+        self.assertTrue(self.carbon.wait_for(3, timeout=5))
+        self.assertEqual(g.stats()['flushes_by_size'], 1)
+
+    def test_writes_hold_the_lock(self):
+        g = self.client(adaptive_flush=True, flush_target_delay=60,
+                        replay_bytes=1024)
+        locked = []
+        write_raw = g._write_raw
+
+        def check_lock(data):
+            locked.append(g._write_lock._is_owned())
+            return write_raw(data)
+        g._write_raw = check_lock
+        g.send('a', 1, 1)
+        g.bulk_export([('b', 2, 2)], processes=0)
+        g.reconnect()
+        self.assertTrue(locked)
+        self.assertTrue(all(locked))
+
+    def test_record_does_not_wait_for_writes(self):
+        g = self.client(adaptive_flush=True, flush_target_delay=60)
+        recorded = threading.Event()
+
+        def record():
+            g.record('a', 1, 1)
+            recorded.set()
+        with g._write_lock:
+            thread = threading.Thread(target=record)
+            thread.start()
+            self.assertTrue(recorded.wait(5))
+        thread.join(5)
+        g.flush()
+        self.assertTrue(self.carbon.wait_for(1, timeout=5))
+
+    def test_record_waits_for_budget_without_locks(self):
+        g = self.client(adaptive_flush=True, flush_target_delay=60,
+                        max_buffer_bytes=1000)
+        threads = [threading.Thread(target=g.send, args=('y' * 590, 1, 1)),
+                   threading.Thread(target=g.record, args=('x' * 480, 2, 1))]
+        with g._write_lock:
+            # The send reserves its bytes then waits for the write, the
+            # record waits for the budget only the send can free.
+            threads[0].start()
+            while not g.budget.used:
+                threads[0].join(0.01)
+            threads[1].start()
+            threads[1].join(0.1)
+        for thread in threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        g.flush()
+        self.assertTrue(self.carbon.wait_for(2, timeout=5))
+
+    def test_close_flushes(self):
+        g = self.client(adaptive_flush=True, flush_target_delay=60)
+        g.record('a', 1, 1)
+        g.close()
+        self.assertTrue(self.carbon.wait_for(1, timeout=5))
+        self.assertEqual(self.carbon.series['a'], [(1, 1.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
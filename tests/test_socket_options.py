@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+import socket
+import unittest2 as unittest
+
+
+class TestSocketOptions(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+
+    def tearDown(self):
+        graphitesend.reset()
+        self.server.close()
+
+    def client(self, **kwargs):
+        return graphitesend.GraphiteClient(graphite_server='127.0.0.1',
+                                           graphite_port=self.port, **kwargs)
+
+    def test_defaults(self):
+        g = self.client()
+        self.assertEqual(g.socket_options,
+                         graphitesend.GraphiteClient.default_socket_options)
+        self.assertFalse(g.effective_socket_options()['keepalive'])
+
+    def test_pickle_defaults(self):
+        g = graphitesend.init(init_type='pickle', graphite_server='127.0.0.1',
+                              graphite_port=self.port)
+        self.assertTrue(g.socket_options['tcp_nodelay'])
+        self.assertTrue(g.effective_socket_options()['tcp_nodelay'])
+
+    def test_options_applied(self):
+        g = self.client(tcp_nodelay=True, send_buffer_size=262144,
+                        keepalive=30)
+        effective = g.effective_socket_options()
+        self.assertTrue(effective['tcp_nodelay'])
+        self.assertTrue(effective['keepalive'])
+        self.assertTrue(effective['send_buffer_size'] >= 262144)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            self.assertEqual(effective['keepalive_idle'], 30)
+            self.assertEqual(effective['keepalive_interval'], 10)
+
+    def test_options_applied_on_reconnect(self):
+        g = self.client(tcp_nodelay=True)
+        g.reconnect()
+        self.assertTrue(g.effective_socket_options()['tcp_nodelay'])
+
+    def test_not_connected(self):
+        g = graphitesend.GraphiteClient(connect_on_create=False)
+        self.assertEqual(g.effective_socket_options(), None)
+
+    def test_corked_send(self):
+        g = self.client(tcp_cork=True, prefix='', system_name='')
+        (c, addr) = self.server.accept()
+        g.send_list([('a', 1), ('b', 2)], 1)
+        g.disconnect()
+        received = b""
+        while True:
+            data = c.recv(1024)
+            if not data:
+                break
+            received += data
+        c.close()
+        self.assertEqual(received, b'a 1.000000 1\nb 2.000000 1\n')
+        if hasattr(socket, 'TCP_CORK'):
+            g.connect()
+            self.assertEqual(g.effective_socket_options()['tcp_cork'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
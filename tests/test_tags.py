@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.tags import TagIndex, canonicalize_tags
+import unittest2 as unittest
+
+
+class TestTags(unittest.TestCase):
+
+    def setUp(self):
+        self.g = graphitesend.init(dryrun=True, prefix='test', system_name='')
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def test_canonicalize_sorted(self):
+        self.assertEqual(canonicalize_tags({'z': 1, 'a': 'b'}), ';a=b;z=1')
+
+    def test_canonicalize_escaped(self):
+        self.assertEqual(canonicalize_tags({'a=b': 'c;d', 'e': '~f g'}),
+                         ';a_b=c_d;e=_f_g')
+
+    def test_canonicalize_empty_value(self):
+        with self.assertRaises(ValueError):
+            canonicalize_tags({'a': ''})
+
+    def test_canonicalize_non_ascii(self):
+        with self.assertRaises(ValueError):
+            canonicalize_tags({'k': u'\xe9'})
+
+    def test_index_memoizes(self):
+        index = TagIndex()
+        calls = []
+
+        def build(path, encoded):
+            calls.append(path)
+            return path + encoded
+
+        tags = {'b': '2', 'a': '1'}
+        self.assertEqual(index.series('m', tags, build), 'm;a=1;b=2')
+        self.assertEqual(index.series('m', dict(tags), build), 'm;a=1;b=2')
+        self.assertEqual(calls, ['m'])
+
+    def test_index_bounded(self):
+        index = TagIndex(max_size=2)
+        for i in range(5):
+            index.series('m', {'i': str(i)})
+        self.assertTrue(len(index) <= 2)
+
+    def test_send_tags(self):
+        message = self.g.send('metric', 1, 1, tags={'env': 'prod'})
+        self.assertEqual(message, 'test.metric;env=prod 1.000000 1\n')
+
+    def test_send_dict_tags(self):
+        message = self.g.send_dict({'rx': 1}, 1, tags={'if': 'eth0'},
+                                   metric_tags={'rx': {'unit': 'p'}})
+        self.assertEqual(message, 'test.rx;if=eth0;unit=p 1.000000 1\n')
+
+    def test_send_list_tags(self):
+        message = self.g.send_list([('a', 1, None, {'k': 'v'}), ('b', 2)],
+                                   timestamp=3, tags={'env': 'prod'})
+        self.assertEqual(message, 'test.a;env=prod;k=v 1.000000 3\n'
+                                  'test.b;env=prod 2.000000 3\n')
+
+    def test_non_ascii_tags_rejected_per_metric(self):
+        message = self.g.send_list([('a', 1, None, {'k': u'\xe9'}), ('b', 2)],
+                                   timestamp=3)
+        self.assertEqual(message.split('\n')[-2], 'test.b 2.000000 3')
+        self.assertEqual(self.g.stats()['rejected_metrics'], 1)
+
+    def test_metric_tags_override_call_tags(self):
+        message = self.g.send_list([('a', 1, 1, {'env': 'dev'})],
+                                   tags={'env': 'prod'})
+        self.assertEqual(message, 'test.a;env=dev 1.000000 1\n')
+
+    def test_series_path(self):
+        self.assertEqual(self.g.formatter.series_path('a b', {'k': 'v'}),
+                         'test.a_b;k=v')
+
+    def test_dedup_per_tagged_series(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              dedup=True)
+        g.send('metric', 1, 1, tags={'host': 'a'})
+        self.assertNotEqual(g.send('metric', 1, 1, tags={'host': 'b'}), None)
+        self.assertEqual(g.send('metric', 1, 1, tags={'host': 'a'}), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.formatter import (GraphiteStructuredFormatter,
+                                    compile_template)
+import pickle
+import unittest2 as unittest
+
+
+class TestTemplate(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def test_default_layout_matches_formatter(self):
+        formatter = GraphiteStructuredFormatter(prefix='prefix',
+                                                system_name='host',
+                                                suffix='_ms')
+        template = formatter.compile_template()
+        for args in [('metric', 1, 1), ('test(name)', '2.5', 3),
+                     (42, 7, 1000)]:
+            self.assertEqual(template(*args), formatter(*args))
+
+    def test_precision(self):
+        template = compile_template(precision=2)
+        self.assertEqual(template('metric', 1.2345, 10), 'metric 1.23 10\n')
+
+    def test_tag_layout(self):
+        template = compile_template("{path};env=prod {value} {timestamp}\n",
+                                    prefix='apps.', precision=0)
+        self.assertEqual(template('requests', 12, 1),
+                         'apps.requests;env=prod 12 1\n')
+
+    def test_tags_field(self):
+        template = compile_template(prefix='apps.')
+        self.assertEqual(template('requests', 1, 1, tags={'b': 2, 'a': 1}),
+                         'apps.requests;a=1;b=2 1.000000 1\n')
+
+    def test_percent_in_prefix(self):
+        template = compile_template(prefix='100%.')
+        self.assertEqual(template('cpu', 1, 1), '100%.cpu 1.000000 1\n')
+
+    def test_lowercase_and_no_cleaning(self):
+        template = compile_template("{path}", prefix='Apps.',
+                                    clean_metric_name=False,
+                                    lowercase_metric_names=True)
+        self.assertEqual(template('Test(Name)', 1), 'apps.test(name)')
+
+    def test_timestamp_interval(self):
+        template = compile_template(timestamp_interval=60)
+        self.assertEqual(template('metric', 1, 125), 'metric 1.000000 120\n')
+
+    def test_pickle(self):
+        template = compile_template("{name} {value}\n", prefix='apps.',
+                                    precision=1, timestamp_interval=60)
+        copy = pickle.loads(pickle.dumps(template))
+        self.assertEqual(copy.layout, template.layout)
+        self.assertEqual(copy('a b', 1, 125), template('a b', 1, 125))
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            compile_template("{path} {labels}")
+
+    def test_send_with_template(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='')
+        template = g.formatter.compile_template(precision=1)
+        self.assertEqual(g.send('metric', 1, 1, formatter=template),
+                         'metric 1.0 1\n')
+        self.assertEqual(g.send_list([('a', 1), ('b', 2)], 5,
+                                     formatter=template),
+                         'a 1.0 5\nb 2.0 5\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.testing import ChaosProxy, FakeCarbon
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest2 as unittest
+
+
+class TestFakeCarbon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'carbon.sock')
+
+    def tearDown(self):
+        graphitesend.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def carbon(self, **kwargs):
+        carbon = FakeCarbon(**kwargs).start()
+        self.addCleanup(carbon.stop)
+        return carbon
+
+    def client(self, carbon, **kwargs):
+        kwargs.update(carbon.client_kwargs())
+        return graphitesend.init(prefix='test', system_name='', **kwargs)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            FakeCarbon(protocol='json')
+        with self.assertRaises(ValueError):
+            FakeCarbon(transport='sctp')
+        with self.assertRaises(ValueError):
+            FakeCarbon(transport='unix_stream')
+
+    def test_plaintext_tcp(self):
+        carbon = self.carbon()
+        g = self.client(carbon)
+        g.send_list([('a', 1, 10), ('a', 2, 20), ('b', 3, 10)])
+        self.assertTrue(carbon.wait_for(3))
+        self.assertEqual(carbon.series, {
+            'test.a': [(10.0, 1.0), (20.0, 2.0)],
+            'test.b': [(10.0, 3.0)],
+        })
+        stats = carbon.stats()
+        self.assertEqual(stats['points'], 3)
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['received_bytes'], 57)
+
+    def test_pickle_tcp(self):
+        carbon = self.carbon(protocol='pickle')
+        g = graphitesend.init('pickle', prefix='test', system_name='',
+                              **carbon.client_kwargs())
+        g.send_list([('a', 1, 10), ('b', 2, 20)])
+        self.assertTrue(carbon.wait_for(2))
+        self.assertEqual(carbon.series, {'test.a': [(10.0, 1.0)],
+                                         'test.b': [(20.0, 2.0)]})
+
+    def test_unix_stream(self):
+        carbon = self.carbon(transport='unix_stream', path=self.path)
+        g = self.client(carbon)
+        g.send('a', 1, 10)
+        self.assertTrue(carbon.wait_for(1))
+        self.assertEqual(carbon.series, {'test.a': [(10.0, 1.0)]})
+
+    def test_unix_dgram_pickle(self):
+        carbon = self.carbon(protocol='pickle', transport='unix_dgram',
+                             path=self.path)
+        g = graphitesend.init('pickle', prefix='test', system_name='',
+                              **carbon.client_kwargs())
+        g.send('a', 1, 10)
+        self.assertTrue(carbon.wait_for(1))
+        self.assertEqual(carbon.series, {'test.a': [(10.0, 1.0)]})
+
+    def test_udp(self):
+        carbon = self.carbon(transport='udp')
+        with self.assertRaises(ValueError):
+            carbon.client_kwargs()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.sendto(b'a 1 10\nb 2 20\n', carbon.address)
+        sock.close()
+        self.assertTrue(carbon.wait_for(2))
+        self.assertEqual(sorted(carbon.series), ['a', 'b'])
+
+    def test_parse_errors(self):
+        carbon = self.carbon()
+        sock = socket.create_connection(carbon.address)
+        sock.sendall(b'garbage\na 1 10\n')
+        sock.close()
+        self.assertTrue(carbon.wait_for(1))
+        self.assertEqual(carbon.errors, 1)
+
+    def test_wait_for_timeout(self):
+        carbon = self.carbon()
+        self.assertFalse(carbon.wait_for(1, timeout=0.1))
+
+    def test_stall(self):
+        carbon = self.carbon()
+        g = self.client(carbon)
+        carbon.stall(0.3)
+        time.sleep(0.05)
+        g.send('a', 1, 10)
+        self.assertFalse(carbon.wait_for(1, timeout=0.1))
+        self.assertTrue(carbon.wait_for(1))
+
+    def test_latency(self):
+        carbon = self.carbon(latency=0.2)
+        g = self.client(carbon)
+        start = time.time()
+        g.send('a', 1, 10)
+        self.assertTrue(carbon.wait_for(1))
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+    def test_drop_connections(self):
+        carbon = self.carbon()
+        g = self.client(carbon, autoreconnect=True, replay_bytes=1024)
+        g.send('a', 1, 10)
+        self.assertTrue(carbon.wait_for(1))
+        carbon.drop_connections()
+        while carbon.dropped_connections < 1:
+            time.sleep(0.01)
+        g.reconnect()
+        self.assertTrue(carbon.wait_for(2))
+        self.assertEqual(carbon.series['test.a'], [(10.0, 1.0), (10.0, 1.0)])
+        self.assertEqual(carbon.connections, 2)
+
+    def test_drop_after_bytes(self):
+        carbon = self.carbon(drop_after_bytes=10)
+        g = self.client(carbon)
+        g.send('a', 1, 10)
+        self.assertTrue(carbon.wait_for(1))
+        while carbon.dropped_connections < 1:
+            time.sleep(0.01)
+        self.assertEqual(carbon.stats()['dropped_connections'], 1)
+
+    def test_keep_points(self):
+        carbon = self.carbon(keep_points=False)
+        g = self.client(carbon)
+        g.send('a', 1, 10)
+        self.assertTrue(carbon.wait_for(1))
+        self.assertEqual(carbon.series, {})
+
+    def test_reset(self):
+        carbon = self.carbon()
+        g = self.client(carbon)
+        g.send('a', 1, 10)
+        self.assertTrue(carbon.wait_for(1))
+        carbon.reset()
+        self.assertEqual(carbon.points, 0)
+        self.assertEqual(carbon.series, {})
+
+
+class TestChaosProxy(unittest.TestCase):
+
+    def setUp(self):
+        self.carbon = FakeCarbon().start()
+        self.proxy = ChaosProxy(self.carbon.address,
+                                receive_buffer_size=4096).start()
+
+    def tearDown(self):
+        graphitesend.reset()
+        self.proxy.stop()
+        self.carbon.stop()
+
+    def client(self, **kwargs):
+        kwargs.update(self.proxy.client_kwargs())
+        return graphitesend.GraphiteClient(prefix='', system_name='',
+                                           **kwargs)
+
+    def test_forward(self):
+        g = self.client()
+        g.send('a', 1, 10)
+        self.assertTrue(self.carbon.wait_for(1))
+        self.assertEqual(self.carbon.series, {'a': [(10.0, 1.0)]})
+        self.assertEqual(self.proxy.stats()['forwarded_bytes'], 14)
+
+    def test_restart(self):
+        g = self.client()
+        self.proxy.restart(downtime=0.5)
+        while self.proxy.restarts < 1:
+            time.sleep(0.01)
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            g.reconnect()
+        time.sleep(0.6)
+        g.reconnect()
+        g.send('a', 1, 10)
+        self.assertTrue(self.carbon.wait_for(1))
+
+    def test_half_open(self):
+        g = self.client(timeout_in_seconds=1, send_buffer_size=4096)
+        self.proxy.half_open()
+        time.sleep(0.05)
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            for _ in range(100):
+                g.send_list([('a', i, i) for i in range(1000)])
+        self.assertLess(self.carbon.points, 100000)
+        # New connections are not affected
+        g.reconnect()
+        self.carbon.reset()
+        g.send('b', 1, 10)
+        self.assertTrue(self.carbon.wait_for(1))
+
+    def test_slow(self):
+        g = self.client()
+        self.proxy.slow(2000)
+        time.sleep(0.05)
+        start = time.time()
+        g.send_list([('a', i, i) for i in range(300)])
+        self.assertTrue(self.carbon.wait_for(300))
+        self.assertGreater(time.time() - start, 1)
+        self.proxy.slow(None)
+        g.send('b', 1, 10)
+        self.assertTrue(self.carbon.wait_for(301, timeout=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.formatter import GraphiteStructuredFormatter
+import unittest2 as unittest
+
+
+class TestTimestamp(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def test_formatter_interval_alignment(self):
+        formatter = GraphiteStructuredFormatter(prefix='', system_name='',
+                                                timestamp_interval=60)
+        self.assertEqual(formatter('metric', 1, 1385),
+                         'metric 1.000000 1380\n')
+        self.assertEqual(formatter('metric', 1, 1380),
+                         'metric 1.000000 1380\n')
+
+    def test_formatter_no_alignment_by_default(self):
+        formatter = GraphiteStructuredFormatter(prefix='', system_name='')
+        self.assertEqual(formatter('metric', 1, 1385),
+                         'metric 1.000000 1385\n')
+
+    def test_client_interval_alignment(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              timestamp_interval=10)
+        self.assertEqual(g.send('metric', 1, 1234), 'metric 1.000000 1230\n')
+
+    def test_send_dict_shares_one_timestamp(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='')
+        data = dict(('metric%d' % i, i) for i in range(100))
+        message = g.send_dict(data)
+        timestamps = set(line.split()[2] for line in message.splitlines())
+        self.assertEqual(len(timestamps), 1)
+
+    def test_send_dict_aligned(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              timestamp_interval=60)
+        message = g.send_dict({'a': 1, 'b': 2})
+        for line in message.splitlines():
+            self.assertEqual(int(line.split()[2]) % 60, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.timing import TimedBlock, perf_counter_ns
+import sys
+import threading
+import time
+import unittest2 as unittest
+
+
+class TestTimer(unittest.TestCase):
+
+    def setUp(self):
+        self.g = graphitesend.init(dryrun=True, prefix='', system_name='')
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def durations(self):
+        message = self.g.flush()
+        return [float(line.split()[1]) for line in message.splitlines()]
+
+    def test_perf_counter_ns(self):
+        start = perf_counter_ns()
+        time.sleep(0.01)
+        self.assertGreaterEqual(perf_counter_ns() - start, 10000000)
+
+    def test_context_manager(self):
+        timer = self.g.timer('block')
+        with timer as block:
+            time.sleep(0.01)
+        self.assertTrue(isinstance(block, TimedBlock))
+        self.assertGreaterEqual(block.elapsed, 10)
+        self.assertEqual(timer.elapsed, block.elapsed)
+        message = self.g.flush()
+        self.assertTrue(message.startswith('block %f ' % block.elapsed))
+
+    def test_nested_reuse(self):
+        timer = self.g.timer('block')
+        with timer as outer:
+            time.sleep(0.02)
+            with timer as inner:
+                pass
+        self.assertLess(inner.elapsed, 10)
+        self.assertGreaterEqual(outer.elapsed, 20)
+
+    def test_concurrent_reuse(self):
+        timer = self.g.timer('block', buffered=False)
+        durations = []
+        started = threading.Event()
+
+        def slow():
+            with timer as block:
+                started.set()
+                time.sleep(0.05)
+            durations.append(block.elapsed)
+        thread = threading.Thread(target=slow)
+        thread.start()
+        started.wait(5)
+        with timer as fast:
+            pass
+        thread.join(5)
+        self.assertLess(fast.elapsed, 40)
+        self.assertGreaterEqual(durations[0], 50)
+
+    def test_exception_is_timed(self):
+        with self.assertRaises(ValueError):
+            with self.g.timer('block'):
+                raise ValueError()
+        self.assertEqual(len(self.durations()), 1)
+
+    def test_decorator(self):
+        @self.g.timer('function')
+        def function(value):
+            return value * 2
+        self.assertEqual(function.__name__, 'function')
+        self.assertEqual(function(2), 4)
+        self.assertEqual(function(3), 6)
+        self.assertEqual(len(self.durations()), 2)
+
+    @unittest.skipIf(sys.version_info < (3, 5), "no coroutines")
+    def test_coroutine(self):
+        from timing_coroutines import run_timed_coroutine
+        self.assertEqual(run_timed_coroutine(self.g.timer('coroutine')), 42)
+        durations = self.durations()
+        self.assertEqual(len(durations), 1)
+        self.assertGreaterEqual(durations[0], 10)
+
+    @unittest.skipIf(sys.version_info < (3, 7), "no context variables")
+    def test_overlapping_tasks(self):
+        from timing_coroutines import run_overlapping_blocks
+        first, second = run_overlapping_blocks(self.g.timer('block'))
+        self.assertGreaterEqual(first.elapsed, 50)
+        self.assertLess(first.elapsed, 100)
+        self.assertGreaterEqual(second.elapsed, 100)
+        self.assertLess(second.elapsed, 150)
+
+    def test_unbuffered(self):
+        timer = self.g.timer('block', buffered=False)
+        self.assertEqual(self.g.flush(), None)
+        with timer:
+            pass
+        self.assertEqual(self.g.flush(), None)
+
+    def test_handle_is_shared(self):
+        self.assertTrue(self.g.timer('a', tags={'x': 'y'}).handle is
+                        self.g.metric('a', tags={'x': 'y'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
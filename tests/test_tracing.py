@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.tracing import Tracer
+import logging
+import unittest2 as unittest
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger("graphitesend")
+        self.handler = ListHandler()
+        self.logger.addHandler(self.handler)
+        self.level = self.logger.level
+
+    def tearDown(self):
+        graphitesend.reset()
+        self.logger.removeHandler(self.handler)
+        self.logger.setLevel(self.level)
+
+    def test_disabled_is_lazy(self):
+        self.logger.setLevel(logging.WARNING)
+        trace = Tracer(self.logger)
+        self.assertFalse(trace.enabled)
+        trace("never %s", "emitted")
+        self.assertEqual(self.handler.records, [])
+
+    def test_enabled_is_cached_until_refresh(self):
+        self.logger.setLevel(logging.WARNING)
+        trace = Tracer(self.logger)
+        self.logger.setLevel(logging.DEBUG)
+        self.assertFalse(trace.enabled)
+        self.assertTrue(trace.refresh())
+        trace("metric: '%s'", "foo")
+        self.assertEqual(self.handler.records[0].getMessage(),
+                         "metric: 'foo'")
+
+    def test_formatter_does_not_log_when_disabled(self):
+        self.logger.setLevel(logging.WARNING)
+        g = graphitesend.init(dryrun=True)
+        g.send('metric', 1)
+        self.assertEqual(self.handler.records, [])
+
+    def test_batch_summary(self):
+        self.logger.setLevel(logging.DEBUG)
+        trace = Tracer(self.logger)
+        trace.batch(2, 40, addr=('localhost', 2003))
+        record = self.handler.records[0]
+        self.assertEqual(record.getMessage(),
+                         "sent batch of 2 metrics, 40 bytes")
+        self.assertEqual(record.graphitesend['count'], 2)
+        self.assertEqual(record.graphitesend['addr'], ('localhost', 2003))
+
+    def test_client_debug_forces_tracing(self):
+        self.logger.setLevel(logging.WARNING)
+        g = graphitesend.init(dryrun=True, debug=True)
+        self.assertTrue(g.trace.enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
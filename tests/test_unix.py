@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+import os
+import pickle
+import shutil
+import socket
+import struct
+import tempfile
+import unittest2 as unittest
+
+
+class TestUnixTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'carbon.sock')
+
+    def tearDown(self):
+        graphitesend.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def listen(self, type):
+        server = socket.socket(socket.AF_UNIX, type)
+        server.bind(self.path)
+        if type == socket.SOCK_STREAM:
+            server.listen(5)
+        self.addCleanup(server.close)
+        return server
+
+    def test_invalid_transport(self):
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.init(transport='udp', dryrun=True)
+
+    def test_missing_path(self):
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.init('unix_stream')
+
+    def test_connect_failure(self):
+        with self.assertRaises(graphitesend.GraphiteSendException):
+            graphitesend.init('unix_stream', unix_socket_path=self.path)
+
+    def test_unix_stream(self):
+        server = self.listen(socket.SOCK_STREAM)
+        g = graphitesend.init('unix_stream', unix_socket_path=self.path,
+                              prefix='', system_name='')
+        (c, addr) = server.accept()
+        g.send_list([('a', 1), ('b', 2)], 1)
+        self.assertEqual(c.recv(1024), b'a 1.000000 1\nb 2.000000 1\n')
+        c.close()
+
+    def test_unix_stream_reconnect(self):
+        server = self.listen(socket.SOCK_STREAM)
+        g = graphitesend.init('unix_stream', unix_socket_path=self.path,
+                              prefix='', system_name='')
+        first, _ = server.accept()
+        g.reconnect()
+        first.close()
+        self.assertEqual(g.socket.family, socket.AF_UNIX)
+        second, _ = server.accept()
+        g.send('a', 1, 1)
+        self.assertEqual(second.recv(1024), b'a 1.000000 1\n')
+        second.close()
+
+    def test_unix_dgram_split_on_lines(self):
+        server = self.listen(socket.SOCK_DGRAM)
+        g = graphitesend.init('unix_dgram', unix_socket_path=self.path,
+                              prefix='', system_name='', datagram_size=30)
+        g.send_list([('a', 1), ('b', 2), ('c', 3)], 1)
+        self.assertEqual(server.recv(1024), b'a 1.000000 1\nb 2.000000 1\n')
+        self.assertEqual(server.recv(1024), b'c 3.000000 1\n')
+
+    def test_pickle_unix_stream(self):
+        server = self.listen(socket.SOCK_STREAM)
+        g = graphitesend.init('pickle', transport='unix_stream',
+                              unix_socket_path=self.path,
+                              prefix='', system_name='')
+        (c, addr) = server.accept()
+        g.send('a', 1, 1)
+        frame = c.recv(1024)
+        self.assertEqual(struct.unpack("!L", frame[:4])[0], len(frame) - 4)
+        self.assertEqual(pickle.loads(frame[4:]), [('a', (1.0, '1.000000'))])
+        c.close()
+
+    def test_pickle_unix_dgram(self):
+        server = self.listen(socket.SOCK_DGRAM)
+        g = graphitesend.init('pickle', transport='unix_dgram',
+                              unix_socket_path=self.path,
+                              prefix='', system_name='', datagram_size=80)
+        g.send_list([('a', 1), ('b', 2), ('c', 3)], 1)
+        received = []
+        while len(received) < 3:
+            frame = server.recv(1024)
+            self.assertTrue(len(frame) <= 80)
+            received.extend(pickle.loads(frame[4:]))
+        self.assertEqual([path for path, _ in received], ['a', 'b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
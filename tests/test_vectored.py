@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.transport import sendmsg_all
+import socket
+import unittest2 as unittest
+
+
+class PartialSocket(object):
+    """ Accepts at most 5 bytes and 2 buffers per sendmsg() call. """
+
+    def __init__(self):
+        self.received = b""
+        self.calls = 0
+
+    def sendmsg(self, buffers):
+        self.calls += 1
+        data = b"".join(bytes(b) for b in buffers[:2])[:5]
+        self.received += data
+        return len(data)
+
+
+class TestVectored(unittest.TestCase):
+
+    def tearDown(self):
+        graphitesend.reset()
+
+    def test_partial_writes(self):
+        sock = PartialSocket()
+        buffers = [b"abc", b"", b"defgh", b"ij", b"", b"klmnopq"]
+        self.assertEqual(sendmsg_all(sock, buffers, iov_max=2), 17)
+        self.assertEqual(sock.received, b"abcdefghijklmnopq")
+
+    def test_iov_max_groups(self):
+        sock = PartialSocket()
+        sendmsg_all(sock, [b"a"] * 6, iov_max=2)
+        self.assertEqual(sock.received, b"aaaaaa")
+        self.assertEqual(sock.calls, 3)
+
+    def test_dryrun_joins(self):
+        g = graphitesend.init(dryrun=True, prefix='', system_name='',
+                              vectored_writes=True)
+        self.assertEqual(g.send_list([('a', 1), ('b', 2)], 1),
+                         'a 1.000000 1\nb 2.000000 1\n')
+
+    def test_send_list_over_socket(self):
+        g = graphitesend.GraphiteClient(prefix='', system_name='',
+                                        connect_on_create=False,
+                                        vectored_writes=True)
+        g.socket, server = socket.socketpair()
+        try:
+            response = g.send_list([('a', 1), ('b', 2)], 1)
+            self.assertEqual(response,
+                             'sent 26 long message: '
+                             'a 1.000000 1\nb 2.000000 1\n')
+            g.record('c', 3, 1)
+            g.flush()
+            g.disconnect()
+            received = b""
+            while True:
+                data = server.recv(1024)
+                if not data:
+                    break
+                received += data
+        finally:
+            server.close()
+        self.assertEqual(received, b'a 1.000000 1\nb 2.000000 1\n'
+                                   b'c 3.000000 1\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+from graphitesend import graphitesend
+from graphitesend.formatter import compile_template
+from graphitesend.testing import FakeCarbon
+from graphitesend.view import ClientView
+import unittest2 as unittest
+
+
+class TestView(unittest.TestCase):
+
+    def setUp(self):
+        self.carbon = FakeCarbon().start()
+        self.g = graphitesend.GraphiteClient(prefix='apps', system_name='',
+                                             **self.carbon.client_kwargs())
+
+    def tearDown(self):
+        self.g.disconnect()
+        graphitesend.reset()
+        self.carbon.stop()
+
+    def view(self, group, **kwargs):
+        return self.g.view(prefix='apps', group=group, system_name='',
+                           **kwargs)
+
+    def test_naming(self):
+        db = self.view('db', suffix='.count')
+        self.assertIsInstance(db, ClientView)
+        self.assertEqual(db.prefix, 'apps.db.')
+        self.assertEqual(db.suffix, '.count')
+        self.assertEqual(self.g.prefix, 'apps.')
+        self.assertEqual(db.clean_metric_name('a b'), 'a_b')
+
+    def test_views_share_the_connection(self):
+        views = [self.view('v%d' % n) for n in range(20)]
+        for n, view in enumerate(views):
+            view.send('metric', n, 1)
+        views[0].emit('emitted', 1, 1)
+        views[1].send_dict({'dict': 1}, timestamp=1)
+        views[2].send_list([('list', 1, 1)])
+        views[3].metric('handle').send(1, 1)
+        self.assertTrue(self.carbon.wait_for(24))
+        self.assertEqual(self.carbon.connections, 1)
+        self.assertEqual(self.carbon.series['apps.v7.metric'], [(1, 7.0)])
+        for path in ('apps.v0.emitted', 'apps.v1.dict', 'apps.v2.list',
+                     'apps.v3.handle'):
+            self.assertIn(path, self.carbon.series)
+
+    def test_views_share_the_buffer(self):
+        db, web = self.view('db'), self.view('web')
+        db.record('queries', 1, 1)
+        web.record('requests', 2, 1)
+        self.g.record('total', 3, 1)
+        self.assertEqual(self.carbon.points, 0)
+        self.g.flush()
+        self.assertTrue(self.carbon.wait_for(3))
+        self.assertEqual(sorted(self.carbon.series), [
+            'apps.db.queries', 'apps.total', 'apps.web.requests'])
+
+    def test_timer(self):
+        db = self.view('db')
+        with db.timer('query'):
+            pass
+        self.g.flush()
+        self.assertTrue(self.carbon.wait_for(1))
+        self.assertIn('apps.db.query', self.carbon.series)
+
+    def test_shared_name_cache(self):
+        db = self.view('db')
+        self.assertIs(db.formatter.name_cleaner, self.g.formatter.name_cleaner)
+
+    def test_series_are_told_apart(self):
+        g = graphitesend.GraphiteClient(prefix='', system_name='', dedup=True,
+                                        last_values=True, dryrun=True)
+        db = g.view(prefix='db', system_name='')
+        web = g.view(prefix='web', system_name='')
+        self.assertTrue(db.send('up', 1, 1))
+        self.assertTrue(web.send('up', 1, 1))
+        self.assertEqual(db.send('up', 1, 2), None)
+        self.assertEqual(g.last('*.up'), {'db.up': (1, 1), 'web.up': (1, 1)})
+        self.assertIsNot(db.metric('x'), web.metric('x'))
+        self.assertIs(db.metric('x'), db.metric('x'))
+
+
+    def test_template_views_are_told_apart(self):
+        g = graphitesend.GraphiteClient(prefix='', system_name='', dedup=True,
+                                        last_values=True, dryrun=True)
+        a = g.view(formatter=compile_template(prefix='a.'))
+        b = g.view(formatter=compile_template(prefix='b.'))
+        self.assertIsNot(a.metric('req'), b.metric('req'))
+        self.assertEqual(b.metric('req').send(3, 1), 'b.req 3.000000 1\n')
+        self.assertTrue(a.send('m', 1, 1))
+        self.assertTrue(b.send('m', 1, 1))
+        self.assertEqual(g.last('*.m'), {'a.m': (1, 1), 'b.m': (1, 1)})
+
+    def test_formatters_without_prefix_are_told_apart(self):
+        g = graphitesend.GraphiteClient(prefix='', system_name='', dedup=True,
+                                        dryrun=True)
+        a = g.view(formatter=lambda m, v, t=None: 'a.%s %s %d\n' % (m, v, t))
+        b = g.view(formatter=lambda m, v, t=None: 'b.%s %s %d\n' % (m, v, t))
+        self.assertEqual(a.send('m', 1, 1), 'a.m 1 1\n')
+        self.assertEqual(b.send('m', 1, 1), 'b.m 1 1\n')
+        self.assertEqual(b.metric('m').send(2, 1), 'b.m 2 1\n')
+
+if __name__ == '__main__':
+    unittest.main()
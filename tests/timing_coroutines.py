@@ -0,0 +1,37 @@
+"""
+Coroutines for test_timing, kept out of it as they are python 3.5+ syntax.
+"""
+import asyncio
+
+
+def run_timed_coroutine(timer):
+    @timer
+    async def coroutine():
+        await asyncio.sleep(0.01)
+        return 42
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine())
+    finally:
+        loop.close()
+
+
+def run_overlapping_blocks(timer):
+    """
+    Time a block of 50ms in a task, and one of 100ms starting 10ms later in
+    another, with the same timer. Return both blocks.
+    """
+    async def timed(delay, duration):
+        await asyncio.sleep(delay)
+        with timer as block:
+            await asyncio.sleep(duration)
+        return block
+
+    async def both():
+        return await asyncio.gather(timed(0, 0.05), timed(0.01, 0.1))
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(both())
+    finally:
+        loop.close()